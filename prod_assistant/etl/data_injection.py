@@ -1,11 +1,12 @@
 import os
-import pandas as pd
 from dotenv import load_dotenv
 from typing import List 
 from langchain_core.documents import Document
-from langchain_astradb import AstraDBVectorStore
 from prod_assistant.utils.model_loader import ModelLoader
 from prod_assistant.utils.config_loader import load_config
+from prod_assistant.utils.rate_limiter import Priority,priority_scope
+from prod_assistant.retriever.result_cache import bump_collection_version,collection_version_path
+from prod_assistant.retriever.catalog_index import CatalogIndex,catalog_index_path
 
 class DataIngestion:
     def __init__(self):
@@ -19,6 +20,8 @@ class DataIngestion:
         "load and validate the required the environment variables"
         load_dotenv()
         required_keys = ['OPENAI_API_KEY','ASTRA_DB_API_ENDPOINT','ASTRA_DB_APPLICATION_TOKEN','ASTRA_DB_KEYSPACE']
+        if load_config().get('vector_index',{}).get('backend','astra') == 'local':
+            required_keys = ['OPENAI_API_KEY']
         missing_var = [var for var in required_keys if os.getenv(var) is None]
         if missing_var:
             raise ValueError(f"Missing required environment variables: {missing_var}")
@@ -36,6 +39,7 @@ class DataIngestion:
         
     def _load_csv(self):
         " load product data from csv"
+        import pandas as pd
         df = pd.read_csv(self.csv_path)
         expected_columns = {'product_id','product_title', 'rating', 'total_reviews','price', 'top_reviews'}
         if not expected_columns.issubset(df.columns):
@@ -72,19 +76,42 @@ class DataIngestion:
     def store_in_vector_db(self,documents: List[Document]):
         "store documents into database"
         collection_name = self.config['astra_db']['collection_name']
-        vstore = AstraDBVectorStore(
-            embedding=self.model_loader.load_embedding_model(),
-            collection_name=collection_name,
-            api_endpoint=self.ASTRA_DB_API_ENDPOINT,
-            token=self.ASTRA_DB_APPLICATION_TOKEN,
-        )
+        if self.config.get('vector_index',{}).get('backend','astra') == 'local':
+            # appended to the index's delta segment; running retrievers pick the rows up without a restart
+            from prod_assistant.retriever.ann_index import LocalANNVectorStore,load_ann_index
+            vstore = LocalANNVectorStore(self.model_loader.load_embedding_model(),load_ann_index(self.config))
+        else:
+            from langchain_astradb import AstraDBVectorStore
+            vstore = AstraDBVectorStore(
+                embedding=self.model_loader.load_embedding_model(),
+                collection_name=collection_name,
+                api_endpoint=self.ASTRA_DB_API_ENDPOINT,
+                token=self.ASTRA_DB_APPLICATION_TOKEN,
+            )
         inserted_ids = vstore.add_documents(documents)
         print(f"Inserted {len(inserted_ids)} documents into the vector database")
+        # cached retrieval results for the old contents are dropped on their next lookup
+        bump_collection_version(collection_version_path(self.config),collection_name)
         return vstore,inserted_ids
-    def run_pipeline(self):
-        "run full data ingestion pipelines"
+    def run_pipeline(self,progress=None):
+        """run full data ingestion pipelines.
+        progress(stage, done, total, interruptible=True) is called between stages, e.g. by the background job runner.
+        interruptible=False from the store on: stopping there would leave the store, collection version
+        and catalog index out of step"""
+        progress = progress or (lambda stage,done,total,interruptible=True: None)
+        progress("transforming products",0,len(self.product_data))
         documents = self.transform()
-        vstore,_ =  self.store_in_vector_db(documents)
+        progress(f"embedding and storing {len(documents)} documents",0,len(documents),interruptible=False)
+        # bulk embedding yields to interactive chat traffic on the shared API key
+        with priority_scope(Priority.BACKGROUND):
+            vstore,_ =  self.store_in_vector_db(documents)
+        progress("building catalog index",len(documents),len(documents),interruptible=False)
+        # structured lookup for queries that name a product; the workflows reload it on change.
+        # the vector store keeps earlier ingestions, so this run's products are merged into the saved index
+        catalog_index = CatalogIndex(path=catalog_index_path(self.config))
+        catalog_index.refresh()
+        catalog_index.merge(documents).save(catalog_index_path(self.config))
+        progress("ingestion complete",len(documents),len(documents),interruptible=False)
         
         #Optionally do a quick search
         query = "Can you tell me the low budget iphone?"
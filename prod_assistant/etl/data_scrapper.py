@@ -72,13 +72,21 @@ class FlipkartScraper:
         # Return reviews joined by ' || ' or message if none found
         return " || ".join(reviews) if reviews else "No reviews found"
     
-    def scrape_flipkart_products(self, query, max_products=1, review_count=2):
+    def scrape_flipkart_products(self, query, max_products=1, review_count=2, on_product=None):
         """
         Search Flipkart for the given `query`,
         scrape up to `max_products` items and their top `review_count` reviews.
+        `on_product(row)` is called as each product is scraped (progress reporting);
+        if it raises, the browser is still closed.
         """
         options = uc.ChromeOptions()                       # Setup Chrome options
         driver = uc.Chrome(options=options, use_subprocess=True)
+        try:
+            return self._scrape_results(driver, query, max_products, review_count, on_product)
+        finally:
+            driver.quit()    # Close the search results browser session
+
+    def _scrape_results(self, driver, query, max_products, review_count, on_product):
         # Construct search URL by replacing spaces with '+'
         search_url = f"https://www.flipkart.com/search?q={query.replace(' ', '+')}"
         driver.get(search_url)                             # Open the search results page
@@ -126,8 +134,9 @@ class FlipkartScraper:
 
             # Add all scraped details to the list
             products.append([product_id, title, rating, total_reviews, price, top_reviews])
+            if on_product:
+                on_product(products[-1])
 
-        driver.quit()    # Close the search results browser session
         return products  # Return list of product info + reviews
     
     def save_to_csv(self, data, filename="product_reviews.csv"):
@@ -0,0 +1,391 @@
+import contextlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+try:
+    import fcntl
+except ImportError:  # Windows: jobs still run, but store writes and worker slots aren't locked across processes
+    fcntl = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT NOT NULL DEFAULT '',
+    items_done INTEGER NOT NULL DEFAULT 0,
+    items_total INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    cancellable INTEGER NOT NULL DEFAULT 1,
+    error TEXT,
+    worker_pid INTEGER,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    "raised inside a job at its next progress report after a cancel was requested"
+
+
+class JobQueue:
+    """Scrape/ingest jobs persisted in a local SQLite file (WAL).
+
+    The UI submits jobs and polls them; worker processes claim the oldest
+    queued job atomically and report progress back. Because state lives on
+    disk, a page refresh or a Streamlit restart doesn't lose or kill jobs,
+    and every browser session sees the same queue.
+    """
+
+    def __init__(self, db_path: str = "data/jobs.sqlite"):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if "cancellable" not in columns:  # queue files created before cancels could be refused
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN cancellable INTEGER NOT NULL DEFAULT 1")
+        self.lock = threading.Lock()
+
+    def submit(self, kind: str, params: Dict[str, Any]) -> int:
+        if kind not in HANDLERS:
+            raise ValueError(f"Unknown job kind {kind}")
+        with self.lock:
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (kind, params, status, message, created_at) VALUES (?, ?, ?, 'waiting for a worker', ?)",
+                (kind, json.dumps(params), QUEUED, time.time()),
+            )
+        log.info("Job queued", job_id=cursor.lastrowid, kind=kind)
+        return cursor.lastrowid
+
+    def claim(self, worker_pid: int) -> Optional[Dict[str, Any]]:
+        "mark the oldest queued job running for this worker; None when the queue is empty"
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT id FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (QUEUED,)).fetchone()
+                if row is not None:
+                    self.conn.execute(
+                        "UPDATE jobs SET status = ?, worker_pid = ?, started_at = ?, heartbeat_at = ?, "
+                        "message = 'starting' WHERE id = ?", (RUNNING, worker_pid, now, now, row["id"]))
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return self.get(row["id"]) if row is not None else None
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._as_dict(row) if row is not None else None
+
+    def list(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [self._as_dict(row) for row in rows]
+
+    @staticmethod
+    def _as_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        end = job["finished_at"] or time.time()
+        elapsed = end - job["started_at"] if job["started_at"] else 0.0
+        job["elapsed_s"] = elapsed
+        job["items_per_min"] = job["items_done"] * 60 / elapsed if elapsed else 0.0
+        return job
+
+    def progress(self, job_id: int, items_done: int, items_total: int, message: str,
+                 cancellable: bool = True) -> bool:
+        """record progress and heartbeat; returns whether a cancel has been requested.
+
+        `cancellable=False` refuses cancels from here on. Any cancel already
+        requested is still returned, so it is honoured before the stage starts.
+        """
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET items_done = ?, items_total = ?, message = ?, cancellable = ?, heartbeat_at = ? "
+                "WHERE id = ?", (items_done, items_total, message, int(cancellable), time.time(), job_id))
+            row = self.conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def heartbeat(self, job_id: int) -> bool:
+        "keep the job alive; returns whether a cancel is pending that the job may still be stopped for"
+        with self.lock:
+            self.conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+            row = self.conn.execute("SELECT cancel_requested, cancellable FROM jobs WHERE id = ?",
+                                    (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"] and row["cancellable"])
+
+    def finish(self, job_id: int, status: str, message: str = "", error: Optional[str] = None):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, message = ?, error = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (status, message, error, time.time(), job_id, RUNNING))
+        log.info("Job finished", job_id=job_id, status=status, error=error)
+
+    def cancel(self, job_id: int) -> bool:
+        """queued jobs are dropped at once; running ones stop at their next progress report.
+        Refused (False) while a running job is in a stage that can't be interrupted, e.g. storing documents."""
+        with self.lock:
+            dropped = self.conn.execute(
+                "UPDATE jobs SET status = ?, message = 'cancelled before start', finished_at = ? "
+                "WHERE id = ? AND status = ?", (CANCELLED, time.time(), job_id, QUEUED)).rowcount
+            flagged = self.conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, message = 'cancelling...' "
+                "WHERE id = ? AND status = ? AND cancellable = 1", (job_id, RUNNING)).rowcount
+        return bool(dropped or flagged)
+
+    def fail_stale(self, heartbeat_timeout: float) -> int:
+        "running jobs whose worker stopped heartbeating (killed, host restarted) are marked failed"
+        with self.lock:
+            return self.conn.execute(
+                "UPDATE jobs SET status = ?, error = 'worker stopped responding', finished_at = ? "
+                "WHERE status = ? AND heartbeat_at < ?",
+                (FAILED, time.time(), RUNNING, time.time() - heartbeat_timeout)).rowcount
+
+
+@contextlib.contextmanager
+def store_lock(path: str = "data/product_store.lock"):
+    "exclusive, host-wide lock around writes to the product CSV and the vector store"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class JobContext:
+    "handed to a running job to report progress; raises JobCancelled once a cancel is requested"
+
+    def __init__(self, queue: JobQueue, job: Dict[str, Any], config: dict):
+        self.queue = queue
+        self.job = job
+        self.config = config
+        self.items_done = 0
+        self.items_total = 0
+
+    def report(self, message: str, items_done: Optional[int] = None, items_total: Optional[int] = None,
+               cancellable: bool = True):
+        """record progress; `cancellable=False` marks the stage starting here as not interruptible.
+        A cancel requested before that report is still honoured, since the stage hasn't started."""
+        if items_done is not None:
+            self.items_done = items_done
+        if items_total is not None:
+            self.items_total = items_total
+        if self.queue.progress(self.job["id"], self.items_done, self.items_total, message, cancellable):
+            raise JobCancelled()
+
+    def ingestion_progress(self) -> Callable[..., None]:
+        "progress callback for DataIngestion.run_pipeline; cancels are refused once documents start being stored"
+        def progress(stage: str, done: int, total: int, interruptible: bool = True):
+            self.report(stage, done, total, cancellable=interruptible)
+        return progress
+
+    def store_lock(self):
+        return store_lock(self.config.get("jobs", {}).get("store_lock", "data/product_store.lock"))
+
+
+def _ingest(ctx: JobContext, **_):
+    from prod_assistant.etl.data_injection import DataIngestion
+    ctx.report("waiting for the product store")
+    with ctx.store_lock():
+        ctx.report("loading products")
+        DataIngestion().run_pipeline(progress=ctx.ingestion_progress())
+
+
+def _scrape(ctx: JobContext, queries: List[str], max_products: int = 1, review_count: int = 2,
+            output_path: str = "data/product_reviews.csv", ingest: bool = False, **_):
+    from prod_assistant.etl.data_scrapper import FlipkartScraper
+    scraper = FlipkartScraper()
+    products: List[list] = []
+    total = len(queries) * max_products
+
+    def on_product(row: list):
+        products.append(row)
+        ctx.report(f"scraped '{row[1]}'", ctx.items_done + 1)
+
+    ctx.report("starting browser", 0, total)
+    for i, query in enumerate(queries):
+        ctx.report(f"searching '{query}'")
+        scraper.scrape_flipkart_products(query, max_products=max_products, review_count=review_count,
+                                         on_product=on_product)
+        # a query may yield fewer products than asked for; keep the bar honest
+        ctx.report(f"finished '{query}'", items_total=len(products) + (len(queries) - i - 1) * max_products)
+
+    unique_products = {}
+    for row in products:
+        unique_products.setdefault(row[1], row)
+    ctx.report("waiting for the product store")
+    with ctx.store_lock():
+        # write aside and swap, so readers never see a half-written CSV
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        scraper.save_to_csv(list(unique_products.values()), tmp_path)
+        os.replace(tmp_path, output_path)
+        ctx.report(f"saved {len(unique_products)} products")
+        if ingest:
+            from prod_assistant.etl.data_injection import DataIngestion
+            DataIngestion().run_pipeline(progress=ctx.ingestion_progress())
+
+
+# job kind -> handler(ctx, **params)
+HANDLERS: Dict[str, Callable[..., None]] = {"scrape": _scrape, "ingest": _ingest}
+
+
+def _execute(db_path: str, job_id: int):
+    "runs one job in a child process, so a hung browser can't wedge the worker"
+    from prod_assistant.utils.config_loader import load_config
+    queue = JobQueue(db_path)
+    job = queue.get(job_id)
+    ctx = JobContext(queue, job, load_config())
+    try:
+        HANDLERS[job["kind"]](ctx, **job["params"])
+        queue.finish(job_id, DONE, "completed")
+    except JobCancelled:
+        queue.finish(job_id, CANCELLED, "cancelled")
+    except Exception as e:
+        log.error("Job failed", job_id=job_id, kind=job["kind"], error=str(e))
+        queue.finish(job_id, FAILED, "failed", error=f"{type(e).__name__}: {e}")
+
+
+class Worker:
+    """Claims and runs queued jobs one at a time until stopped.
+
+    Each job runs in a child process. The worker keeps the job's heartbeat
+    fresh while it runs, and if a cancelled job doesn't stop on its own
+    within `cancel_grace` seconds (e.g. stuck inside a page load), the child
+    is terminated. A job in a stage reported as not cancellable is never
+    terminated. At most one worker per `slot` runs on the host.
+    """
+
+    def __init__(self, db_path: str, slot: int = 0, poll_interval: float = 1.0, heartbeat_timeout: float = 120.0,
+                 cancel_grace: float = 30.0, lock_dir: str = "data/jobs"):
+        self.db_path = db_path
+        self.slot = slot
+        self.poll_interval = poll_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.cancel_grace = cancel_grace
+        self.lock_path = os.path.join(lock_dir, f"worker-{slot}.lock")
+
+    def _supervise(self, queue: JobQueue, job_id: int):
+        child = multiprocessing.Process(target=_execute, args=(self.db_path, job_id), daemon=True)
+        child.start()
+        cancel_seen = None
+        while child.is_alive():
+            child.join(self.poll_interval)
+            if not queue.heartbeat(job_id):
+                cancel_seen = None  # no cancel pending, or the job entered a stage that can't be interrupted
+            elif child.is_alive():
+                cancel_seen = cancel_seen or time.monotonic()
+                if time.monotonic() - cancel_seen > self.cancel_grace:
+                    log.warning("Terminating job that ignored cancel", job_id=job_id)
+                    child.terminate()
+                    child.join()
+                    queue.finish(job_id, CANCELLED, "cancelled (terminated)")
+        if child.exitcode not in (0, None):
+            # no-op if the child already recorded an outcome
+            queue.finish(job_id, FAILED, "failed", error=f"job process exited with code {child.exitcode}")
+
+    def run(self):
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    log.info("Job worker slot already taken", slot=self.slot)
+                    return
+            queue = JobQueue(self.db_path)
+            log.info("Job worker started", slot=self.slot, pid=os.getpid())
+            while True:
+                queue.fail_stale(self.heartbeat_timeout)
+                job = queue.claim(os.getpid())
+                if job is None:
+                    time.sleep(self.poll_interval)
+                    continue
+                log.info("Job started", job_id=job["id"], kind=job["kind"], slot=self.slot)
+                self._supervise(queue, job["id"])
+
+
+def _slot_taken(lock_path: str) -> bool:
+    if fcntl is None or not os.path.exists(lock_path):
+        return False
+    with open(lock_path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return False
+
+
+def ensure_workers(config: dict) -> int:
+    """Start detached workers for any free slot (idempotent across Streamlit reruns and sessions).
+
+    Workers outlive the UI process, so a restart doesn't kill running jobs.
+    Returns how many were started.
+    """
+    cfg = config.get("jobs", {})
+    lock_dir = os.path.dirname(cfg.get("db_path", "data/jobs.sqlite")) or "."
+    started = 0
+    for slot in range(cfg.get("workers", 2)):
+        if _slot_taken(os.path.join(lock_dir, "jobs", f"worker-{slot}.lock")):
+            continue
+        subprocess.Popen([sys.executable, "-m", "prod_assistant.etl.jobs", "--slot", str(slot)],
+                         cwd=os.getcwd(), start_new_session=True,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        started += 1
+    if started:
+        log.info("Job workers launched", count=started)
+    return started
+
+
+def load_job_queue(config: dict) -> JobQueue:
+    "the queue from the `jobs` config block"
+    return JobQueue(config.get("jobs", {}).get("db_path", "data/jobs.sqlite"))
+
+
+def load_worker(config: dict, slot: int = 0) -> Worker:
+    cfg = config.get("jobs", {})
+    db_path = cfg.get("db_path", "data/jobs.sqlite")
+    return Worker(
+        db_path,
+        slot=slot,
+        poll_interval=cfg.get("poll_interval", 1.0),
+        heartbeat_timeout=cfg.get("heartbeat_timeout", 120.0),
+        cancel_grace=cfg.get("cancel_grace", 30.0),
+        lock_dir=os.path.join(os.path.dirname(db_path) or ".", "jobs"),
+    )
+
+
+if __name__ == "__main__":
+    # normally launched by ensure_workers(); run by hand to host workers elsewhere
+    import argparse
+    from prod_assistant.utils.config_loader import load_config
+    parser = argparse.ArgumentParser(description="Run a scrape/ingest job worker")
+    parser.add_argument("--slot", type=int, default=0)
+    args = parser.parse_args()
+    load_worker(load_config(), args.slot).run()
@@ -0,0 +1,221 @@
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+from prod_assistant.retriever.catalog_index import CatalogIndex, catalog_index_path
+from prod_assistant.retriever.result_cache import bump_collection_version, collection_version_path
+from prod_assistant.utils.config_loader import load_config
+from prod_assistant.utils.model_loader import ModelLoader
+
+SNAPSHOT_FORMAT = 1
+_VECTOR_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+class Snapshot:
+    """A product collection on disk: documents, metadata and their embeddings.
+
+    Layout under `path`:
+    - manifest.json: collection, embedding model, dim, vector dtype and the shard list
+    - shard-N.npy: one shard's vectors, a (rows, dim) float32/float16 array
+    - shard-N.jsonl: the same rows' {"id", "text", "metadata"}, one per line
+
+    Shards are written as they fill so exports stream, and restores read
+    them with mmap; the manifest is written last, so a partial export is
+    never mistaken for a complete one.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @property
+    def manifest(self) -> Dict[str, Any]:
+        with open(self._file("manifest.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def write(self, batches: Iterator[Tuple[np.ndarray, List[Document]]], collection: str,
+              embedding_model: Dict[str, Any], dtype: str = "float32") -> Dict[str, Any]:
+        if dtype not in _VECTOR_DTYPES:
+            raise ValueError(f"Unsupported snapshot dtype {dtype}, expected one of {sorted(_VECTOR_DTYPES)}")
+        os.makedirs(self.path, exist_ok=True)
+        shards, rows, dim = [], 0, None
+        for vectors, documents in batches:
+            if not documents:
+                continue
+            name = f"shard-{len(shards):05d}"
+            vectors = np.asarray(vectors, dtype=_VECTOR_DTYPES[dtype])
+            dim = vectors.shape[1]
+            np.save(self._file(f"{name}.npy"), vectors)
+            with open(self._file(f"{name}.jsonl"), "w", encoding="utf-8") as f:
+                for doc in documents:
+                    f.write(json.dumps({"id": doc.id, "text": doc.page_content, "metadata": doc.metadata},
+                                       default=str) + "\n")
+            shards.append({"name": name, "rows": len(documents)})
+            rows += len(documents)
+            log.info("Snapshot shard written", shard=name, rows=rows)
+        manifest = {"format": SNAPSHOT_FORMAT, "collection": collection, "embedding_model": embedding_model,
+                    "dim": dim, "dtype": dtype, "rows": rows, "shards": shards, "created_at": time.time()}
+        tmp_path = self._file(f"manifest.json.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self._file("manifest.json"))
+        return manifest
+
+    def batches(self, batch_size: int = 1000) -> Iterator[Tuple[np.ndarray, List[Document]]]:
+        "(float32 vectors, documents) in `batch_size` slices, shard by shard"
+        for shard in self.manifest["shards"]:
+            vectors = np.load(self._file(f"{shard['name']}.npy"), mmap_mode="r")
+            with open(self._file(f"{shard['name']}.jsonl"), "r", encoding="utf-8") as f:
+                records = [json.loads(line) for line in f]
+            for start in range(0, len(records), batch_size):
+                documents = [Document(page_content=r["text"], metadata=r["metadata"], id=r["id"])
+                             for r in records[start:start + batch_size]]
+                yield np.asarray(vectors[start:start + batch_size], dtype=np.float32), documents
+
+
+class SnapshotTool:
+    """Exports the configured vector collection to a Snapshot and bulk-loads one back.
+
+    Works against AstraDB or the local ANN index, whichever `vector_index.backend`
+    selects. Restores write stored vectors directly, so nothing is re-embedded:
+    AstraDB batches go out `concurrency` at a time; the local index streams the
+    documents and builds once from all vectors. A restore only goes into an
+    empty target unless `replace` clears it first.
+    """
+
+    def __init__(self, config: Optional[dict] = None):
+        self.config = config or load_config()
+        cfg = self.config.get("snapshot", {})
+        self.batch_size = cfg.get("batch_size", 100)
+        self.shard_size = cfg.get("shard_size", 10_000)
+        self.concurrency = cfg.get("concurrency", 8)
+        self.dtype = cfg.get("dtype", "float32")
+        self.local = self.config.get("vector_index", {}).get("backend", "astra") == "local"
+        self.collection_name = self.config["astra_db"]["collection_name"]
+
+    def _astra_collection(self):
+        "the astrapy collection behind the LangChain store (created with the right dimension if missing)"
+        from langchain_astradb import AstraDBVectorStore
+        load_dotenv()
+        required_keys = ['ASTRA_DB_API_ENDPOINT', 'ASTRA_DB_APPLICATION_TOKEN', 'ASTRA_DB_KEYSPACE']
+        missing_vars = [var for var in required_keys if os.getenv(var) is None]
+        if missing_vars:
+            raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
+        vstore = AstraDBVectorStore(
+            embedding=ModelLoader().load_embedding_model(),
+            collection_name=self.collection_name,
+            token=os.getenv('ASTRA_DB_APPLICATION_TOKEN'),
+            api_endpoint=os.getenv('ASTRA_DB_API_ENDPOINT'),
+            namespace=os.getenv('ASTRA_DB_KEYSPACE'),
+        )
+        return vstore.astra_env.collection
+
+    def _local_index(self):
+        from prod_assistant.retriever.ann_index import load_ann_index
+        return load_ann_index(self.config)
+
+    def _astra_batches(self) -> Iterator[Tuple[np.ndarray, List[Document]]]:
+        collection = self._astra_collection()
+        # LangChain's AstraDB store keeps page_content under "content" and metadata under "metadata"
+        cursor = collection.find({}, projection={"content": True, "metadata": True, "$vector": True})
+        vectors, documents = [], []
+        for record in cursor:
+            vectors.append(record["$vector"])
+            documents.append(Document(page_content=record.get("content", ""),
+                                      metadata=record.get("metadata", {}), id=str(record["_id"])))
+            if len(documents) >= self.shard_size:
+                yield np.asarray(vectors, dtype=np.float32), documents
+                vectors, documents = [], []
+        if documents:
+            yield np.asarray(vectors, dtype=np.float32), documents
+
+    def export(self, path: str) -> Dict[str, Any]:
+        started = time.perf_counter()
+        batches = self._local_index().iter_rows(self.shard_size) if self.local else self._astra_batches()
+        manifest = Snapshot(path).write(batches, self.collection_name, self.config.get("embedding_model", {}),
+                                        dtype=self.dtype)
+        log.info("Snapshot exported", path=path, rows=manifest["rows"], backend="local" if self.local else "astra",
+                 seconds=round(time.perf_counter() - started, 1))
+        return manifest
+
+    def _insert_astra(self, collection, vectors: np.ndarray, documents: List[Document]) -> int:
+        records = [{"_id": doc.id, "content": doc.page_content, "metadata": doc.metadata, "$vector": vector}
+                   for doc, vector in zip(documents, vectors.tolist())]
+        collection.insert_many(records, ordered=False)
+        return len(records)
+
+    def restore(self, path: str, force: bool = False, replace: bool = False) -> Dict[str, Any]:
+        """Bulk-load a snapshot into the configured backend and rebuild the catalog index.
+
+        Refuses a snapshot from another embedding model unless `force`, since
+        its vectors wouldn't be comparable with query embeddings. Refuses a
+        non-empty target unless `replace`, which deletes its contents first:
+        appending would duplicate rows locally and AstraDB rejects existing ids.
+        """
+        snapshot = Snapshot(path)
+        manifest = snapshot.manifest
+        if manifest["embedding_model"] != self.config.get("embedding_model", {}) and not force:
+            raise ValueError(f"Snapshot was embedded with {manifest['embedding_model']}, "
+                             f"but config uses {self.config.get('embedding_model')}")
+        started = time.perf_counter()
+        inserted, documents_seen = 0, []
+        if self.local:
+            index = self._local_index()
+            if len(index) and not replace:
+                raise ValueError(f"Local index at {index.path} already holds {len(index)} rows; "
+                                 "restore with replace to overwrite it")
+
+            def batches():
+                for vectors, documents in snapshot.batches(self.shard_size):
+                    documents_seen.extend(documents)
+                    yield vectors, documents
+            inserted = index.bulk_load(batches(), replace=replace)
+        else:
+            collection = self._astra_collection()
+            if collection.find_one({}) is not None:
+                if not replace:
+                    raise ValueError(f"Collection {self.collection_name} is not empty; "
+                                     "restore with replace to overwrite it")
+                collection.delete_many({})
+                log.info("Cleared collection before restore", collection=self.collection_name)
+            pending = set()
+            # bounded in-flight batches keep memory flat while saturating the Data API
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                for vectors, documents in snapshot.batches(self.batch_size):
+                    documents_seen.extend(documents)
+                    if len(pending) >= self.concurrency * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        inserted += sum(future.result() for future in done)
+                    pending.add(executor.submit(self._insert_astra, collection, vectors, documents))
+                inserted += sum(future.result() for future in pending)
+        elapsed = time.perf_counter() - started
+        bump_collection_version(collection_version_path(self.config), self.collection_name)
+        CatalogIndex.from_documents(documents_seen).save(catalog_index_path(self.config))
+        log.info("Snapshot restored", path=path, rows=inserted, backend="local" if self.local else "astra",
+                 seconds=round(elapsed, 1), rows_per_s=round(inserted / elapsed, 1) if elapsed else None)
+        return {"rows": inserted, "seconds": elapsed}
+
+
+if __name__ == "__main__":
+    # e.g. python -m prod_assistant.etl.snapshot export data/snapshots/2026-10-19
+    #      python -m prod_assistant.etl.snapshot restore data/snapshots/2026-10-19
+    import argparse
+    parser = argparse.ArgumentParser(description="Export or restore the product vector collection")
+    parser.add_argument("action", choices=["export", "restore"])
+    parser.add_argument("path", help="snapshot directory")
+    parser.add_argument("--force", action="store_true", help="restore even if the embedding model differs")
+    parser.add_argument("--replace", action="store_true", help="delete the target's contents before restoring")
+    args = parser.parse_args()
+    tool = SnapshotTool()
+    result = (tool.export(args.path) if args.action == "export"
+              else tool.restore(args.path, force=args.force, replace=args.replace))
+    print(json.dumps({k: v for k, v in result.items() if k != "shards"}, indent=2))
@@ -0,0 +1,230 @@
+import asyncio
+import json
+import os
+import queue
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+from prod_assistant.utils.rate_limiter import Priority, priority_scope
+
+# metric name -> async scorer(query, response, contexts) in ragas_eval
+METRICS = {
+    "context_precision": "ascore_context_precision",
+    "response_relevancy": "ascore_response_relevancy",
+}
+
+
+def variant_of(config: dict) -> str:
+    """The speed/quality knobs a turn ran with, so scores can be compared across settings.
+
+    Only settings that change what the generator sees or how it gets there
+    are included; rolling stats are grouped by this label.
+    """
+    retriever_cfg = config.get("retriever", {})
+    knobs = {
+        "top_k": retriever_cfg.get("top_k"),
+        "fetch_k": retriever_cfg.get("fetch_k"),
+        "grader": config.get("grader", {}).get("strategy"),
+        "speculative": config.get("workflow", {}).get("speculative_search", False),
+        "vector_index": config.get("vector_index", {}).get("backend", "astra"),
+        "llm": os.getenv("LLM_PROVIDER", "openai"),
+    }
+    return ",".join(f"{k}={v}" for k, v in knobs.items())
+
+
+def _summary(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"n": 0, "mean": None, "p50": None}
+    return {"n": len(values), "mean": statistics.fmean(values), "p50": statistics.median(values)}
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class OnlineEvaluator:
+    """Samples finished chat turns and scores them with ragas off the request path.
+
+    `submit` only records latency, draws the sample and does a non-blocking
+    put on a bounded queue. When the queue is full the turn is dropped and
+    counted, so the evaluator never slows down or backs up requests. A
+    single daemon thread drains the queue on its own event loop at
+    background rate-limit priority, with evaluator models dedicated to that
+    loop (see ragas_eval). `stop` ends the thread.
+
+    Scores and latencies are kept over the last `window` turns, overall and
+    per `variant` (see `variant_of`), so a faster setting that hurts answer
+    quality shows up next to the one it replaced. Results can also be
+    appended to a JSONL file for offline analysis.
+    """
+
+    def __init__(self, sample_rate: float = 0.05, max_queue: int = 100, window: int = 500,
+                 timeout: float = 60.0, metrics: Optional[List[str]] = None, log_path: Optional[str] = None):
+        unknown = set(metrics or []) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Unsupported online_eval metrics {sorted(unknown)}, expected {sorted(METRICS)}")
+        self.sample_rate = sample_rate
+        self.timeout = timeout
+        self.metrics = list(metrics or METRICS)
+        self.log_path = log_path
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._latencies: Deque[tuple] = deque(maxlen=window)  # (variant, source, latency_s) for every turn
+        self._scores: Deque[Dict[str, Any]] = deque(maxlen=window)
+        self._counters = {"turns": 0, "sampled": 0, "dropped": 0, "evaluated": 0, "failed": 0}
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def _ensure_worker(self):
+        "called under the lock"
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._work, name="online-eval", daemon=True)
+            self._thread.start()
+
+    def submit(self, query: str, answer: str, context: str, latency_s: float, variant: str = "",
+               source: str = "graph"):
+        """Record one finished turn; never blocks.
+
+        `source` is "graph" for a full workflow run, "cache" for an answer
+        cache hit and "deadline" for a best-effort answer. Only graph turns
+        are sampled for scoring, since the others didn't produce a new answer.
+        """
+        with self._lock:
+            self._counters["turns"] += 1
+            self._latencies.append((variant, source, latency_s))
+            if self._stopped.is_set() or source != "graph" or not answer or random.random() >= self.sample_rate:
+                return
+            self._counters["sampled"] += 1
+            try:
+                self._queue.put_nowait({"query": query, "answer": answer, "context": context,
+                                        "latency_s": latency_s, "variant": variant, "at": time.time()})
+            except queue.Full:
+                self._counters["dropped"] += 1
+                return
+            self._ensure_worker()
+
+    def stop(self):
+        "stop sampling and end the worker thread; items still queued are dropped"
+        self._stopped.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass  # the worker is busy and sees the flag after its current item
+
+    def _work(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None or self._stopped.is_set():
+                    return
+                try:
+                    with priority_scope(Priority.BACKGROUND):
+                        scores = loop.run_until_complete(asyncio.wait_for(self._score(item), self.timeout))
+                    self._record(item, scores)
+                except Exception as e:
+                    with self._lock:
+                        self._counters["failed"] += 1
+                    log.warning("Online evaluation failed", error=str(e) or type(e).__name__)
+                finally:
+                    self._queue.task_done()
+        finally:
+            loop.close()
+
+    async def _score(self, item: Dict[str, Any]) -> Dict[str, float]:
+        from prod_assistant.evaluation import ragas_eval
+        contexts = [item["context"]] if item["context"] else []
+        scores = {}
+        for metric in self.metrics:
+            if metric == "context_precision" and not contexts:
+                continue  # answered without retrieval; nothing to judge
+            score = await getattr(ragas_eval, METRICS[metric])(item["query"], item["answer"], contexts)
+            scores[metric] = float(score)
+        return scores
+
+    def _record(self, item: Dict[str, Any], scores: Dict[str, float]):
+        record = {"at": item["at"], "variant": item["variant"], "latency_s": item["latency_s"], **scores}
+        with self._lock:
+            self._counters["evaluated"] += 1
+            self._scores.append(record)
+        if self.log_path:
+            os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({**record, "query": item["query"]}) + "\n")
+
+    def _window_stats(self, scores: List[Dict[str, Any]], latencies: List[float]) -> Dict[str, Any]:
+        return {
+            "latency_s": {"n": len(latencies), "p50": _percentile(latencies, 0.5), "p95": _percentile(latencies, 0.95)},
+            **{metric: _summary([s[metric] for s in scores if metric in s]) for metric in self.metrics},
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies, scores = list(self._latencies), list(self._scores)
+            counters = dict(self._counters)
+        sources: Dict[str, int] = {}
+        for _, source, _ in latencies:
+            sources[source] = sources.get(source, 0) + 1
+        # cache hits would mask a slower workflow, so latency percentiles cover generated turns only
+        generated = [(v, l) for v, source, l in latencies if source != "cache"]
+        variants = sorted({v for v, _ in generated} | {s["variant"] for s in scores})
+        return {
+            **counters,
+            "queue_depth": self._queue.qsize(),
+            "sample_rate": self.sample_rate,
+            "turns_by_source": sources,
+            "overall": self._window_stats(scores, [l for _, l in generated]),
+            "by_variant": {
+                variant: self._window_stats([s for s in scores if s["variant"] == variant],
+                                            [l for v, l in generated if v == variant])
+                for variant in variants
+            },
+        }
+
+
+_evaluator: Optional[OnlineEvaluator] = None
+_evaluator_config: Optional[str] = None
+_evaluator_lock = threading.Lock()
+
+
+def load_online_evaluator(config: dict) -> Optional[OnlineEvaluator]:
+    """Process-wide evaluator from the `online_eval` config block; None when disabled.
+
+    Rebuilt only when the block changes, so rolling stats survive unrelated reloads;
+    the replaced evaluator's thread is stopped.
+    """
+    global _evaluator, _evaluator_config
+    cfg = config.get("online_eval", {})
+    if not cfg.get("enabled", False) or not cfg.get("sample_rate", 0.05):
+        return None
+    with _evaluator_lock:
+        fingerprint = json.dumps(cfg, sort_keys=True, default=str)
+        if fingerprint != _evaluator_config:
+            if _evaluator is not None:
+                _evaluator.stop()
+            _evaluator = OnlineEvaluator(
+                sample_rate=cfg.get("sample_rate", 0.05),
+                max_queue=cfg.get("max_queue", 100),
+                window=cfg.get("window", 500),
+                timeout=cfg.get("timeout", 60.0),
+                metrics=cfg.get("metrics"),
+                log_path=cfg.get("log_path"),
+            )
+            _evaluator_config = fingerprint
+            log.info("Online evaluation enabled", sample_rate=_evaluator.sample_rate, metrics=_evaluator.metrics)
+        return _evaluator
+
+
+def online_eval_stats() -> Dict[str, Any]:
+    with _evaluator_lock:
+        evaluator = _evaluator
+    return evaluator.stats() if evaluator else {}
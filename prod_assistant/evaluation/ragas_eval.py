@@ -1,55 +1,78 @@
 import asyncio
+import functools
+import threading
+import weakref
 from prod_assistant.utils.model_loader import ModelLoader
-from ragas import SingleTurnSample
-from ragas.llms import LangchainLLMWrapper
-from ragas.embeddings import LangchainEmbeddingsWrapper
-from ragas.metrics import ResponseRelevancy,LLMContextPrecisionWithoutReference
-import grpc.experimental.aio as grpc_aio
-from prod_assistant.utils.model_loader import ModelLoader
+from prod_assistant.utils.rate_limiter import Priority,priority_scope
+
+
+@functools.lru_cache(maxsize=1)
+def _model_loader() -> ModelLoader:
+    "created on first evaluation rather than at import"
+    # grpc aio must be initialised before the Gemini client is used from asyncio
+    import grpc.experimental.aio as grpc_aio
+    grpc_aio.init_grpc_aio()
+    return ModelLoader()
+
+_loop_models: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_loop_models_lock = threading.Lock()
+
+def _evaluator_models():
+    """(llm, embeddings) for the running event loop.
+    evaluation runs on loops of its own (asyncio.run, the online evaluator's thread), so it gets dedicated
+    clients per loop instead of the app's shared HTTP pool, in-flight futures and response cache"""
+    loop = asyncio.get_running_loop()
+    with _loop_models_lock:
+        models = _loop_models.get(loop)
+    if models is None:
+        loader = _model_loader()
+        models = (loader.load_llm(dedicated = True),loader.load_embedding_model(dedicated = True))
+        with _loop_models_lock:
+            models = _loop_models.setdefault(loop,models)
+    return models
+
+async def ascore_context_precision(query,response,retrieved_context) -> float:
+    "LLM-judged precision of the retrieved context for the query (no reference answer needed)"
+    from ragas import SingleTurnSample
+    from ragas.llms import LangchainLLMWrapper
+    from ragas.metrics import LLMContextPrecisionWithoutReference
+    sample = SingleTurnSample(
+        user_input = query,
+        response = response,
+        retrieved_contexts = retrieved_context
+    )
+    llm,_ = _evaluator_models()
+    evaluator_llm = LangchainLLMWrapper(llm)
+    context_precision =LLMContextPrecisionWithoutReference(llm = evaluator_llm)
+    return await context_precision.single_turn_ascore(sample)
 
-grpc_aio.init_grpc_aio()
-Model_loader = ModelLoader()
+async def ascore_response_relevancy(query,response,retrieved_context) -> float:
+    "how well the response addresses the query, via questions regenerated from the response"
+    from ragas import SingleTurnSample
+    from ragas.llms import LangchainLLMWrapper
+    from ragas.embeddings import LangchainEmbeddingsWrapper
+    from ragas.metrics import ResponseRelevancy
+    sample = SingleTurnSample(
+        user_input = query,
+        response = response,
+        retrieved_contexts = retrieved_context
+    )
+    llm,embedding_model = _evaluator_models()
+    evaluator_llm = LangchainLLMWrapper(llm)
+    evaluator_embeddings = LangchainEmbeddingsWrapper(embedding_model)
+    scorer = ResponseRelevancy(llm = evaluator_llm, embeddings = evaluator_embeddings)
+    return await scorer.single_turn_ascore(sample)
 
 def evaluate_context_precision(query,response,retrieved_context):
     try:
-        sample = SingleTurnSample(
-            user_input = query,
-            response = response,
-            retrieved_contexts = retrieved_context
-        )
-        
-        async def main():
-            llm = Model_loader.load_llm()
-            evaluator_llm = LangchainLLMWrapper(llm)
-            context_precision =LLMContextPrecisionWithoutReference(llm = evaluator_llm)
-            result = await context_precision.single_turn_ascore(sample)
-            return result
-        
-        return asyncio.run(main())
-    
+        with priority_scope(Priority.BACKGROUND):
+            return asyncio.run(ascore_context_precision(query,response,retrieved_context))
     except Exception as e:
         return e
 
 def evaluate_response_relevancy(query,response,retrieved_context):
     try:
-        sample = SingleTurnSample(
-            user_query = query,
-            response = response,
-            retrieved_contexts = retrieved_context
-        )
-        
-        async def main():
-            llm = Model_loader.load_llm()
-            evaluator_llm = LangchainLLMWrapper(llm)
-            embedding_model = Model_loader.load_embedding_model()
-            evaluator_embeddings = LangchainEmbeddingsWrapper(embedding_model)
-            scorer = ResponseRelevancy(llm = evaluator_llm, embeddings = evaluator_embeddings)
-            result = await scorer.single_turn_ascore(sample)
-            return result
-        
-        return asyncio.run(main())
-    
+        with priority_scope(Priority.BACKGROUND):
+            return asyncio.run(ascore_response_relevancy(query,response,retrieved_context))
     except Exception as e:
         return e
-    
-    
\ No newline at end of file
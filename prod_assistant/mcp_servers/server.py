@@ -1,52 +1,148 @@
+import argparse
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import threading
 from mcp.server.fastmcp import FastMCP
-from langchain_community.tools import DuckDuckGoSearchRun
-from prod_assistant.retriever.retrieval import Retriever
-
+from prod_assistant.retriever.context_packer import load_context_packer
+from prod_assistant.utils.config_loader import load_config
+from prod_assistant.logger import GLOBAL_LOGGER as log
 
 
 mcp = FastMCP('Hybrid_search')
-retriever_obj = Retriever()
-retriever = retriever_obj.load_retriever()
-search = DuckDuckGoSearchRun()
 
-def format_docs(docs):
-    "format retriever docs into readable format"
+_init_lock = threading.Lock()
+
+
+# Heavy dependencies are built on the first tool call, not at import, so each
+# worker process initializes its own copy lazily
+@functools.lru_cache(maxsize=1)
+def get_retriever_obj():
+    from prod_assistant.retriever.retrieval import Retriever
+    return Retriever()
+
+def get_retriever():
+    # resolved per call so a config reload that resets the retriever takes effect;
+    # the lock keeps concurrent first calls from building two AstraDB clients
+    with _init_lock:
+        return get_retriever_obj().load_retriever()
+
+@functools.lru_cache(maxsize=1)
+def get_web_search():
+    from prod_assistant.mcp_servers.web_search import load_web_search
+    return load_web_search(load_config())
+
+@functools.lru_cache(maxsize=1)
+def get_packer():
+    return load_context_packer(load_config())
+
+def server_config() -> dict:
+    return load_config().get("mcp_server", {})
+
+@functools.lru_cache(maxsize=1)
+def get_executor() -> concurrent.futures.ThreadPoolExecutor:
+    "bounded pool for the blocking AstraDB / LLM filter calls"
+    return concurrent.futures.ThreadPoolExecutor(
+        max_workers=server_config().get("max_threads", 16), thread_name_prefix="mcp-tool"
+    )
+
+@functools.lru_cache(maxsize=None)
+def get_semaphore(tool: str) -> asyncio.Semaphore:
+    return asyncio.Semaphore(server_config().get(f"{tool}_concurrency", 8))
+
+async def run_blocking(tool: str, fn, *args):
+    """Run `fn(*args)` on the tool pool without blocking the event loop.
+
+    At most `<tool>_concurrency` calls per tool run at once; a call that
+    exceeds `<tool>_timeout` raises asyncio.TimeoutError (the worker thread
+    finishes in the background).
+    """
+    timeout = server_config().get(f"{tool}_timeout", 30)
+    async with get_semaphore(tool):
+        ctx = contextvars.copy_context()
+        future = asyncio.get_running_loop().run_in_executor(get_executor(), ctx.run, fn, *args)
+        return await asyncio.wait_for(future, timeout)
+
+def format_docs(docs, query: str = ""):
+    "format retriever docs into readable format, packed into the LLM context budget"
     if not docs:
-        return "No context found"
-    format_chunks = []
-    for d in docs:
-        meta = d.metadata or {}
-        formatted = (
-            f"Title: {meta.get('product_title','N/A')}\n"
-            f"Price: {meta.get('price','N/A')}\n"
-            f"Rating: {meta.get('rating', 'N/A')}\n"
-            f"Reviews: \n{d.page_content.strip()}"
-        )
-        format_chunks.append(formatted)
-    return "\n\n".join(format_chunks)
+        return ""
+    context, _ = get_packer().pack(docs, query)
+    return context
+
+def _retrieve(query: str, compress: bool = True) -> str:
+    get_retriever()  # first call builds the retriever under the init lock
+    docs = get_retriever_obj().call_retriever(query, compress=compress)  # served from the result cache when possible
+    return format_docs(docs, query)
 
 @mcp.tool()
-async def get_product_info(query: str):
-    "retrieve product information for a given query"
+async def get_product_info(query: str, compress: bool = True):
+    """retrieve product information for a given query; compress=False skips the slower LLM relevance filter.
+    returns an empty string when nothing was found or retrieval failed, so callers fall back instead of
+    treating an error message as product context"""
     try:
-        docs = retriever.invoke(query)
-        context = format_docs(docs)
-        if not context.strip():
-            return "No context found"
-        return context
+        context = await run_blocking("retriever", _retrieve, query, compress)
+        return context if context.strip() else ""
+    except asyncio.TimeoutError:
+        log.warning("Retriever tool timed out", query=query)
+        return ""
     except Exception as e:
-        return f"error in retrieving product info {e}"
-    
+        log.error("Retriever tool failed", query=query, error=str(e))
+        return ""
+
 @mcp.tool()
 async def search_web(query: str):
     "search web for a given query"
     try:
-        return search.run(query)
+        # cached and time-bounded; falls back to a stale result when upstream is slow
+        return await get_web_search().search(query)
     except Exception as e:
-        return f"error in searching web {e}"
+        log.error("Web search tool failed", query=query, error=str(e))
+        return ""
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics(request):
+    """per-worker retrieval/web search/shared cache and LLM filter cache stats, collapsed duplicate calls
+    and rate limiter queues"""
+    from starlette.responses import JSONResponse
+    from prod_assistant.utils.single_flight import single_flight_stats
+    from prod_assistant.utils.shared_cache import shared_cache_stats
+    from prod_assistant.utils.llm_cache import llm_cache_stats
+    from prod_assistant.utils.rate_limiter import limiter_stats
+    return JSONResponse({
+        "single_flight": single_flight_stats(),
+        "shared_cache": shared_cache_stats(),
+        "llm_cache": llm_cache_stats(),
+        "rate_limits": limiter_stats(),
+        "retrieval_cache": get_retriever_obj().cache_stats() if get_retriever_obj.cache_info().currsize else {},
+        "web_search": get_web_search().stats() if get_web_search.cache_info().currsize else {},
+    })
+
+def create_app():
+    """ASGI app for one worker process (used as a uvicorn factory).
+
+    Stateless HTTP so any worker can serve any request; warm-up runs on the
+    tool pool so the worker starts accepting traffic immediately.
+    """
+    mcp.settings.stateless_http = True
+    get_executor().submit(get_retriever)
+    return mcp.streamable_http_app()
 
 if __name__ == "__main__":
-    mcp.run(transport='streamable-http')
-    
-    
-        
\ No newline at end of file
+    cfg = server_config()
+    parser = argparse.ArgumentParser(description="Hybrid search MCP server")
+    parser.add_argument("--host", default=cfg.get("host", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=cfg.get("port", 8000))
+    parser.add_argument("--workers", type=int, default=cfg.get("workers", 1))
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        import uvicorn
+        uvicorn.run("prod_assistant.mcp_servers.server:create_app", factory=True,
+                    host=args.host, port=args.port, workers=args.workers)
+    else:
+        # warm up before accepting traffic so the first tool call isn't slow
+        get_retriever()
+        mcp.settings.host, mcp.settings.port = args.host, args.port
+        mcp.run(transport='streamable-http')
@@ -0,0 +1,178 @@
+import asyncio
+import itertools
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.tools import ToolException
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+
+class _SessionSlot:
+    """One long-lived MCP session and the tools bound to it.
+
+    The session is opened and closed inside a dedicated task because the
+    streamable HTTP transport's task groups must be exited by the task that
+    entered them.
+    """
+
+    def __init__(self, client: MultiServerMCPClient, server_name: str):
+        self.client = client
+        self.server_name = server_name
+        self.tools: Dict[str, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._closed = asyncio.Event()
+        self._error: Optional[BaseException] = None
+
+    @property
+    def alive(self) -> bool:
+        return self._task is not None and not self._task.done() and bool(self.tools)
+
+    async def start(self):
+        self._ready, self._closed, self._error = asyncio.Event(), asyncio.Event(), None
+        self._task = asyncio.create_task(self._run())
+        await self._ready.wait()
+        if self._error:
+            raise self._error
+
+    async def _run(self):
+        try:
+            async with self.client.session(self.server_name) as session:
+                # name-indexed once per session instead of scanning per call
+                self.tools = {t.name: t for t in await load_mcp_tools(session)}
+                self._ready.set()
+                await self._closed.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.tools = {}
+            self._ready.set()
+
+    async def stop(self):
+        self._closed.set()
+        if self._task:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+
+
+class MCPSessionPool:
+    """Persistent, reconnecting sessions to one MCP server with cached tool handles.
+
+    Calls are spread round-robin over `size` sessions. When a call fails
+    because the server went away, that session is reopened with exponential
+    backoff and the call retried.
+    """
+
+    def __init__(self, connections: dict, server_name: str = "hybrid_search", size: int = 1,
+                 max_retries: int = 3, base_backoff: float = 0.5, max_backoff: float = 10.0):
+        self.client = MultiServerMCPClient(connections)
+        self.server_name = server_name
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._slots = [_SessionSlot(self.client, server_name) for _ in range(max(size, 1))]
+        self._round_robin = itertools.cycle(range(len(self._slots)))
+        self._locks = [asyncio.Lock() for _ in self._slots]
+        self._counters = {"calls": 0, "reconnects": 0, "failures": 0}
+
+    async def connect(self):
+        await asyncio.gather(*(self._ensure(i) for i in range(len(self._slots))))
+        log.info("MCP session pool connected", server=self.server_name, sessions=len(self._slots),
+                 tools=self.tool_names())
+
+    async def _ensure(self, index: int, attempt: int = 0):
+        slot = self._slots[index]
+        async with self._locks[index]:
+            if slot.alive:
+                return slot
+            if attempt:
+                delay = min(self.base_backoff * 2 ** (attempt - 1), self.max_backoff) * (0.5 + random.random() / 2)
+                await asyncio.sleep(delay)
+                self._counters["reconnects"] += 1
+                log.info("Reconnecting MCP session", server=self.server_name, attempt=attempt)
+            await slot.stop()
+            await slot.start()
+            return slot
+
+    def tool_names(self) -> List[str]:
+        return sorted({name for slot in self._slots for name in slot.tools})
+
+    async def call(self, tool_name: str, args: dict) -> Any:
+        index = next(self._round_robin)
+        last_error: Optional[BaseException] = None
+        self._counters["calls"] += 1
+        for attempt in range(self.max_retries + 1):
+            try:
+                slot = await self._ensure(index, attempt)
+                tool = slot.tools.get(tool_name)
+                if tool is None:
+                    raise KeyError(f"MCP tool {tool_name} not available on {self.server_name}")
+                return await tool.ainvoke(args)
+            except (KeyError, ToolException):
+                # the server answered; retrying on a new session won't help
+                raise
+            except Exception as e:
+                last_error = e
+                log.warning("MCP call failed", tool=tool_name, attempt=attempt, error=str(e))
+                # force the next attempt to reopen this session
+                await self._slots[index].stop()
+        self._counters["failures"] += 1
+        raise last_error
+
+    async def close(self):
+        await asyncio.gather(*(slot.stop() for slot in self._slots))
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "live_sessions": sum(slot.alive for slot in self._slots)}
+
+
+def load_session_pool(config: dict) -> MCPSessionPool:
+    "build the pool from the `mcp_client` config block"
+    cfg = config.get("mcp_client", {})
+    server_name = cfg.get("server_name", "hybrid_search")
+    return MCPSessionPool(
+        {server_name: {"transport": "streamable_http", "url": cfg.get("url", "http://localhost:8000/mcp")}},
+        server_name=server_name,
+        size=cfg.get("pool_size", 1),
+        max_retries=cfg.get("max_retries", 3),
+        base_backoff=cfg.get("base_backoff", 0.5),
+        max_backoff=cfg.get("max_backoff", 10.0),
+    )
+
+
+if __name__ == "__main__":
+    # Benchmark per-call overhead: fresh session per call (get_tools) vs pooled session
+    import sys
+    from prod_assistant.utils.config_loader import load_config
+
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    query = sys.argv[2] if len(sys.argv) > 2 else "iphone 16"
+
+    async def bench():
+        pool = load_session_pool(load_config())
+
+        start = time.perf_counter()
+        for _ in range(calls):
+            tools = await pool.client.get_tools()
+            tool = next(t for t in tools if t.name == "get_product_info")
+            await tool.ainvoke({"query": query})
+        per_call_before = (time.perf_counter() - start) / calls
+
+        await pool.connect()
+        start = time.perf_counter()
+        for _ in range(calls):
+            await pool.call("get_product_info", {"query": query})
+        per_call_after = (time.perf_counter() - start) / calls
+        await pool.close()
+
+        print(f"per-call, new session each time: {per_call_before * 1000:.1f} ms")
+        print(f"per-call, pooled session:        {per_call_after * 1000:.1f} ms")
+        print(f"pool stats: {pool.stats()}")
+
+    asyncio.run(bench())
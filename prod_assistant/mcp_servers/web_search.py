@@ -0,0 +1,223 @@
+import asyncio
+import concurrent.futures
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+
+class WebSearchBackend(ABC):
+    "blocking web search; implementations are called from a worker thread"
+
+    name = "base"
+
+    @abstractmethod
+    def search(self, query: str) -> str:
+        ...
+
+
+class DuckDuckGoBackend(WebSearchBackend):
+    name = "duckduckgo"
+
+    def __init__(self):
+        from langchain_community.tools import DuckDuckGoSearchRun
+        self._tool = DuckDuckGoSearchRun()
+
+    def search(self, query: str) -> str:
+        return self._tool.run(query)
+
+
+class StubBackend(WebSearchBackend):
+    "canned results with configurable latency, for tests and benchmarks"
+
+    name = "stub"
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, results: Optional[Dict[str, str]] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.results = results or {}
+
+    def search(self, query: str) -> str:
+        time.sleep(self.latency + random.random() * self.jitter)
+        return self.results.get(query, f"Stub web result for: {query}")
+
+
+BACKENDS = {"duckduckgo": DuckDuckGoBackend, "stub": StubBackend}
+
+
+class WebSearchQueueFull(RuntimeError):
+    pass
+
+
+class WebSearchService:
+    """Time-bounded web search with a TTL cache in front of a pluggable backend.
+
+    - fresh results (younger than `ttl`) are served from the cache
+    - a lookup never waits longer than `timeout`; on timeout or error the
+      last result for the query is returned if it is younger than `stale_ttl`,
+      otherwise an empty string, so callers can't mistake the failure for a result
+    - a search that times out keeps running and fills the cache for the
+      next caller; identical in-flight queries share one backend call
+    - at most `max_concurrency` backend calls run at once and at most
+      `max_pending` may be queued; beyond that the lookup fails fast
+    """
+
+    def __init__(self, backend: WebSearchBackend, ttl: float = 900, stale_ttl: float = 86400,
+                 max_entries: int = 1024, timeout: float = 8.0, max_concurrency: int = 4,
+                 max_pending: int = 32):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.max_pending = max_pending
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency,
+                                                               thread_name_prefix="web-search")
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "stale_hits": 0, "misses": 0, "timeouts": 0, "errors": 0, "rejected": 0}
+        self._latency_total = 0.0
+        self._latency_count = 0
+
+    @staticmethod
+    def _key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _lookup(self, key: str, max_age: float) -> Optional[str]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or time.time() - entry[0] > max_age:
+                return None
+            self._cache.move_to_end(key)
+            return entry[1]
+
+    def _store(self, key: str, result: str):
+        with self._lock:
+            self._cache[key] = (time.time(), result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _timed_search(self, query: str) -> str:
+        start = time.monotonic()
+        result = self.backend.search(query)
+        with self._lock:
+            self._latency_total += time.monotonic() - start
+            self._latency_count += 1
+        return result
+
+    def _start(self, key: str, query: str) -> asyncio.Future:
+        future = self._in_flight.get(key)
+        if future is not None:
+            return future
+        if len(self._in_flight) >= self.max_pending:
+            raise WebSearchQueueFull("web search queue is full")
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._timed_search, query)
+        self._in_flight[key] = future
+
+        def _done(f: asyncio.Future):
+            self._in_flight.pop(key, None)
+            if not f.cancelled() and f.exception() is None and f.result():
+                self._store(key, f.result())
+
+        future.add_done_callback(_done)
+        return future
+
+    def _fallback(self, key: str, reason: str) -> str:
+        stale = self._lookup(key, self.stale_ttl)
+        if stale is not None:
+            self._counters["stale_hits"] += 1
+            log.info("Serving stale web search result", reason=reason)
+            return stale
+        log.warning("No web search result to fall back on", reason=reason)
+        return ""
+
+    async def search(self, query: str) -> str:
+        key = self._key(query)
+        cached = self._lookup(key, self.ttl)
+        if cached is not None:
+            self._counters["hits"] += 1
+            return cached
+        self._counters["misses"] += 1
+        try:
+            future = self._start(key, query)
+            # shield so a timed-out search still completes and fills the cache
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self._counters["timeouts"] += 1
+            log.warning("Web search timed out", backend=self.backend.name, timeout=self.timeout)
+            return self._fallback(key, "search timed out")
+        except WebSearchQueueFull as e:
+            self._counters["rejected"] += 1
+            return self._fallback(key, str(e))
+        except Exception as e:
+            self._counters["errors"] += 1
+            log.warning("Web search failed", backend=self.backend.name, error=str(e))
+            return self._fallback(key, "search failed")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._cache)
+            avg = self._latency_total / self._latency_count if self._latency_count else 0.0
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            **self._counters,
+            "backend": self.backend.name,
+            "size": size,
+            "in_flight": len(self._in_flight),
+            "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+            "avg_backend_latency_s": avg,
+        }
+
+
+def load_web_search(config: dict) -> WebSearchService:
+    "build the service from the `web_search` config block"
+    cfg = config.get("web_search", {})
+    backend = BACKENDS[cfg.get("backend", "duckduckgo")]()
+    return WebSearchService(
+        backend,
+        ttl=cfg.get("ttl_seconds", 900),
+        stale_ttl=cfg.get("stale_ttl_seconds", 86400),
+        max_entries=cfg.get("max_entries", 1024),
+        timeout=cfg.get("timeout", 8.0),
+        max_concurrency=cfg.get("max_concurrency", 4),
+        max_pending=cfg.get("max_pending", 32),
+    )
+
+
+if __name__ == "__main__":
+    # Benchmark against the stub: slow upstream, repeated queries
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Web search cache/timeout benchmark (stub backend)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=1.5)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    async def bench():
+        service = WebSearchService(StubBackend(args.latency, args.jitter), timeout=args.timeout)
+        latencies = []
+
+        async def one(i: int):
+            start = time.perf_counter()
+            await service.search(f"query {i % args.distinct}")
+            latencies.append(time.perf_counter() - start)
+
+        for batch in range(0, args.requests, args.concurrency):
+            await asyncio.gather(*(one(i) for i in range(batch, min(batch + args.concurrency, args.requests))))
+        latencies.sort()
+        print(f"p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+              f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.0f} ms, "
+              f"max {latencies[-1] * 1000:.0f} ms")
+        print(service.stats())
+
+    asyncio.run(bench())
@@ -0,0 +1,536 @@
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+try:
+    import fcntl
+except ImportError:  # Windows: the in-process lock still serializes writers of one process
+    fcntl = None
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# k-means wants a few dozen training points per list before a list is worth having
+_POINTS_PER_LIST = 39
+_ASSIGN_BATCH = 8192
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, np.ndarray]:
+    "unit vectors in the storage dtype, plus the per-vector scale int8 needs (ones otherwise)"
+    if dtype != "int8":
+        return vectors.astype(DTYPES[dtype]), np.ones(len(vectors), dtype=np.float32)
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    "nearest centroid by inner product, in batches so the score matrix stays small"
+    lists = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_BATCH):
+        block = vectors[start:start + _ASSIGN_BATCH]
+        lists[start:start + _ASSIGN_BATCH] = np.argmax(block @ centroids.T, axis=1)
+    return lists
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 15, sample: int = 256,
+                    seed: int = 0) -> np.ndarray:
+    "spherical k-means on at most `sample` points per list"
+    rng = np.random.default_rng(seed)
+    if len(vectors) > nlist * sample:
+        vectors = vectors[rng.choice(len(vectors), nlist * sample, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        lists = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, lists, vectors)
+        counts = np.bincount(lists, minlength=nlist)
+        empty = counts == 0
+        # re-seed empty lists from random points so every list stays in use
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file ANN index over cosine similarity, stored as memory-mapped files.
+
+    Vectors are clustered into `nlist` lists by k-means; a search scores only
+    the `nprobe` lists whose centroids are closest to the query. Vectors are
+    kept as float32, float16 or int8 (per-vector scale), cutting storage and
+    page-cache use by 2x or 4x.
+
+    Layout under `path`:
+    - meta.json: generation, dim, dtype, row counts; replaced atomically last
+    - docs.jsonl + doc_offsets.bin: the documents, by row id
+    - gen-N/: the main segment (vectors sorted by list, as .npy) and an
+      append-only delta segment of incremental inserts (raw .bin files)
+
+    Readers open the .npy files with mmap, so every process on the host
+    shares one copy of the pages, and pick up new rows when meta.json
+    changes. Inserts are assigned to the existing lists and appended to the
+    delta segment; once it exceeds `compact_ratio` of the main segment the
+    index is retrained and rewritten into a new generation. Writers are
+    serialized with a lock file.
+    """
+
+    def __init__(self, path: str, nlist: int = 1024, nprobe: int = 16, dtype: str = "int8",
+                 compact_ratio: float = 0.2):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported vector dtype {dtype}, expected one of {sorted(DTYPES)}")
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.dtype = dtype
+        self.compact_ratio = compact_ratio
+        self.meta: dict = {}
+        self._meta_mtime: Optional[int] = None
+        self._lock = threading.RLock()
+        self._segment: dict = {}
+        os.makedirs(path, exist_ok=True)
+        self.refresh()
+
+    def __len__(self) -> int:
+        return self.meta.get("main", 0) + self.meta.get("delta", 0)
+
+    def _file(self, *parts: str) -> str:
+        return os.path.join(self.path, *parts)
+
+    def _gen_dir(self, generation: Optional[int] = None) -> str:
+        generation = self.meta.get("generation", 0) if generation is None else generation
+        return self._file(f"gen-{generation:06d}")
+
+    # --- reading -------------------------------------------------------------------------------
+
+    def refresh(self):
+        "reopen the segments when another process (or compaction) changed meta.json"
+        try:
+            mtime = os.stat(self._file("meta.json")).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._meta_mtime:
+            return
+        with self._lock:
+            with open(self._file("meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self._segment = self._open_segment(meta)
+            self.meta, self._meta_mtime = meta, mtime
+
+    def _open_segment(self, meta: dict) -> dict:
+        gen_dir = self._file(f"gen-{meta['generation']:06d}")
+        dim, dtype, delta = meta["dim"], DTYPES[meta["dtype"]], meta["delta"]
+        segment = {name: np.load(os.path.join(gen_dir, f"{name}.npy"), mmap_mode="r")
+                   for name in ("centroids", "vectors", "scales", "ids", "offsets")}
+        segment["centroids"] = np.asarray(segment["centroids"])  # small and hit on every query
+        if delta:
+            # only the first `delta` rows are committed; a writer may be appending past them
+            segment["delta_vectors"] = np.memmap(os.path.join(gen_dir, "delta_vectors.bin"), dtype=dtype,
+                                                 mode="r", shape=(delta, dim))
+            segment["delta_scales"] = np.memmap(os.path.join(gen_dir, "delta_scales.bin"), dtype=np.float32,
+                                                mode="r", shape=(delta,))
+            segment["delta_lists"] = np.memmap(os.path.join(gen_dir, "delta_lists.bin"), dtype=np.int32,
+                                               mode="r", shape=(delta,))
+        return segment
+
+    def _scores(self, vectors: np.ndarray, scales: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return (vectors.astype(np.float32) @ query) * scales
+
+    def search(self, query: List[float], k: int = 4, nprobe: Optional[int] = None,
+               with_vectors: bool = False) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        "row ids and cosine scores of the (approximate) top `k`, best first; optionally their vectors"
+        self.refresh()
+        with self._lock:
+            segment, meta = self._segment, self.meta
+        if not meta or not len(self):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), None
+        query = _normalize(query)
+        centroids = segment["centroids"]
+        nprobe = min(nprobe or self.nprobe, len(centroids))
+        probes = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+
+        offsets = segment["offsets"]
+        positions = np.concatenate([np.arange(offsets[p], offsets[p + 1]) for p in probes])
+        rows = [np.asarray(segment["ids"][positions])]
+        scores = [self._scores(segment["vectors"][positions], segment["scales"][positions], query)]
+        if meta["delta"]:
+            delta_positions = np.flatnonzero(np.isin(segment["delta_lists"], probes))
+            rows.append(delta_positions.astype(np.int64) + meta["main"])
+            scores.append(self._scores(segment["delta_vectors"][delta_positions],
+                                       segment["delta_scales"][delta_positions], query))
+            positions = np.concatenate([positions, delta_positions + len(segment["ids"])])
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        vectors = self._dequantize(segment, positions[top]) if with_vectors else None
+        return rows[top], scores[top], vectors
+
+    @staticmethod
+    def _dequantize(segment: dict, positions: np.ndarray) -> np.ndarray:
+        "float32 vectors at segment positions (main segment first, then delta)"
+        main = len(segment["ids"])
+        out = np.empty((len(positions), segment["centroids"].shape[1]), dtype=np.float32)
+        in_main = positions < main
+        if in_main.any():
+            pos = positions[in_main]
+            out[in_main] = segment["vectors"][pos].astype(np.float32) * segment["scales"][pos][:, None]
+        if (~in_main).any():
+            pos = positions[~in_main] - main
+            out[~in_main] = segment["delta_vectors"][pos].astype(np.float32) * segment["delta_scales"][pos][:, None]
+        return out
+
+    @staticmethod
+    def _row_positions(segment: dict, total: int) -> np.ndarray:
+        "segment position of every row id (inverse of the main segment's list-sorted order)"
+        main = len(segment["ids"])
+        order = np.empty(main, dtype=np.int64)
+        order[np.asarray(segment["ids"])] = np.arange(main)
+        return np.concatenate([order, np.arange(main, total)])
+
+    def _all_vectors(self) -> np.ndarray:
+        "every row's vector in row-id order, for rebuilding; called under the lock"
+        segment = self._segment
+        return self._dequantize(segment, self._row_positions(segment, len(self)))
+
+    def iter_rows(self, batch_size: int = 10_000) -> Iterator[Tuple[np.ndarray, List[Document]]]:
+        "(vectors, documents) for every row in row-id order, `batch_size` rows at a time"
+        self.refresh()
+        with self._lock:
+            segment, total = self._segment, len(self)
+        if not total:
+            return
+        positions = self._row_positions(segment, total)
+        for start in range(0, total, batch_size):
+            rows = np.arange(start, min(start + batch_size, total))
+            yield self._dequantize(segment, positions[rows]), self.documents(rows)
+
+    def documents(self, rows: Iterable[int]) -> List[Document]:
+        rows = [int(r) for r in rows]
+        if not rows:
+            return []
+        offsets = np.memmap(self._file("doc_offsets.bin"), dtype=np.int64, mode="r", shape=(len(self),))
+        docs = []
+        with open(self._file("docs.jsonl"), "rb") as f:
+            for row in rows:
+                f.seek(int(offsets[row]))
+                record = json.loads(f.readline())
+                docs.append(Document(page_content=record["text"], metadata=record["metadata"], id=str(row)))
+        return docs
+
+    # --- writing -------------------------------------------------------------------------------
+
+    def _write_lock(self):
+        lock_file = open(self._file(".lock"), "a")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _write_meta(self, meta: dict):
+        tmp_path = self._file(f"meta.json.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def _append_documents(self, documents: List[Document]):
+        with open(self._file("docs.jsonl"), "ab") as f:
+            offsets = []
+            for doc in documents:
+                offsets.append(f.tell())
+                f.write(json.dumps({"text": doc.page_content, "metadata": doc.metadata}, default=str)
+                        .encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self._file("doc_offsets.bin"), "ab") as f:
+            np.asarray(offsets, dtype=np.int64).tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _truncate_uncommitted(self, total: int):
+        "drop rows a crashed writer appended past the committed count"
+        offsets_path = self._file("doc_offsets.bin")
+        if not os.path.exists(offsets_path):
+            return
+        committed = np.fromfile(offsets_path, dtype=np.int64, count=total + 1)
+        if len(committed) > total:
+            os.truncate(self._file("docs.jsonl"), int(committed[total]))
+            os.truncate(offsets_path, total * 8)
+
+    def add(self, vectors: List[List[float]], documents: List[Document]) -> List[str]:
+        "index new vectors with their documents; returns their row ids"
+        if len(vectors) != len(documents):
+            raise ValueError("vectors and documents must have the same length")
+        if not documents:
+            return []
+        vectors = _normalize(vectors)
+        lock_file = self._write_lock()
+        try:
+            with self._lock:
+                self._meta_mtime = None  # another process may have written since our last read
+                self.refresh()
+                first = len(self)
+                self._truncate_uncommitted(first)
+                self._append_documents(documents)
+                if not self.meta or self.meta["delta"] + len(vectors) > self.compact_ratio * self.meta["main"]:
+                    self._build(np.concatenate([self._all_vectors(), vectors]) if first else vectors)
+                else:
+                    self._append_delta(vectors)
+        finally:
+            lock_file.close()
+        return [str(row) for row in range(first, first + len(documents))]
+
+    def bulk_load(self, batches: Iterable[Tuple[np.ndarray, List[Document]]], replace: bool = False) -> int:
+        """Index many rows with a single retrain, e.g. a snapshot restore; returns the rows loaded.
+
+        `add` retrains whenever the delta outgrows `compact_ratio` of a still
+        small main segment, so feeding it batch by batch would rebuild (and
+        requantize) the index over and over. Documents are streamed to disk
+        as batches arrive; vectors are collected and built once. `replace`
+        drops the existing rows first.
+        """
+        lock_file = self._write_lock()
+        try:
+            with self._lock:
+                self._meta_mtime = None
+                self.refresh()
+                existing = 0 if replace else len(self)
+                parts, loaded = [], 0
+                for vectors, documents in batches:
+                    if len(vectors) != len(documents):
+                        raise ValueError("vectors and documents must have the same length")
+                    if not documents:
+                        continue
+                    if not loaded:
+                        if replace:
+                            for name in ("docs.jsonl", "doc_offsets.bin"):
+                                open(self._file(name), "wb").close()
+                        else:
+                            self._truncate_uncommitted(existing)
+                        if existing:
+                            parts.append(self._all_vectors())
+                    self._append_documents(documents)
+                    parts.append(_normalize(vectors))
+                    loaded += len(documents)
+                if loaded:
+                    self._build(np.concatenate(parts))
+        finally:
+            lock_file.close()
+        return loaded
+
+    def _append_delta(self, vectors: np.ndarray):
+        "called under the write lock"
+        gen_dir, meta = self._gen_dir(), dict(self.meta)
+        if vectors.shape[1] != meta["dim"]:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} does not match the index ({meta['dim']})")
+        codes, scales = _quantize(vectors, meta["dtype"])
+        lists = _assign(vectors, self._segment["centroids"])
+        for name, array, itemsize in (("delta_vectors", codes, codes.itemsize * meta["dim"]),
+                                      ("delta_scales", scales, 4), ("delta_lists", lists, 4)):
+            path = os.path.join(gen_dir, f"{name}.bin")
+            if os.path.exists(path):
+                os.truncate(path, meta["delta"] * itemsize)  # drop a crashed writer's tail
+            with open(path, "ab") as f:
+                array.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        meta["delta"] += len(vectors)
+        self._write_meta(meta)
+        self.refresh()
+
+    def _build(self, vectors: np.ndarray):
+        "retrain and write every row into a new generation's main segment; called under the write lock"
+        started = time.perf_counter()
+        nlist = max(1, min(self.nlist, len(vectors) // _POINTS_PER_LIST))
+        centroids = train_centroids(vectors, nlist)
+        lists = _assign(vectors, centroids)
+        order = np.argsort(lists, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(lists, minlength=nlist))]).astype(np.int64)
+        codes, scales = _quantize(vectors[order], self.dtype)
+
+        generation = self.meta.get("generation", 0) + 1
+        gen_dir = self._gen_dir(generation)
+        os.makedirs(gen_dir, exist_ok=True)
+        for name, array in (("centroids", centroids), ("vectors", codes), ("scales", scales),
+                            ("ids", order.astype(np.int64)), ("offsets", offsets)):
+            np.save(os.path.join(gen_dir, f"{name}.npy"), array)
+        previous = self._gen_dir() if self.meta else None
+        self._write_meta({"generation": generation, "dim": int(vectors.shape[1]), "dtype": self.dtype,
+                          "nlist": nlist, "main": len(vectors), "delta": 0, "built_at": time.time()})
+        self.refresh()
+        if previous:
+            # open mmaps in other processes keep the unlinked pages until they reopen
+            shutil.rmtree(previous, ignore_errors=True)
+        log.info("ANN index built", rows=len(vectors), nlist=nlist, dtype=self.dtype, generation=generation,
+                 seconds=round(time.perf_counter() - started, 2))
+
+    def compact(self):
+        "fold the delta segment into a retrained main segment"
+        lock_file = self._write_lock()
+        try:
+            with self._lock:
+                self._meta_mtime = None
+                self.refresh()
+                if self.meta and self.meta["delta"]:
+                    self._build(self._all_vectors())
+        finally:
+            lock_file.close()
+
+    def stats(self) -> dict:
+        self.refresh()
+        with self._lock:
+            meta, segment = dict(self.meta), self._segment
+        if not meta:
+            return {"rows": 0}
+        vector_bytes = segment["vectors"].nbytes + segment["scales"].nbytes
+        if meta["delta"]:
+            vector_bytes += segment["delta_vectors"].nbytes + segment["delta_scales"].nbytes
+        return {"rows": meta["main"] + meta["delta"], "main": meta["main"], "delta": meta["delta"],
+                "nlist": meta["nlist"], "nprobe": self.nprobe, "dtype": meta["dtype"],
+                "generation": meta["generation"], "vector_bytes": int(vector_bytes)}
+
+
+class LocalANNVectorStore(VectorStore):
+    "LangChain vector store over an IVFIndex, a drop-in for AstraDBVectorStore in the retriever"
+
+    def __init__(self, embedding: Embeddings, index: IVFIndex):
+        self.embedding = embedding
+        self.index = index
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = self.embedding.embed_documents(texts)
+        documents = [Document(page_content=t, metadata=m) for t, m in zip(texts, metadatas)]
+        return self.index.add(vectors, documents)
+
+    def add_vectors(self, vectors: List[List[float]], documents: List[Document]) -> List[str]:
+        "insert pre-computed embeddings (e.g. from a snapshot) without calling the embedding model"
+        return self.index.add(vectors, documents)
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4,
+                                               **kwargs: Any) -> List[Tuple[Document, float]]:
+        rows, scores, _ = self.index.search(embedding, k=k, nprobe=kwargs.get("nprobe"))
+        return list(zip(self.index.documents(rows), scores.tolist()))
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k=k, **kwargs)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, **kwargs)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k=k, **kwargs)
+
+    def _select_relevance_score_fn(self):
+        # scores are cosine similarities in [-1, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5, **kwargs: Any) -> List[Document]:
+        rows, _, vectors = self.index.search(embedding, k=fetch_k, nprobe=kwargs.get("nprobe"), with_vectors=True)
+        if not len(rows):
+            return []
+        picked = maximal_marginal_relevance(np.asarray(embedding, dtype=np.float32), vectors.tolist(),
+                                            k=k, lambda_mult=lambda_mult)
+        return self.index.documents(rows[picked])
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5,
+                                      **kwargs: Any) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(self.embedding.embed_query(query), k=k,
+                                                            fetch_k=fetch_k, lambda_mult=lambda_mult, **kwargs)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None,
+                   path: str = "data/ann_index", **kwargs: Any) -> "LocalANNVectorStore":
+        store = cls(embedding, IVFIndex(path, **kwargs))
+        store.add_texts(texts, metadatas)
+        return store
+
+
+def local_vector_store_enabled(config: dict) -> bool:
+    return config.get("vector_index", {}).get("backend", "astra") == "local"
+
+
+def load_ann_index(config: dict) -> IVFIndex:
+    "build the index from the `vector_index` config block"
+    cfg = config.get("vector_index", {})
+    return IVFIndex(
+        cfg.get("path", "data/ann_index"),
+        nlist=cfg.get("nlist", 1024),
+        nprobe=cfg.get("nprobe", 16),
+        dtype=cfg.get("dtype", "int8"),
+        compact_ratio=cfg.get("compact_ratio", 0.2),
+    )
+
+
+def _clustered_vectors(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    "synthetic embeddings: product-like topics with per-item noise"
+    centers = _normalize(rng.standard_normal((clusters, dim)))
+    labels = rng.integers(0, clusters, n)
+    return _normalize(centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32) / np.sqrt(dim) * 4)
+
+
+def _benchmark(n: int, dim: int, queries: int, k: int, dtypes: List[str], nlists: List[int], nprobes: List[int]):
+    import tempfile
+    rng = np.random.default_rng(7)
+    data = _clustered_vectors(n, dim, max(n // 200, 8), rng)
+    probes = _normalize(data[rng.choice(n, queries, replace=False)]
+                        + 0.3 * rng.standard_normal((queries, dim)).astype(np.float32) / np.sqrt(dim) * 4)
+    documents = [Document(page_content=str(i)) for i in range(n)]
+
+    started = time.perf_counter()
+    exact = [np.argpartition(-(data @ q), k - 1)[:k] for q in probes]
+    brute_ms = (time.perf_counter() - started) * 1000 / queries
+    print(f"{n} vectors x {dim} dims, {queries} queries, recall@{k} against exact float32 search")
+    print(f"brute force float32: {brute_ms:.2f} ms/query, {data.nbytes / 2**20:.1f} MiB")
+    print(f"{'dtype':>8} {'nlist':>6} {'nprobe':>6} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7} {'MiB':>7} {'build s':>8}")
+    for dtype in dtypes:
+        for nlist in nlists:
+            with tempfile.TemporaryDirectory() as path:
+                index = IVFIndex(path, nlist=nlist, dtype=dtype)
+                started = time.perf_counter()
+                index.add(data, documents)
+                build_s = time.perf_counter() - started
+                mib = index.stats()["vector_bytes"] / 2**20
+                for nprobe in nprobes:
+                    latencies, hits = [], 0
+                    for q, truth in zip(probes, exact):
+                        started = time.perf_counter()
+                        rows, _, _ = index.search(q, k=k, nprobe=nprobe)
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        hits += len(set(rows.tolist()) & set(truth.tolist()))
+                    p50, p95 = np.percentile(latencies, [50, 95])
+                    print(f"{dtype:>8} {index.meta['nlist']:>6} {nprobe:>6} {hits / (queries * k):>7.3f} "
+                          f"{p50:>7.2f} {p95:>7.2f} {mib:>7.1f} {build_s:>8.1f}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Recall vs latency vs memory of the local ANN index")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=1536, help="text-embedding-3-small is 1536")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtypes", default="float32,float16,int8")
+    parser.add_argument("--nlists", default="256,1024")
+    parser.add_argument("--nprobes", default="4,16,64")
+    args = parser.parse_args()
+    _benchmark(args.n, args.dim, args.queries, args.k, args.dtypes.split(","),
+               [int(x) for x in args.nlists.split(",")], [int(x) for x in args.nprobes.split(",")])
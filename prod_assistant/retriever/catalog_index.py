@@ -0,0 +1,251 @@
+import difflib
+import json
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+_FIELDS = ("product_id", "product_title", "rating", "total_reviews", "price")
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "of", "for", "to", "in", "on", "and", "or", "it", "this",
+    "that", "what", "which", "how", "does", "do", "can", "you", "me", "i", "my", "with", "about",
+    "tell", "please", "much", "many", "its", "whats", "s", "give", "show",
+}
+# question words that ask for a stored fact, mapped to the metadata field
+_FACT_PATTERNS = {
+    "price": re.compile(r"\b(price|prices|priced|cost|costs|how much|mrp)\b"),
+    "rating": re.compile(r"\b(rating|ratings|rated|stars?)\b"),
+    "total_reviews": re.compile(r"\b(how many reviews|number of reviews|review count)\b"),
+}
+# words that phrase a fact question rather than name a product; never counted as unmatched
+_QUESTION_WORDS = {
+    "price", "prices", "priced", "cost", "costs", "mrp", "rating", "ratings", "rated", "star", "stars",
+    "review", "reviews", "number", "count", "current", "currently", "now", "today", "get", "buy",
+}
+# opinion/comparison questions need the generator even when they mention a fact
+_OPINION = re.compile(r"\b(good|worth|best|better|recommend|compare|vs|versus|suggest|should|cheaper|alternative)\b")
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _core_title(title: str) -> str:
+    "drop the '(Black, 128 GB)' style variant suffix"
+    return re.sub(r"\(.*?\)", " ", title)
+
+
+@dataclass
+class CatalogMatch:
+    products: List[dict]
+    score: float
+    facts: List[str] = field(default_factory=list)
+
+    @property
+    def answerable(self) -> bool:
+        "a single product and a pure fact question can be answered from a template"
+        return len(self.products) == 1 and bool(self.facts)
+
+
+class CatalogIndex:
+    """In-memory product lookup by `product_id` and title tokens.
+
+    Built from the ingested documents and saved as JSON next to the other
+    data files. A query matches a product when its (spell-corrected) catalog
+    tokens are covered by the product title, IDF-weighted; the best match
+    must beat the runner-up by `margin`, else up to `max_candidates` tied
+    products are returned. A query naming only a brand ("samsung rating")
+    identifies no model and is left to retrieval. The file is re-read when
+    ingestion rewrites it.
+    """
+
+    def __init__(self, products: Optional[List[dict]] = None, path: Optional[str] = None,
+                 min_coverage: float = 0.85, margin: float = 0.02, max_candidates: int = 3,
+                 title_penalty: float = 0.2):
+        self.path = path
+        self.min_coverage = min_coverage
+        self.margin = margin
+        self.max_candidates = max_candidates
+        self.title_penalty = title_penalty
+        self._mtime: Optional[float] = None
+        self._build(products or [])
+
+    def _build(self, products: List[dict]):
+        self.products = products
+        self._by_id = {str(p["product_id"]).lower(): i for i, p in enumerate(products) if p.get("product_id")}
+        self._title_tokens: List[Set[str]] = [set(_tokens(str(p.get("product_title", "")))) for p in products]
+        self._core_tokens: List[Set[str]] = [set(_tokens(_core_title(str(p.get("product_title", "")))))
+                                             for p in products]
+        self._postings: Dict[str, Set[int]] = {}
+        for i, tokens in enumerate(self._title_tokens):
+            for token in tokens:
+                self._postings.setdefault(token, set()).add(i)
+        n = len(products)
+        self._idf = {t: math.log((n + 1) / (len(ids) + 1)) + 1 for t, ids in self._postings.items()}
+        self._vocab = list(self._postings)
+        # the leading title word ("Apple", "SAMSUNG") names the brand, not a model
+        self._brands: Set[str] = set()
+        for p in products:
+            words = _tokens(str(p.get("product_title", "")))
+            if words:
+                self._brands.add(words[0])
+
+    @staticmethod
+    def _products(documents: List[Document]) -> List[dict]:
+        return [
+            {**{k: doc.metadata.get(k) for k in _FIELDS}, "top_reviews": doc.page_content}
+            for doc in documents
+        ]
+
+    @classmethod
+    def from_documents(cls, documents: List[Document], **kwargs) -> "CatalogIndex":
+        return cls(cls._products(documents), **kwargs)
+
+    def merge(self, documents: List[Document]) -> "CatalogIndex":
+        """Add the documents' products, replacing earlier entries with the same `product_id`.
+
+        Ingestion appends to the vector store, so each run's products are
+        merged into the saved index rather than replacing it.
+        """
+        by_id: Dict[str, dict] = {}
+        without_id: List[dict] = []
+        for product in self.products + self._products(documents):
+            if product.get("product_id"):
+                by_id[str(product["product_id"]).lower()] = product
+            else:
+                without_id.append(product)
+        self._build(list(by_id.values()) + without_id)
+        return self
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"products": self.products}, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+        log.info("Catalog index saved", path=path, products=len(self.products))
+
+    def refresh(self):
+        "reload from `path` if ingestion rewrote it"
+        if not self.path:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            self._build(json.load(f).get("products", []))
+        self._mtime = mtime
+        log.info("Catalog index loaded", path=self.path, products=len(self.products))
+
+    def _catalog_tokens(self, query: str) -> Tuple[List[str], List[str]]:
+        """Query tokens that occur in some title, with close misspellings mapped onto the vocabulary,
+        and the remaining content tokens that match no title ("max", "charger", "case")."""
+        tokens, unmatched = [], []
+        for token in _tokens(query):
+            if token in _STOPWORDS:
+                continue
+            if token in self._postings:
+                tokens.append(token)
+                continue
+            close = self._correct(token) if len(token) >= 4 and token.isalpha() else None
+            if close:
+                tokens.append(close)
+            elif token not in _QUESTION_WORDS:
+                unmatched.append(token)
+        return list(dict.fromkeys(tokens)), list(dict.fromkeys(unmatched))
+
+    def _correct(self, token: str) -> Optional[str]:
+        """A title word `token` is a misspelling of. Misspellings keep their first letter, and a
+        longer word that merely contains the token is a different word ("phone" is not "iphone")."""
+        for close in difflib.get_close_matches(token, self._vocab, n=3, cutoff=0.85):
+            if close[0] == token[0] and token not in close:
+                return close
+        return None
+
+    def _names_model(self, tokens: List[str]) -> bool:
+        return any(t not in self._brands or any(c.isdigit() for c in t) for t in tokens)
+
+    def match(self, query: str) -> Optional[CatalogMatch]:
+        self.refresh()
+        if not self.products:
+            return None
+        lowered = query.lower()
+        facts = [] if _OPINION.search(lowered) else [f for f, p in _FACT_PATTERNS.items() if p.search(lowered)]
+
+        for token in re.findall(r"[a-z0-9\-]+", lowered):
+            if token in self._by_id:
+                return CatalogMatch([self.products[self._by_id[token]]], 1.0, facts)
+
+        tokens, unmatched = self._catalog_tokens(query)
+        if not tokens or not self._names_model(tokens):
+            return None
+        # a word no title contains weighs like the rarest token, so "iphone 16 pro max" or
+        # "s24 charger" can't reach min_coverage on the words that did match
+        total = sum(self._idf[t] for t in tokens) + len(unmatched) * (math.log(len(self.products) + 1) + 1)
+        candidates = set().union(*(self._postings[t] for t in tokens))
+        scored = []
+        for i in candidates:
+            coverage = sum(self._idf[t] for t in tokens if t in self._title_tokens[i]) / total
+            if coverage < self.min_coverage:
+                continue
+            core = self._core_tokens[i] or self._title_tokens[i]
+            extra = len(core - set(tokens)) / len(core) if core else 0.0
+            scored.append((coverage - self.title_penalty * extra, i))
+        if not scored:
+            return None
+        scored.sort(reverse=True)
+        best = scored[0][0]
+        tied = [i for score, i in scored if best - score < self.margin]
+        if len(tied) > self.max_candidates:
+            return None
+        return CatalogMatch([self.products[i] for i in tied], best, facts)
+
+    @staticmethod
+    def answer(match: CatalogMatch) -> str:
+        "template answer for a single-product fact question"
+        product = match.products[0]
+        parts = []
+        if "price" in match.facts:
+            parts.append(f"is priced at {product.get('price', 'N/A')}")
+        if "rating" in match.facts:
+            parts.append(f"has a rating of {product.get('rating', 'N/A')}")
+        if "total_reviews" in match.facts:
+            parts.append(f"has {product.get('total_reviews', 'N/A')} reviews")
+        return f"The {product.get('product_title', 'product')} " + " and ".join(parts) + "."
+
+    @staticmethod
+    def to_documents(match: CatalogMatch) -> List[Document]:
+        "matched products in the retriever's document shape, for the context packer"
+        return [
+            Document(page_content=str(p.get("top_reviews") or ""),
+                     metadata={k: p.get(k) for k in _FIELDS})
+            for p in match.products
+        ]
+
+
+def catalog_index_path(config: dict) -> str:
+    return config.get("catalog_index", {}).get("path", "data/catalog_index.json")
+
+
+def load_catalog_index(config: dict) -> Optional[CatalogIndex]:
+    "index from the `catalog_index` config block; None when disabled"
+    cfg = config.get("catalog_index", {})
+    if not cfg.get("enabled", True):
+        return None
+    index = CatalogIndex(
+        path=catalog_index_path(config),
+        min_coverage=cfg.get("min_coverage", 0.85),
+        margin=cfg.get("margin", 0.02),
+        max_candidates=cfg.get("max_candidates", 3),
+        title_penalty=cfg.get("title_penalty", 0.2),
+    )
+    index.refresh()
+    return index
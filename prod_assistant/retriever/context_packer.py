@@ -0,0 +1,132 @@
+import math
+import os
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+REVIEW_SEPARATOR = "||"
+_MISSING_REVIEWS = {"", "no reviews found", "invalid product url"}
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "of", "for", "to", "in", "on", "and", "or", "it", "this",
+    "that", "what", "which", "how", "does", "do", "can", "you", "me", "i", "my", "with", "about",
+}
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _token_counter() -> Callable[[str], int]:
+    "tiktoken when available (it ships with langchain_openai), else ~4 chars per token"
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text))
+    except Exception:
+        return lambda text: math.ceil(len(text) / 4)
+
+
+def _header(meta: dict) -> str:
+    return (
+        f"Title: {meta.get('product_title','N/A')}\n"
+        f"Price: {meta.get('price','N/A')}\n"
+        f"Rating: {meta.get('rating', 'N/A')}\n"
+        f"Reviews: \n"
+    )
+
+
+class ContextPacker:
+    """Fits retrieved product documents into a token budget for the generator.
+
+    Product headers (title/price/rating) are always kept. Review snippets are
+    split on the scraper's `||` separator, near-duplicates are dropped, and the
+    rest are added in order of relevance to the question until the budget is
+    spent.
+    """
+
+    def __init__(self, max_tokens: int = 3000, dedup_threshold: float = 0.8,
+                 count_tokens: Optional[Callable[[str], int]] = None):
+        self.max_tokens = max_tokens
+        self.dedup_threshold = dedup_threshold
+        self.count_tokens = count_tokens or _token_counter()
+
+    def _is_duplicate(self, shingles: set, kept: List[set]) -> bool:
+        for other in kept:
+            union = len(shingles | other)
+            if union and len(shingles & other) / union >= self.dedup_threshold:
+                return True
+        return False
+
+    @staticmethod
+    def _shingles(text: str) -> set:
+        toks = _tokens(text)
+        return {" ".join(toks[i:i + 3]) for i in range(max(len(toks) - 2, 1))}
+
+    @staticmethod
+    def _relevance(question_tokens: set, snippet: str) -> float:
+        toks = _tokens(snippet)
+        if not toks:
+            return 0.0
+        overlap = len(question_tokens.intersection(toks))
+        return overlap / math.sqrt(len(toks))
+
+    def pack(self, docs: List[Document], question: str) -> Tuple[str, Dict[str, int]]:
+        "returns the packed context and token accounting"
+        original = "\n\n".join(_header(d.metadata or {}) + d.page_content.strip() for d in docs)
+
+        headers = [_header(d.metadata or {}) for d in docs]
+        question_tokens = set(_tokens(question)) - _STOPWORDS
+        kept_shingles: List[set] = []
+        candidates = []  # (relevance, doc_index, position, snippet)
+        duplicates = 0
+        for i, d in enumerate(docs):
+            for pos, snippet in enumerate(s.strip() for s in d.page_content.split(REVIEW_SEPARATOR)):
+                if snippet.lower() in _MISSING_REVIEWS:
+                    continue
+                shingles = self._shingles(snippet)
+                if self._is_duplicate(shingles, kept_shingles):
+                    duplicates += 1
+                    continue
+                kept_shingles.append(shingles)
+                candidates.append((self._relevance(question_tokens, snippet), i, pos, snippet))
+
+        used = self.count_tokens("\n\n".join(headers))
+        selected: Dict[int, List[Tuple[int, str]]] = {i: [] for i in range(len(docs))}
+        over_budget = 0
+        for _, i, pos, snippet in sorted(candidates, key=lambda c: (-c[0], c[1], c[2])):
+            cost = self.count_tokens(snippet) + 2
+            if used + cost > self.max_tokens:
+                over_budget += 1
+                continue
+            selected[i].append((pos, snippet))
+            used += cost
+
+        chunks = []
+        for i, header in enumerate(headers):
+            snippets = [s for _, s in sorted(selected[i])]
+            chunks.append(header + (f" {REVIEW_SEPARATOR} ".join(snippets) if snippets else "No reviews found"))
+        packed = "\n\n".join(chunks)
+
+        stats = {
+            "original_tokens": self.count_tokens(original),
+            "packed_tokens": self.count_tokens(packed),
+            "duplicates_dropped": duplicates,
+            "snippets_dropped_for_budget": over_budget,
+        }
+        stats["tokens_saved"] = max(stats["original_tokens"] - stats["packed_tokens"], 0)
+        log.info("Context packed", **stats)
+        return packed, stats
+
+
+def load_context_packer(config: dict, provider: Optional[str] = None) -> ContextPacker:
+    "budget comes from `llm.<provider>.max_context_tokens`, next to max_output_tokens"
+    provider = provider or os.getenv('LLM_PROVIDER', 'openai')
+    llm_cfg = config.get('llm', {}).get(provider, {})
+    packing_cfg = config.get('context_packing', {})
+    return ContextPacker(
+        max_tokens=llm_cfg.get('max_context_tokens', 3000),
+        dedup_threshold=packing_cfg.get('dedup_threshold', 0.8),
+    )
@@ -0,0 +1,152 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+from prod_assistant.utils.shared_cache import get_shared_cache
+
+
+def read_collection_version(path: str) -> str:
+    "current ingestion version of the collection ('' before the first load)"
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("version", "")
+    except (FileNotFoundError, ValueError):
+        return ""
+
+
+def bump_collection_version(path: str, collection_name: str = "") -> str:
+    "record a new ingestion version; written atomically so readers never see a partial file"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "collection": collection_name, "updated_at": time.time()}, f)
+    os.replace(tmp_path, path)
+    log.info("Collection version bumped", collection=collection_name, version=version)
+    return version
+
+
+def normalize_query(query: str) -> str:
+    "case, whitespace and trailing punctuation don't change what the retriever returns"
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?!. ")
+
+
+class RetrievalCache:
+    """Size-bounded LRU of final retriever results.
+
+    Keys are the normalized query plus a fingerprint of the retriever
+    settings. Every entry is stamped with the collection version from
+    `version_file`; when ingestion bumps it, the whole cache is dropped on the
+    next lookup. The version file is re-read only when its mtime changes, so
+    other processes (e.g. MCP workers) pick up a new load cheaply.
+
+    With a `shared` tier, local misses are looked up there (keyed with the
+    collection version, so old loads never match) and results are written
+    through, so one worker's retrieval warms the others.
+    """
+
+    def __init__(self, version_file: str, max_entries: int = 512, shared=None):
+        self.version_file = version_file
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries: "OrderedDict[tuple, List[Document]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_mtime: Optional[float] = None
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    def _current_version(self) -> str:
+        try:
+            mtime = os.stat(self.version_file).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._version_mtime or self._version is None:
+            self._version_mtime = mtime
+            self._version = read_collection_version(self.version_file)
+        return self._version
+
+    def _check_version(self):
+        "called under the lock"
+        previous = self._version
+        current = self._current_version()
+        if previous is not None and current != previous and self._entries:
+            self._counters["invalidations"] += 1
+            log.info("Retrieval cache invalidated by new ingestion", dropped=len(self._entries), version=current)
+            self._entries.clear()
+
+    @staticmethod
+    def make_key(query: str, settings: Dict[str, Any]) -> tuple:
+        return normalize_query(query), json.dumps(settings, sort_keys=True, default=str)
+
+    def _shared_key(self, key: tuple) -> str:
+        return self.shared.key(self._version, *key)
+
+    def get(self, query: str, settings: Dict[str, Any]) -> Optional[List[Document]]:
+        key = self.make_key(query, settings)
+        with self._lock:
+            self._check_version()
+            docs = self._entries.get(key)
+            if docs is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return list(docs)
+        docs = self.shared.get(self._shared_key(key)) if self.shared else None
+        with self._lock:
+            if docs is None:
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            self._store_local(key, docs)
+            return list(docs)
+
+    def _store_local(self, key: tuple, docs: List[Document]):
+        "called under the lock"
+        self._entries[key] = list(docs)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def put(self, query: str, settings: Dict[str, Any], docs: List[Document]):
+        key = self.make_key(query, settings)
+        with self._lock:
+            self._check_version()
+            self._store_local(key, docs)
+        if self.shared:
+            self.shared.set(self._shared_key(key), list(docs))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hit_rate": self._counters["hits"] / lookups if lookups else 0.0,
+                "version": self._version,
+            }
+
+
+def collection_version_path(config: dict) -> str:
+    return config.get("retrieval_cache", {}).get("version_file", "data/collection_version.json")
+
+
+def load_retrieval_cache(config: dict) -> Optional[RetrievalCache]:
+    "build the cache from the `retrieval_cache` config block; None when disabled"
+    cfg = config.get("retrieval_cache", {})
+    if not cfg.get("enabled", True):
+        return None
+    return RetrievalCache(collection_version_path(config), max_entries=cfg.get("max_entries", 512),
+                          shared=get_shared_cache("retrieval", config))
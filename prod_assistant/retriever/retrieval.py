@@ -1,12 +1,10 @@
 import os
-from langchain_astradb import AstraDBVectorStore
-from langchain.retrievers.document_compressors import LLMChainFilter
-from langchain.retrievers import ContextualCompressionRetriever
 from typing import List
 from langchain_core.documents import Document
-from  prod_assistant.utils.config_loader import load_config
+from  prod_assistant.utils.config_loader import get_config_service,load_config
 from prod_assistant.utils.model_loader import ModelLoader
-from prod_assistant.evaluation.ragas_eval import evaluate_context_precision,evaluate_response_relevancy
+from prod_assistant.retriever.result_cache import RetrievalCache,load_retrieval_cache
+from prod_assistant.utils.single_flight import coalescing_enabled,get_single_flight
 from dotenv import load_dotenv
 
 
@@ -14,13 +12,31 @@ class Retriever:
     def __init__(self):
         self.model_loader = ModelLoader()
         self._load_env_variables()
-        self.config = load_config()
         self.vstore = None
         self.retriever_instance = None
+        self.cache = load_retrieval_cache(self.config)
+        get_config_service().subscribe(self._on_config_change)
+        
+    @property
+    def config(self) -> dict:
+        return load_config()
+    
+    def _on_config_change(self,old: dict,new: dict):
+        "rebuild the retriever on next use when its settings (or the LLM filter's) change"
+        if any(old.get(k) != new.get(k) for k in ('retriever','llm','llm_cache','shared_cache')):
+            print("Retriever settings changed, reloading retriever.")
+            self.retriever_instance = None
+        if (old.get('astra_db') != new.get('astra_db') or old.get('embedding_model') != new.get('embedding_model')
+                or old.get('vector_index') != new.get('vector_index')):
+            self.vstore = None
+        if old.get('retrieval_cache') != new.get('retrieval_cache'):
+            self.cache = load_retrieval_cache(new)
         
     def _load_env_variables(self):
         load_dotenv()
         required_keys = ['OPENAI_API_KEY','ASTRA_DB_API_ENDPOINT','ASTRA_DB_APPLICATION_TOKEN','ASTRA_DB_KEYSPACE']
+        if self.config.get('vector_index',{}).get('backend','astra') == 'local':
+            required_keys = ['OPENAI_API_KEY']
         missing_vars = [var for var in required_keys if os.getenv(var) is None]
         if missing_vars:
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
@@ -30,6 +46,14 @@ class Retriever:
         self.ASTRA_DB_KEYSPACE = os.getenv('ASTRA_DB_KEYSPACE')
         
     def load_retriever(self):
+        # AstraDB and langchain retriever modules are heavy; import on first load
+        from langchain_astradb import AstraDBVectorStore
+        from langchain.retrievers.document_compressors import LLMChainFilter
+        from langchain.retrievers import ContextualCompressionRetriever
+        if not self.vstore and self.config.get('vector_index',{}).get('backend','astra') == 'local':
+            # numpy-backed index on local disk, shared across workers through the page cache
+            from prod_assistant.retriever.ann_index import LocalANNVectorStore,load_ann_index
+            self.vstore = LocalANNVectorStore(self.model_loader.load_embedding_model(),load_ann_index(self.config))
         if not self.vstore:
             collection_name = self.config['astra_db']['collection_name']
             
@@ -41,18 +65,19 @@ class Retriever:
                 namespace=self.ASTRA_DB_KEYSPACE
             )
         if not self.retriever_instance:
-            top_k = self.config["retriever"]["top_k"] if "retriever" in self.config else 3
+            retriever_cfg = self.config.get("retriever", {})
             
             mmr_retriever=self.vstore.as_retriever(
                 search_type="mmr",
-                search_kwargs={"k": top_k,
-                                "fetch_k": 20,
-                                "lambda_mult": 0.7,
-                                "score_threshold": 0.6
+                search_kwargs={"k": retriever_cfg.get("top_k", 3),
+                                "fetch_k": retriever_cfg.get("fetch_k", 20),
+                                "lambda_mult": retriever_cfg.get("lambda_mult", 0.7),
+                                "score_threshold": retriever_cfg.get("score_threshold", 0.6)
                             })
             print("Retriever loaded successfully.")
             
-            llm = self.model_loader.load_llm()
+            # (query, product) relevance checks repeat across users; cached when llm_cache.call_sites.filter is on
+            llm = self.model_loader.load_llm(call_site='filter')
             
             compressor=LLMChainFilter.from_llm(llm)
             
@@ -63,12 +88,48 @@ class Retriever:
             
         return self.retriever_instance
         
-    def call_retriever(self,user_query):
-        retriever = self.load_retriever()
-        output = retriever.invoke(user_query)
-        return output
+    def _cache_settings(self,compress: bool = True) -> dict:
+        "everything besides the query that changes the final document list"
+        config = self.config
+        return {
+            'compressed': compress,
+            'retriever': config.get('retriever'),
+            'collection': config['astra_db']['collection_name'],
+            'vector_index': config.get('vector_index'),
+            'embedding_model': config.get('embedding_model'),
+            'filter_llm': os.getenv('LLM_PROVIDER', 'openai'),
+        }
+        
+    def call_retriever(self,user_query,compress: bool = True):
+        """retrieve documents, served from the result cache when the query was seen since the last ingestion.
+        compress=False returns the MMR results without the LLM relevance filter (used when short on time)"""
+        cache = self.cache
+        settings = self._cache_settings(compress)
+        if cache:
+            cached = cache.get(user_query,settings)
+            if cached is not None:
+                return cached
+        
+        def retrieve():
+            retriever = self.load_retriever()
+            if not compress:
+                retriever = retriever.base_retriever
+            output = retriever.invoke(user_query)
+            if cache:
+                cache.put(user_query,settings,output)
+            return output
+        
+        if not coalescing_enabled(self.config,'retriever'):
+            return retrieve()
+        # concurrent identical lookups (cache misses) share one AstraDB + filter round-trip
+        key = "|".join(RetrievalCache.make_key(user_query,settings))
+        return list(get_single_flight('retriever').do(key,retrieve))
+    
+    def cache_stats(self) -> dict:
+        return self.cache.stats() if self.cache else {}
     
 if __name__=='__main__':
+    from prod_assistant.evaluation.ragas_eval import evaluate_context_precision,evaluate_response_relevancy
     user_query = "Can you suggest good budget iPhone under 1,00,00 INR?"
     
     retriever_obj = Retriever()
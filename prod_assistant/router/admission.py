@@ -0,0 +1,219 @@
+import asyncio
+import contextlib
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+
+class Rejected(Exception):
+    "request refused at admission; maps to an HTTP status with Retry-After"
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded in-flight limiter with a short, fair wait queue for one worker.
+
+    Up to `max_in_flight` requests run at once. Beyond that, requests wait in
+    per-client queues (at most `max_queue` in total) that are drained
+    round-robin across clients, so one client can't monopolize freed slots.
+    Rejections are immediate:
+    - 429 when a client already has `per_client_limit` requests running or waiting
+    - 503 when the queue is full or a request waited longer than `queue_timeout`
+    Retry-After is estimated from the recent service time and queue depth.
+
+    Bulk work (batch items) is admitted with `admit_background`: it shares
+    the same in-flight slots, but at most `max_background` of them, only
+    when no interactive request is waiting, and it waits as long as needed
+    instead of being rejected. Must be used from a single event loop.
+    """
+
+    def __init__(self, max_in_flight: int = 16, max_queue: int = 32, queue_timeout: float = 5.0,
+                 per_client_limit: int = 4, max_background: int = 4):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.per_client_limit = per_client_limit
+        self.max_background = max_background
+        self.in_flight = 0
+        self.background_in_flight = 0
+        self._background: Deque[asyncio.Future] = deque()
+        self._client_in_flight: Dict[str, int] = {}
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._queued = 0
+        self._service_time = 1.0  # EWMA seconds per request
+        self._counters = {"admitted": 0, "queued": 0, "rejected_429": 0, "rejected_503": 0,
+                          "queue_timeouts": 0, "max_queue_depth": 0, "background_admitted": 0}
+        self._wait_total = 0.0
+
+    def _retry_after(self) -> int:
+        backlog = (self._queued + 1) / max(self.max_in_flight, 1)
+        return max(1, math.ceil(self._service_time * backlog))
+
+    def _reject(self, status_code: int, reason: str, client: str):
+        self._counters[f"rejected_{status_code}"] += 1
+        retry_after = self._retry_after()
+        log.warning("Request rejected at admission", client=client, status=status_code, reason=reason,
+                    in_flight=self.in_flight, queued=self._queued)
+        raise Rejected(status_code, reason, retry_after)
+
+    def _client_load(self, client: str) -> int:
+        return self._client_in_flight.get(client, 0) + len(self._queues.get(client, ()))
+
+    def _start(self, client: str):
+        self.in_flight += 1
+        self._client_in_flight[client] = self._client_in_flight.get(client, 0) + 1
+        self._counters["admitted"] += 1
+
+    def _finish(self, client: str, elapsed: float):
+        self.in_flight -= 1
+        remaining = self._client_in_flight.get(client, 1) - 1
+        if remaining:
+            self._client_in_flight[client] = remaining
+        else:
+            self._client_in_flight.pop(client, None)
+        self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+        self._wake_next()
+
+    def _background_slot_free(self) -> bool:
+        "interactive waiters go first; background work never holds more than max_background slots"
+        return (self.in_flight < self.max_in_flight and not self._queues
+                and self.background_in_flight < self.max_background)
+
+    def _start_background(self):
+        self.in_flight += 1
+        self.background_in_flight += 1
+        self._counters["background_admitted"] += 1
+
+    def _finish_background(self):
+        self.in_flight -= 1
+        self.background_in_flight -= 1
+        self._wake_next()
+
+    def _wake_next(self):
+        "hand free slots to waiting clients round-robin, then to waiting background work"
+        while self.in_flight < self.max_in_flight and self._queues:
+            client, queue = next(iter(self._queues.items()))
+            self._queues.move_to_end(client)
+            waiter = queue.popleft()
+            self._queued -= 1
+            if not queue:
+                del self._queues[client]
+            if waiter.done():
+                continue
+            self._start(client)
+            waiter.set_result(None)
+        while self._background and self._background_slot_free():
+            waiter = self._background.popleft()
+            if waiter.done():
+                continue
+            self._start_background()
+            waiter.set_result(None)
+
+    def _dequeue(self, client: str, waiter: asyncio.Future):
+        queue = self._queues.get(client)
+        if queue and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[client]
+
+    @contextlib.asynccontextmanager
+    async def admit(self, client: str):
+        if self._client_load(client) >= self.per_client_limit:
+            self._reject(429, "too many concurrent requests from this client", client)
+        if self.in_flight < self.max_in_flight and not self._queues:
+            self._start(client)
+        else:
+            if self._queued >= self.max_queue:
+                self._reject(503, "server is at capacity", client)
+            waiter = asyncio.get_running_loop().create_future()
+            self._queues.setdefault(client, deque()).append(waiter)
+            self._queued += 1
+            self._counters["queued"] += 1
+            self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], self._queued)
+            waited_from = time.monotonic()
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            except asyncio.TimeoutError:
+                if not waiter.done():
+                    self._dequeue(client, waiter)
+                    waiter.cancel()
+                    self._counters["queue_timeouts"] += 1
+                    self._reject(503, "timed out waiting for capacity", client)
+                # else: a slot was granted right at the deadline; go ahead
+            except asyncio.CancelledError:
+                # client went away while queued; give up the slot if it was just granted
+                self._dequeue(client, waiter)
+                if waiter.done() and not waiter.cancelled():
+                    self._finish(client, 0.0)
+                raise
+            self._wait_total += time.monotonic() - waited_from
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._finish(client, time.monotonic() - started)
+
+    @contextlib.asynccontextmanager
+    async def admit_background(self):
+        "a slot for bulk work; never rejected, it waits until interactive traffic leaves room"
+        if self._background_slot_free() and not self._background:
+            self._start_background()
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._background.append(waiter)
+            try:
+                await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                if waiter.done():
+                    self._finish_background()  # granted just as the caller went away
+                else:
+                    self._background.remove(waiter)
+                    waiter.cancel()
+                raise
+        try:
+            yield
+        finally:
+            self._finish_background()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._counters,
+            "in_flight": self.in_flight,
+            "background_in_flight": self.background_in_flight,
+            "background_queue_depth": len(self._background),
+            "queue_depth": self._queued,
+            "clients_waiting": len(self._queues),
+            "avg_queue_wait_s": self._wait_total / self._counters["queued"] if self._counters["queued"] else 0.0,
+            "avg_service_time_s": self._service_time,
+        }
+
+
+def client_id(request, trust_forwarded_for: bool = False) -> str:
+    "the caller's address; X-Forwarded-For is only honoured behind a trusted proxy"
+    if trust_forwarded_for:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def load_admission_controller(config: dict) -> AdmissionController:
+    "build the controller from the `admission` config block"
+    cfg = config.get("admission", {})
+    return AdmissionController(
+        max_in_flight=cfg.get("max_in_flight", 16),
+        max_queue=cfg.get("max_queue", 32),
+        queue_timeout=cfg.get("queue_timeout", 5.0),
+        per_client_limit=cfg.get("per_client_limit", 4),
+        max_background=cfg.get("max_background", 4),
+    )
@@ -1,10 +1,22 @@
+import asyncio
 import uvicorn
-from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Form, UploadFile, File
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from prod_assistant.workflow.agentic_workflow_with_mcp import AgenticRAG
+from prod_assistant.workflow.batch_runner import load_batch_runner
+from prod_assistant.utils.config_loader import load_config
+from prod_assistant.workflow.deadline import skip_stats
+from prod_assistant.utils.single_flight import coalescing_enabled, get_single_flight, single_flight_stats
+from prod_assistant.retriever.result_cache import normalize_query
+from prod_assistant.router.admission import Rejected, client_id, load_admission_controller
+from prod_assistant.utils.shared_cache import shared_cache_stats
+from prod_assistant.utils.llm_cache import llm_cache_stats
+from prod_assistant.utils.rate_limiter import limiter_stats
+from prod_assistant.utils.model_loader import MODEL_REGISTRY
+from prod_assistant.evaluation.online_eval import online_eval_stats
 
 app = FastAPI()
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -20,6 +32,13 @@ app.add_middleware(
 
 # ---- Global Agent Instance ----
 rag_agent: AgenticRAG | None = None
+admission = load_admission_controller(load_config())
+
+
+@app.exception_handler(Rejected)
+async def rejected_handler(request: Request, exc: Rejected):
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.reason},
+                        headers={"Retry-After": str(exc.retry_after)})
 
 
 @app.on_event("startup")
@@ -30,15 +49,49 @@ async def startup_event():
     print("✅ AgenticRAG initialized")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if rag_agent is not None:
+        await rag_agent.close()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     return templates.TemplateResponse("chat.html", {"request": request})
 
 
 @app.post('/get', response_class=HTMLResponse)
-async def chat(msg: str = Form(...)):
-    rag_agent = AgenticRAG()
-    await rag_agent.async_init()
-    response = await rag_agent.run(msg)
+async def chat(request: Request, msg: str = Form(...)):
+    config = load_config()
+    client = client_id(request, config.get("admission", {}).get("trust_forwarded_for", False))
+    # bounded in-flight work; saturation is answered with 429/503 + Retry-After instead of queueing forever
+    async with admission.admit(client):
+        # reuse the startup agent and its MCP sessions instead of reconnecting per request
+        if coalescing_enabled(config, "requests"):
+            # identical questions arriving together share one workflow run
+            response = await get_single_flight("requests").ado(normalize_query(msg), lambda: rag_agent.run(msg))
+        else:
+            response = await rag_agent.run(msg)
     print(f"Response: {response}")
-    return response
\ No newline at end of file
+    return response
+
+
+@app.post('/batch')
+async def batch(file: UploadFile = File(...)):
+    """answer a JSONL file of {'id', 'query'} lines; results stream back as JSONL as they complete.
+    each item takes a background admission slot, so batches never crowd out /get"""
+    lines = (await file.read()).decode("utf-8").splitlines()
+    runner = load_batch_runner(rag_agent, load_config(), admission=admission)
+    return StreamingResponse(runner.run_jsonl(lines), media_type="application/x-ndjson")
+
+
+@app.get('/metrics')
+async def metrics():
+    """admission queue/rejections, deadline skips, collapsed duplicate calls, per-tier/per-node cache hits,
+    per-provider rate limiter queues, model client reuse and HTTP pool usage, conversation checkpointer
+    memory/disk usage, and rolling sampled answer quality next to latency"""
+    # counts rows in SQLite, so it runs off the event loop
+    checkpointer = await asyncio.to_thread(rag_agent.checkpointer.stats) if rag_agent is not None else {}
+    return {"admission": admission.stats(), "deadline": skip_stats(), "single_flight": single_flight_stats(),
+            "shared_cache": shared_cache_stats(), "llm_cache": llm_cache_stats(), "rate_limits": limiter_stats(),
+            "models": MODEL_REGISTRY.stats(), "checkpointer": checkpointer, "online_eval": online_eval_stats()}
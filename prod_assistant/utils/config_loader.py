@@ -1,26 +1,220 @@
 # importing libraries
 from pathlib import Path
+import copy
+import difflib
 import os
+import threading
+import time
+import weakref
 import yaml
 
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
 def _project_root() ->Path:
     return Path(__file__).resolve().parent.parent
 
-def load_config(config_path: str | None = None) ->dict:
-    env_path = os.getenv("CONFIG_PATH")
-    if config_path is None:
-        path = env_path or str(_project_root() / 'config' / 'config.yaml')
-    
+# Known keys per section. `None` means free-form; a nested dict under "*"
+# applies to every child (e.g. each provider under `llm`).
+CONFIG_SCHEMA = {
+    "astra_db": {"collection_name"},
+    "embedding_model": {"provider", "model_name"},
+    "retriever": {"top_k", "fetch_k", "lambda_mult", "score_threshold"},
+    "retrieval_cache": {"enabled", "max_entries", "version_file"},
+    "catalog_index": {"enabled", "path", "min_coverage", "margin", "max_candidates", "title_penalty"},
+    "context_packing": {"dedup_threshold"},
+    "vector_index": {"backend", "path", "nlist", "nprobe", "dtype", "compact_ratio"},
+    "snapshot": {"shard_size", "batch_size", "concurrency", "dtype"},
+    "shared_cache": {"enabled", "backend", "path", "redis_url", "max_entries", "memory_entries", "ttl"},
+    "startup_budget": None,
+    "http_pool": {"max_connections", "max_keepalive_connections", "keepalive_expiry", "timeout", "connect_timeout"},
+    "workflow": {"speculative_search", "retriever_timeout", "web_search_timeout"},
+    "deadline": {"default_budget_s", "max_rewrites", "answer_reserve_s", "min_remaining_s"},
+    "admission": {"max_in_flight", "max_queue", "queue_timeout", "per_client_limit", "trust_forwarded_for",
+                  "max_background"},
+    "single_flight": {"enabled", "requests", "retriever", "embeddings", "llm"},
+    "llm_cache": {"enabled", "call_sites"},
+    "batch": {"concurrency", "item_timeout", "deadline_s"},
+    "jobs": {"db_path", "workers", "poll_interval", "heartbeat_timeout", "cancel_grace", "store_lock"},
+    "intent_router": {"confidence_threshold", "training_data", "model_path"},
+    "grader": {"strategy", "low_threshold", "high_threshold", "title_weight"},
+    "online_eval": {"enabled", "sample_rate", "max_queue", "window", "timeout", "metrics", "log_path"},
+    "checkpointer": {"db_path", "max_threads_in_memory", "ttl_seconds", "max_checkpoints_per_thread", "max_messages"},
+    "mcp_server": {"host", "port", "workers", "max_threads", "retriever_timeout", "retriever_concurrency"},
+    "web_search": {"backend", "timeout", "ttl_seconds", "stale_ttl_seconds", "max_entries", "max_concurrency",
+                   "max_pending"},
+    "mcp_client": {"server_name", "url", "pool_size", "max_retries", "base_backoff", "max_backoff"},
+    "llm_failover": {"enabled", "providers", "hedge_percentile", "min_hedge_delay", "request_timeout",
+                     "failure_threshold", "reset_timeout"},
+    "rate_limits": {"*": {"requests_per_minute", "tokens_per_minute", "max_concurrency"}},
+    "llm": {"*": {"provider", "model_name", "temperature", "max_output_tokens", "max_context_tokens"}},
+}
+
+# Value types for the blocks that are hot-reloaded into running workers, where a bad value
+# would otherwise only fail on the next request. A dict spec describes a nested mapping;
+# its "*" entry applies to every key not listed explicitly.
+_NUMBER = (int, float)
+_OPTIONAL_STR = (str, type(None))
+CONFIG_TYPES = {
+    "retriever": {"top_k": int, "fetch_k": int, "lambda_mult": _NUMBER, "score_threshold": _NUMBER},
+    "retrieval_cache": {"enabled": bool, "max_entries": int, "version_file": str},
+    "grader": {"strategy": str, "low_threshold": _NUMBER, "high_threshold": _NUMBER, "title_weight": _NUMBER},
+    "intent_router": {"confidence_threshold": _NUMBER, "training_data": str, "model_path": str},
+    "catalog_index": {"enabled": bool, "path": str, "min_coverage": _NUMBER, "margin": _NUMBER,
+                      "max_candidates": int, "title_penalty": _NUMBER},
+    "context_packing": {"dedup_threshold": _NUMBER},
+    "deadline": {"default_budget_s": _NUMBER, "max_rewrites": int, "answer_reserve_s": _NUMBER,
+                 "min_remaining_s": {"*": _NUMBER}},
+    "workflow": {"speculative_search": bool, "retriever_timeout": _NUMBER, "web_search_timeout": _NUMBER},
+    "llm_cache": {"enabled": bool, "call_sites": {"*": bool}},
+    "shared_cache": {"enabled": bool, "backend": str, "path": str, "redis_url": str, "max_entries": int,
+                     "memory_entries": int, "ttl": {"*": _NUMBER}},
+    "online_eval": {"enabled": bool, "sample_rate": _NUMBER, "max_queue": int, "window": int, "timeout": _NUMBER,
+                    "metrics": list, "log_path": _OPTIONAL_STR},
+    "llm": {"*": {"provider": str, "model_name": str, "temperature": _NUMBER, "max_output_tokens": int,
+                  "max_context_tokens": int}},
+}
+
+def _check_types(value, spec, where: str):
+    if isinstance(spec, dict):
+        if not isinstance(value, dict):
+            raise ValueError(f"Config value {where} must be a mapping, got {value!r}")
+        for key, child in value.items():
+            child_spec = spec.get(key, spec.get("*"))
+            if child_spec is not None:
+                _check_types(child, child_spec, f"{where}.{key}")
+        return
+    types = spec if isinstance(spec, tuple) else (spec,)
+    # bool is an int subclass, so `true` would otherwise pass for a number
+    if not isinstance(value, types) or (isinstance(value, bool) and bool not in types):
+        names = " or ".join("null" if t is type(None) else t.__name__ for t in types)
+        raise ValueError(f"Config value {where} must be {names}, got {value!r}")
+
+def _unknown_key_error(key, allowed, where):
+    hint = difflib.get_close_matches(key, list(allowed), n=1)
+    suggestion = f" (did you mean '{hint[0]}'?)" if hint else ""
+    return ValueError(f"Unknown config key '{key}' in {where}{suggestion}")
+
+def validate_config(config: dict, schema: dict = CONFIG_SCHEMA) -> dict:
+    "raise ValueError on unknown sections/keys so typos are not silently ignored"
+    for section, value in config.items():
+        if section not in schema:
+            raise _unknown_key_error(section, schema, "config root")
+        allowed = schema[section]
+        if allowed is None:
+            continue
+        if not isinstance(value, dict):
+            raise ValueError(f"Config section '{section}' must be a mapping")
+        if isinstance(allowed, dict) and "*" in allowed:
+            for child, child_value in value.items():
+                for key in (child_value or {}):
+                    if key not in allowed["*"]:
+                        raise _unknown_key_error(key, allowed["*"], f"{section}.{child}")
+            continue
+        for key in value:
+            if key not in allowed:
+                raise _unknown_key_error(key, allowed, section)
+    for section, spec in CONFIG_TYPES.items():
+        if section in config:
+            _check_types(config[section], spec, section)
+    return config
+
+def _resolve_path(config_path: str | None = None) -> Path:
+    path = config_path or os.getenv("CONFIG_PATH") or str(_project_root() / 'config' / 'config.yaml')
     path =  Path(path)
     if not path.is_absolute():
         path = _project_root() / path
-    
-    if not path.exists():
-        raise FileNotFoundError(f"Config file {path} does not exist.")
-    with open(path,'r',encoding='utf-8') as file:
-        config = yaml.safe_load(file)
-        return config or {}
-    
-
-    
-    
\ No newline at end of file
+    return path
+
+class ConfigService:
+    """Parses config.yaml once and hot-reloads it when the file changes.
+
+    Readers get an immutable-by-convention snapshot; a reload builds and
+    validates a new dict and swaps the reference, so a reader never sees a
+    half-applied config. An invalid edit is logged once and the old config
+    kept until the file changes again.
+    """
+    def __init__(self, path: Path, poll_interval: float = 2.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._subscribers = []
+        self._config, self._mtime = self._read()
+        self._watcher = None
+
+    def _read(self):
+        if not self.path.exists():
+            raise FileNotFoundError(f"Config file {self.path} does not exist.")
+        mtime = self.path.stat().st_mtime
+        with open(self.path,'r',encoding='utf-8') as file:
+            config = yaml.safe_load(file) or {}
+        return validate_config(config), mtime
+
+    def get(self) -> dict:
+        return self._config
+
+    def reload(self) -> bool:
+        "re-read the file if it changed; returns True when a new config was swapped in"
+        mtime = None
+        try:
+            mtime = self.path.stat().st_mtime
+            if mtime == self._mtime:
+                return False
+            new_config, mtime = self._read()
+        except Exception as e:
+            log.error("Config reload failed, keeping previous config", path=str(self.path), error=str(e))
+            if mtime is not None:
+                with self._lock:
+                    self._mtime = mtime  # don't re-parse the same bad edit on every poll
+            return False
+
+        with self._lock:
+            old_config, self._config, self._mtime = self._config, new_config, mtime
+            subscribers = list(self._subscribers)
+        log.info("Config reloaded", path=str(self.path))
+
+        for ref in subscribers:
+            callback = ref()
+            if callback is None:
+                continue
+            try:
+                callback(copy.deepcopy(old_config), new_config)
+            except Exception as e:
+                log.error("Config subscriber failed", error=str(e))
+        return True
+
+    def subscribe(self, callback):
+        """call `callback(old, new)` after every reload.
+
+        Bound methods are held weakly so subscribing doesn't keep objects alive.
+        """
+        ref = weakref.WeakMethod(callback) if hasattr(callback, "__self__") else (lambda: callback)
+        with self._lock:
+            self._subscribers = [r for r in self._subscribers if r() is not None] + [ref]
+        self.start_watching()
+
+    def start_watching(self):
+        "poll the file's mtime from a daemon thread"
+        with self._lock:
+            if self._watcher is not None:
+                return
+            self._watcher = threading.Thread(target=self._watch, name="config-watcher", daemon=True)
+            self._watcher.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self.reload()
+
+_services: dict = {}
+_services_lock = threading.Lock()
+
+def get_config_service(config_path: str | None = None) -> ConfigService:
+    path = _resolve_path(config_path)
+    with _services_lock:
+        if path not in _services:
+            _services[path] = ConfigService(path)
+        return _services[path]
+
+def load_config(config_path: str | None = None) ->dict:
+    "current validated config; parsed once per process and refreshed on file change"
+    return get_config_service(config_path).get()
@@ -0,0 +1,225 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import ConfigDict, PrivateAttr
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+
+class CircuitBreaker:
+    "opens after `failure_threshold` consecutive failures, half-opens after `reset_timeout`"
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            # half-open: let a trial request through once the timeout has passed
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if self.allow() else "open"
+
+
+class _ProviderStats:
+    def __init__(self, window: int = 200):
+        self.latencies = deque(maxlen=window)
+        self.wins = 0
+        self.errors = 0
+        self.hedges_fired = 0
+
+    def percentile(self, q: float) -> Optional[float]:
+        if len(self.latencies) < 10:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class HedgedChatModel(BaseChatModel):
+    """Chat model that fans out across providers for tail latency and availability.
+
+    The first healthy provider is called; if it has not answered after its
+    observed `hedge_percentile` latency, a duplicate request goes to the next
+    healthy provider and whichever finishes first wins. Errors and timeouts
+    fail over to the next provider and feed a per-provider circuit breaker.
+    The winner is recorded in `response_metadata["provider"]` and `stats()`.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    providers: Dict[str, Any]
+    hedge_percentile: float = 0.95
+    min_hedge_delay: float = 0.5
+    request_timeout: float = 60.0
+    failure_threshold: int = 3
+    reset_timeout: float = 30.0
+
+    _breakers: Dict[str, CircuitBreaker] = PrivateAttr(default_factory=dict)
+    _stats: Dict[str, _ProviderStats] = PrivateAttr(default_factory=dict)
+    _executor: Any = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._breakers = {n: CircuitBreaker(self.failure_threshold, self.reset_timeout) for n in self.providers}
+        self._stats = {n: _ProviderStats() for n in self.providers}
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=4 * max(len(self.providers), 1), thread_name_prefix="hedged-llm"
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged-" + "-".join(self.providers)
+
+    def _healthy(self) -> List[str]:
+        return [n for n in self.providers if self._breakers[n].allow()] or list(self.providers)
+
+    def _hedge_delay(self, name: str) -> float:
+        observed = self._stats[name].percentile(self.hedge_percentile)
+        return max(observed if observed is not None else self.min_hedge_delay * 4, self.min_hedge_delay)
+
+    def _record(self, name: str, started: float, error: Optional[BaseException] = None):
+        if error is None:
+            self._stats[name].latencies.append(time.monotonic() - started)
+            self._breakers[name].record_success()
+        else:
+            self._stats[name].errors += 1
+            self._breakers[name].record_failure()
+            log.warning("LLM provider failed", provider=name, error=str(error))
+
+    def _result(self, name: str, message: BaseMessage) -> ChatResult:
+        self._stats[name].wins += 1
+        message.response_metadata = {**(message.response_metadata or {}), "provider": name}
+        return ChatResult(generations=[ChatGeneration(message=message)], llm_output={"provider": name})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        order = self._healthy()
+        pending: Dict[concurrent.futures.Future, tuple] = {}
+        deadline = time.monotonic() + self.request_timeout
+        last_error: Optional[BaseException] = None
+
+        def launch(name: str):
+            started = time.monotonic()
+            # carry context vars (e.g. rate-limit priority) into the worker thread
+            ctx = contextvars.copy_context()
+            future = self._executor.submit(ctx.run, self.providers[name].invoke, messages, stop=stop, **kwargs)
+            pending[future] = (name, started)
+
+        launch(order.pop(0))
+        while pending:
+            first_name = next(iter(pending.values()))[0]
+            wait = min(self._hedge_delay(first_name), deadline - time.monotonic()) if order else deadline - time.monotonic()
+            done, _ = concurrent.futures.wait(pending, timeout=max(wait, 0), return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                name, started = pending.pop(future)
+                error = future.exception()
+                self._record(name, started, error)
+                if error is None:
+                    for other in pending:
+                        other.cancel()
+                    return self._result(name, future.result())
+                last_error = error
+
+            if time.monotonic() >= deadline:
+                break
+            if order and (not done or not pending):
+                # slow (hedge) or failed with nothing in flight (failover)
+                name = order.pop(0)
+                if done:
+                    log.info("Failing over to next LLM provider", provider=name)
+                else:
+                    self._stats[name].hedges_fired += 1
+                    log.info("Hedging slow LLM request", provider=name)
+                launch(name)
+
+        for future, (name, started) in pending.items():
+            self._record(name, started, TimeoutError("LLM request timed out"))
+        raise last_error or TimeoutError("All LLM providers timed out")
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        order = self._healthy()
+        pending: Dict[asyncio.Task, tuple] = {}
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.request_timeout
+        last_error: Optional[BaseException] = None
+
+        def launch(name: str):
+            task = asyncio.create_task(self.providers[name].ainvoke(messages, stop=stop, **kwargs))
+            pending[task] = (name, time.monotonic())
+
+        launch(order.pop(0))
+        try:
+            while pending:
+                first_name = next(iter(pending.values()))[0]
+                remaining = deadline - loop.time()
+                wait = min(self._hedge_delay(first_name), remaining) if order else remaining
+                done, _ = await asyncio.wait(pending, timeout=max(wait, 0), return_when=asyncio.FIRST_COMPLETED)
+
+                for task in done:
+                    name, started = pending.pop(task)
+                    error = task.exception()
+                    self._record(name, started, error)
+                    if error is None:
+                        return self._result(name, task.result())
+                    last_error = error
+
+                if loop.time() >= deadline:
+                    break
+                if order and (not done or not pending):
+                    name = order.pop(0)
+                    if done:
+                        log.info("Failing over to next LLM provider", provider=name)
+                    else:
+                        self._stats[name].hedges_fired += 1
+                        log.info("Hedging slow LLM request", provider=name)
+                    launch(name)
+        finally:
+            for task in pending:
+                task.cancel()
+
+        for name, started in pending.values():
+            self._record(name, started, TimeoutError("LLM request timed out"))
+        raise last_error or TimeoutError("All LLM providers timed out")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {
+                "wins": s.wins,
+                "errors": s.errors,
+                "hedges_fired": s.hedges_fired,
+                "p50_s": s.percentile(0.5),
+                "hedge_delay_s": self._hedge_delay(name),
+                "circuit": self._breakers[name].state,
+            }
+            for name, s in self._stats.items()
+        }
@@ -0,0 +1,101 @@
+import copy
+import threading
+from typing import Any, Dict, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import ConfigDict
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+# nodes that call the LLM, each of which can be cached separately
+CALL_SITES = ("assistant", "generator", "rewriter", "grader", "filter")
+
+_site_counters: Dict[str, Dict[str, int]] = {}
+_counters_lock = threading.Lock()
+
+
+def _count(call_site: str, event: str):
+    with _counters_lock:
+        counters = _site_counters.setdefault(call_site, {"hits": 0, "misses": 0})
+        counters[event] = counters.get(event, 0) + 1
+
+
+def llm_cache_stats() -> Dict[str, Dict[str, Any]]:
+    with _counters_lock:
+        stats = {}
+        for site, counters in _site_counters.items():
+            lookups = counters["hits"] + counters["misses"]
+            stats[site] = {**counters, "hit_rate": counters["hits"] / lookups if lookups else 0.0}
+        return stats
+
+
+def llm_cache_enabled(config: dict, call_site: Optional[str]) -> bool:
+    cfg = config.get("llm_cache", {})
+    return bool(call_site and cfg.get("enabled", True) and cfg.get("call_sites", {}).get(call_site, False))
+
+
+class CachingChatModel(BaseChatModel):
+    """Serves repeated prompts from a TieredCache instead of calling the wrapped model.
+
+    The key covers `model_id` (provider, model and sampling parameters), the
+    rendered messages, stop sequences and call kwargs, so a hit is only
+    possible for a byte-identical request to the same configuration. Only
+    worth wrapping deterministic (temperature 0) models. Hits and misses are
+    counted per `call_site`.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    llm: Any
+    response_cache: Any
+    call_site: str
+    model_id: str
+
+    @property
+    def _llm_type(self) -> str:
+        return f"caching-{getattr(self.llm, '_llm_type', 'chat')}"
+
+    def _key(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> str:
+        return self.response_cache.key(self.model_id, [[m.type, m.content] for m in messages], stop,
+                                       sorted((k, str(v)) for k, v in kwargs.items()))
+
+    @staticmethod
+    def _reply(message: BaseMessage) -> ChatResult:
+        # callers' run managers stamp ids onto the message, so don't share the object
+        return ChatResult(generations=[ChatGeneration(message=copy.deepcopy(message))])
+
+    def _cached(self, message: Optional[BaseMessage]) -> Optional[ChatResult]:
+        _count(self.call_site, "misses" if message is None else "hits")
+        return None if message is None else self._reply(message)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        key = self._key(messages, stop, kwargs)
+        cached = self._cached(self.response_cache.get(key))
+        if cached is not None:
+            return cached
+        message = self.llm.invoke(messages, stop=stop, **kwargs)
+        self.response_cache.set(key, message)
+        return self._reply(message)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        key = self._key(messages, stop, kwargs)
+        # the shared tier is blocking SQLite/Redis I/O, so it runs off the event loop
+        cached = self._cached(await self.response_cache.aget(key))
+        if cached is not None:
+            return cached
+        message = await self.llm.ainvoke(messages, stop=stop, **kwargs)
+        await self.response_cache.aset(key, message)
+        return self._reply(message)
+
+
+def wrap_llm_cache(llm, cache, call_site: str, model_id: str, temperatures: List[float]):
+    "CachingChatModel around `llm` unless any of the models behind it samples (temperature > 0)"
+    if any(t for t in temperatures):
+        log.warning("LLM response cache skipped for a non-deterministic model", call_site=call_site,
+                    temperatures=temperatures)
+        return llm
+    return CachingChatModel(llm=llm, response_cache=cache, call_site=call_site, model_id=model_id)
@@ -1,15 +1,17 @@
-from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_groq import ChatGroq
-from langchain_openai.embeddings import OpenAIEmbeddings
 from prod_assistant.exception.custom_exception import ProductAssistantException
 from prod_assistant.logger import GLOBAL_LOGGER as log
 from prod_assistant.utils.config_loader import load_config
+from prod_assistant.utils.rate_limiter import RateLimitedChatModel, RateLimitedEmbeddings, get_limiter
+from prod_assistant.utils.single_flight import CoalescingChatModel, CoalescingEmbeddings, coalescing_enabled, get_single_flight
+from prod_assistant.utils.shared_cache import CachingEmbeddings, get_shared_cache
+from prod_assistant.utils.llm_cache import llm_cache_enabled, wrap_llm_cache
 import asyncio
+import functools
 import json
 import os
 import sys
+import threading
 
 class ApiManager:
     REQUIRED_KEYS =['OPENAI_API_KEY','GOOGLE_API_KEY','GROQ_API_KEY']
@@ -49,37 +51,204 @@ class ApiManager:
             raise KeyError(f"API key {key} not found")
         return val
     
+class ModelRegistry:
+    """Process-wide cache of model clients sharing keep-alive HTTP pools.
+
+    Clients are memoized per (kind, provider, model, params), so every
+    `ModelLoader` in the process hands out the same instances and the same
+    warmed-up connections instead of paying client construction and TLS
+    handshakes on the request path.
+    """
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._pool_config = {}
+        self._http_client = None
+        self._http_async_client = None
+        self._counters = {"hits": 0, "misses": 0}
+        
+    def configure(self, pool_config: dict):
+        "pool settings only apply before the shared HTTP clients are first created"
+        with self._lock:
+            if self._http_client is None:
+                self._pool_config = pool_config or {}
+                
+    def new_http_clients(self):
+        "a fresh (sync, async) httpx client pair with the configured pool settings"
+        import httpx
+        limits = httpx.Limits(
+            max_connections=self._pool_config.get('max_connections', 100),
+            max_keepalive_connections=self._pool_config.get('max_keepalive_connections', 20),
+            keepalive_expiry=self._pool_config.get('keepalive_expiry', 60),
+        )
+        timeout = httpx.Timeout(self._pool_config.get('timeout', 60), connect=self._pool_config.get('connect_timeout', 10))
+        return httpx.Client(limits=limits, timeout=timeout), httpx.AsyncClient(limits=limits, timeout=timeout)
+        
+    def http_clients(self):
+        "shared (sync, async) httpx clients with tuned keep-alive pools"
+        with self._lock:
+            if self._http_client is None:
+                self._http_client, self._http_async_client = self.new_http_clients()
+                log.info("Shared HTTP connection pools created", **self._pool_config)
+            return self._http_client, self._http_async_client
+        
+    def get_or_create(self, key: tuple, factory):
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._counters["hits"] += 1
+                return client
+            self._counters["misses"] += 1
+        client = factory()
+        with self._lock:
+            # another thread may have won the race; keep the first one
+            return self._clients.setdefault(key, client)
+        
+    @staticmethod
+    def _pool_connections(client):
+        # httpx does not expose pool state publicly; read httpcore's pool if present
+        pool = getattr(getattr(client, '_transport', None), '_pool', None)
+        connections = getattr(pool, 'connections', None)
+        if connections is None:
+            return None
+        idle = sum(1 for c in connections if getattr(c, 'is_idle', lambda: False)())
+        return {"open": len(connections), "idle": idle}
+        
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "clients": [list(map(str, k[:3])) for k in self._clients],
+                **self._counters,
+                "sync_pool": self._pool_connections(self._http_client) if self._http_client else None,
+                "async_pool": self._pool_connections(self._http_async_client) if self._http_async_client else None,
+            }
+        
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+@functools.lru_cache(maxsize=1)
+def _load_environment():
+    if os.getenv("ENV","local").lower() != 'production':
+        load_dotenv(override =True)
+        log.info('Running in local,env loaded')
+    else:
+        log.info('Running in Production mode')
+
+
+@functools.lru_cache(maxsize=1)
+def get_api_manager() -> ApiManager:
+    "validated API keys, shared by every ModelLoader in the process"
+    _load_environment()
+    return ApiManager()
+
+
 class ModelLoader:
     "load models based on config"
     def __init__(self):
-        if os.getenv("ENV","local").lower() != 'production':
-            load_dotenv(override =True)
-            load_dotenv()
-            log.info('Running in local,env loaded')
-        else:
-            log.info('Running in Production mode')
-            
-        self.api_key_mgr = ApiManager()
-        self.config  = load_config()
+        self.api_key_mgr = get_api_manager()
+        MODEL_REGISTRY.configure(self.config.get('http_pool', {}))
         log.info("Config loaded successfully",config_keys = list(self.config.keys()))
+        
+    @property
+    def config(self) -> dict:
+        # always the live config, so a reload changes what load_llm() builds
+        return load_config()
             
-    def load_embedding_model(self):
+    def load_embedding_model(self, dedicated: bool = False):
+        """the configured embedding model, shared through MODEL_REGISTRY.
+        dedicated=True builds a private, rate-limited instance with its own HTTP client, without
+        single-flight or the shared cache, for callers running on their own event loop"""
         try:
             model_name = self.config['embedding_model']['model_name']
-            log.info("Loading embedding model", model_name = model_name)
                 
             try:
                 asyncio.get_event_loop()
             except RuntimeError:
                 asyncio.set_event_loop(asyncio.new_event_loop())
                 
-            return OpenAIEmbeddings(model=model_name,api_key = self.api_key_mgr.get("OPENAI_API_KEY"))
+            def build():
+                from langchain_openai.embeddings import OpenAIEmbeddings
+                log.info("Loading embedding model", model_name = model_name)
+                http_client, http_async_client = MODEL_REGISTRY.new_http_clients() if dedicated else MODEL_REGISTRY.http_clients()
+                embeddings = OpenAIEmbeddings(model=model_name,api_key = self.api_key_mgr.get("OPENAI_API_KEY"),
+                                        http_client=http_client, http_async_client=http_async_client)
+                limiter = get_limiter('openai', self.config)
+                if limiter:
+                    embeddings = RateLimitedEmbeddings(embeddings, limiter)
+                if coalesce:
+                    embeddings = CoalescingEmbeddings(embeddings, get_single_flight(f'embeddings:{model_name}'))
+                if shared_cache:
+                    # vectors computed by any worker are reused by all of them
+                    embeddings = CachingEmbeddings(embeddings, shared_cache, model_name)
+                return embeddings
+            coalesce = coalescing_enabled(self.config, 'embeddings') and not dedicated
+            shared_cache = None if dedicated else get_shared_cache('embedding', self.config)
+            if dedicated:
+                return build()
+            return MODEL_REGISTRY.get_or_create(("embedding", "openai", model_name, coalesce, shared_cache is not None), build)
         except Exception as e:
             log.error("Error loading embedding model", error = str(e))
             raise ProductAssistantException("Error loading embedding model", sys)
-    def load_llm(self):
+    def load_llm(self, call_site: str | None = None, dedicated: bool = False):
+        """the configured chat model, or a hedged/failover composite when llm_failover is enabled.
+        With a `call_site` enabled under llm_cache.call_sites, repeated prompts are served from the response cache.
+        dedicated=True builds a private, rate-limited client for the primary provider with its own HTTP client,
+        bypassing the registry, single-flight, failover and the response cache: the shared async clients and
+        in-flight futures belong to the app's event loop and can't be used from another loop"""
+        if dedicated:
+            return self._load_provider_llm(os.getenv('LLM_PROVIDER','openai'), dedicated=True)
+        failover_cfg = self.config.get('llm_failover', {})
+        if failover_cfg.get('enabled'):
+            names = self._hedged_provider_names(failover_cfg)
+            llm = self._load_hedged_llm(failover_cfg)
+        else:
+            names = [os.getenv('LLM_PROVIDER','openai')]
+            llm = self._load_provider_llm(names[0])
+        if not llm_cache_enabled(self.config, call_site):
+            return llm
+        response_cache = get_shared_cache('llm', self.config)
+        if response_cache is None:
+            return llm
+        llm_configs = [self.config['llm'][name] for name in names]
+        # any change to provider, model or sampling parameters lands in a different key space
+        model_id = json.dumps([failover_cfg if failover_cfg.get('enabled') else None, llm_configs], sort_keys=True, default=str)
+        return MODEL_REGISTRY.get_or_create(
+            ("llm-cache", call_site, model_id, id(llm), id(response_cache)),
+            lambda: wrap_llm_cache(llm, response_cache, call_site, model_id,
+                                   [c.get('temperature', 0.2) for c in llm_configs]))
+    
+    def _hedged_provider_names(self, failover_cfg: dict) -> list:
+        names = list(failover_cfg.get('providers', list(self.config['llm'])))
+        primary = os.getenv('LLM_PROVIDER')
+        if primary in names:
+            names.remove(primary)
+            names.insert(0, primary)
+        return names
+    
+    def _load_hedged_llm(self, failover_cfg: dict):
+        from prod_assistant.utils.hedged_llm import HedgedChatModel
+        names = self._hedged_provider_names(failover_cfg)
+        
+        def build():
+            log.info('Loading hedged LLM', providers = names)
+            return HedgedChatModel(
+                providers = {name: self._load_provider_llm(name) for name in names},
+                hedge_percentile = failover_cfg.get('hedge_percentile', 0.95),
+                min_hedge_delay = failover_cfg.get('min_hedge_delay', 0.5),
+                request_timeout = failover_cfg.get('request_timeout', 60),
+                failure_threshold = failover_cfg.get('failure_threshold', 3),
+                reset_timeout = failover_cfg.get('reset_timeout', 30),
+            )
+        key = ("llm", "hedged", tuple(names), tuple(sorted((k, str(v)) for k, v in failover_cfg.items())))
+        return MODEL_REGISTRY.get_or_create(key, build)
+        
+    def _load_provider_llm(self, provider: str, dedicated: bool = False):
         llm_block = self.config['llm']
-        provider = os.getenv('LLM_PROVIDER','openai')
                 
         if provider not in llm_block:
             log.error(f"Provider {provider} not found in config")
@@ -88,22 +257,46 @@ class ModelLoader:
         llm_config = llm_block[provider]
         provider = llm_config.get('provider')
         model_name = llm_config.get('model_name')
-        temperature = llm_config.get('temprature',0.2)
+        temperature = llm_config.get('temperature',0.2)
         max_tokens = llm_config.get('max_output_tokens', 1000)
+        
+        if provider not in ('openai', 'google', 'groq'):
+            log.error("unsupported LLM provider",provider = provider)
+            raise ValueError(f"Unsupported LLM provider {provider}")
                 
-        log.info('Loading LLM',provider = provider, model_name = model_name)
+        def build():
+            llm = build_client()
+            limiter = get_limiter(provider, self.config)
+            if limiter:
+                llm = RateLimitedChatModel(llm = llm, limiter = limiter, completion_tokens = max_tokens)
+            if coalesce:
+                # only calls to the same model with the same parameters may share a response
+                flight = get_single_flight(f'llm:{provider}:{model_name}:temperature={temperature}:max_tokens={max_tokens}')
+                llm = CoalescingChatModel(llm = llm, flight = flight)
+            return llm
                 
-        if provider == 'openai':
-            return ChatOpenAI(model_name = model_name, api_key = self.api_key_mgr.get("OPENAI_API_KEY"), temperature=temperature, max_tokens = max_tokens) 
-                    
-        elif provider == 'google':
-            return ChatGoogleGenerativeAI(model = model_name, api_key = self.api_key_mgr.get("GOOGLE_API_KEY"), temperature=temperature, max_tokens = max_tokens)
-        elif provider  == 'groq':
-            return ChatGroq(model = model_name, api_key = self.api_key_mgr.get("GROQ_API_KEY"), temperature=temperature, max_tokens = max_tokens)
+        def build_client():
+            # provider SDKs are imported on first use; only the configured one is loaded
+            log.info('Loading LLM',provider = provider, model_name = model_name)
+            if provider == 'openai':
+                from langchain_openai import ChatOpenAI
+                http_client, http_async_client = MODEL_REGISTRY.new_http_clients() if dedicated else MODEL_REGISTRY.http_clients()
+                return ChatOpenAI(model_name = model_name, api_key = self.api_key_mgr.get("OPENAI_API_KEY"), temperature=temperature, max_tokens = max_tokens,
+                                  http_client=http_client, http_async_client=http_async_client)
+            elif provider == 'google':
+                # the Gemini SDK manages its own gRPC/REST transport
+                from langchain_google_genai import ChatGoogleGenerativeAI
+                return ChatGoogleGenerativeAI(model = model_name, api_key = self.api_key_mgr.get("GOOGLE_API_KEY"), temperature=temperature, max_tokens = max_tokens)
+            else:
+                from langchain_groq import ChatGroq
+                http_client, http_async_client = MODEL_REGISTRY.new_http_clients() if dedicated else MODEL_REGISTRY.http_clients()
+                return ChatGroq(model = model_name, api_key = self.api_key_mgr.get("GROQ_API_KEY"), temperature=temperature, max_tokens = max_tokens,
+                                http_client=http_client, http_async_client=http_async_client)
                 
-        else:
-            log.error("unsupported LLM provider",provider = provider)
-            raise ValueError(f"Unsupported LLM provider {provider}")
+        coalesce = coalescing_enabled(self.config, 'llm') and not dedicated
+        if dedicated:
+            return build()
+        return MODEL_REGISTRY.get_or_create(("llm", provider, model_name, temperature, max_tokens, coalesce), build)
 
 if __name__ == "__main__":
     loader = ModelLoader()
@@ -119,6 +312,10 @@ if __name__ == "__main__":
     print(f"LLM Loaded: {llm}")
     result = llm.invoke("Hello, how are you?")
     print(f"LLM Result: {result.content}")
+
+    # A second loader reuses the same clients and connection pool
+    assert ModelLoader().load_llm() is llm
+    print(f"Registry stats: {MODEL_REGISTRY.stats()}")
                 
     
                 
@@ -0,0 +1,294 @@
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import math
+import threading
+import time
+from enum import IntEnum
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import ConfigDict
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+
+class Priority(IntEnum):
+    "lower value is served first"
+    INTERACTIVE = 0
+    BACKGROUND = 10
+
+
+_current_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+@contextlib.contextmanager
+def priority_scope(priority: Priority):
+    """Tag every model call made inside the block, e.g. ingestion or evaluation:
+
+        with priority_scope(Priority.BACKGROUND):
+            ingestion.run_pipeline()
+    """
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / 4)
+
+
+class TokenBucket:
+    "refills continuously at `per_minute / 60` units per second up to `per_minute`"
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        "seconds until `amount` is available (0 if now); a request larger than capacity waits for a full bucket"
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        "charge (positive) or refund (negative) once the real usage is known"
+        self._refill()
+        self.level = min(self.capacity, self.level - delta)
+
+
+class ProviderLimiter:
+    """Requests/min and tokens/min buckets plus a concurrency cap for one provider key.
+
+    Waiters are served strictly by (priority, arrival), so queued interactive
+    chat calls overtake queued ingestion/evaluation calls. Works from threads
+    (`acquire`) and from asyncio (`aacquire`).
+    """
+
+    def __init__(self, name: str, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_concurrency: int = 8):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self._cond = threading.Condition()
+        self._queue: List[tuple] = []
+        self._seq = itertools.count()
+        self._wait_stats: Dict[str, Dict[str, float]] = {
+            p.name.lower(): {"count": 0, "total_s": 0.0, "max_s": 0.0} for p in Priority
+        }
+
+    def _try_acquire(self, ticket: tuple, tokens: int) -> float:
+        "called under the lock; returns 0 when acquired, else how long to wait"
+        if self._queue[0] != ticket or self.in_flight >= self.max_concurrency:
+            return 0.05
+        wait = max(
+            self.requests.wait_time(1) if self.requests else 0.0,
+            self.tokens.wait_time(tokens) if self.tokens else 0.0,
+        )
+        if wait > 0:
+            return wait
+        heapq.heappop(self._queue)
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(tokens)
+        self.in_flight += 1
+        return 0.0
+
+    def _record_wait(self, priority: Priority, waited: float):
+        stats = self._wait_stats[Priority(priority).name.lower()]
+        stats["count"] += 1
+        stats["total_s"] += waited
+        stats["max_s"] = max(stats["max_s"], waited)
+        if waited > 1.0:
+            log.info("Rate limiter queue wait", provider=self.name, priority=Priority(priority).name, wait_s=round(waited, 3))
+
+    def acquire(self, tokens: int = 0, priority: Optional[Priority] = None) -> float:
+        priority = _current_priority.get() if priority is None else priority
+        start = time.monotonic()
+        with self._cond:
+            ticket = (int(priority), next(self._seq))
+            heapq.heappush(self._queue, ticket)
+            self._cond.notify_all()
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if wait == 0:
+                    break
+                self._cond.wait(timeout=min(wait, 0.25))
+            self._cond.notify_all()
+        waited = time.monotonic() - start
+        self._record_wait(priority, waited)
+        return waited
+
+    async def aacquire(self, tokens: int = 0, priority: Optional[Priority] = None) -> float:
+        priority = _current_priority.get() if priority is None else priority
+        start = time.monotonic()
+        with self._cond:
+            ticket = (int(priority), next(self._seq))
+            heapq.heappush(self._queue, ticket)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._try_acquire(ticket, tokens)
+                    if wait == 0:
+                        self._cond.notify_all()
+                        break
+                await asyncio.sleep(min(wait, 0.05))
+        except asyncio.CancelledError:
+            with self._cond:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                self._cond.notify_all()
+            raise
+        waited = time.monotonic() - start
+        self._record_wait(priority, waited)
+        return waited
+
+    def release(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None):
+        with self._cond:
+            self.in_flight -= 1
+            if self.tokens and actual_tokens is not None:
+                self.tokens.adjust(actual_tokens - estimated_tokens)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "in_flight": self.in_flight,
+                "queued": len(self._queue),
+                "queue_wait": {
+                    p: {**s, "avg_s": s["total_s"] / s["count"] if s["count"] else 0.0}
+                    for p, s in self._wait_stats.items()
+                },
+            }
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str, config: dict) -> Optional[ProviderLimiter]:
+    "one shared limiter per provider (i.e. per API key), from the `rate_limits` config block"
+    cfg = config.get("rate_limits", {}).get(provider)
+    if not cfg:
+        return None
+    with _limiters_lock:
+        if provider not in _limiters:
+            _limiters[provider] = ProviderLimiter(
+                provider,
+                requests_per_minute=cfg.get("requests_per_minute"),
+                tokens_per_minute=cfg.get("tokens_per_minute"),
+                max_concurrency=cfg.get("max_concurrency", 8),
+            )
+        return _limiters[provider]
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        return {name: limiter.stats() for name, limiter in _limiters.items()}
+
+
+def _prompt_tokens(messages: List[BaseMessage]) -> int:
+    return sum(estimate_tokens(str(m.content)) for m in messages)
+
+
+def _usage_tokens(message: BaseMessage) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+class RateLimitedChatModel(BaseChatModel):
+    "wraps a chat model so every call goes through its provider's ProviderLimiter"
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    llm: Any
+    limiter: Any
+    completion_tokens: int = 256
+
+    @property
+    def _llm_type(self) -> str:
+        return f"rate-limited-{getattr(self.llm, '_llm_type', 'chat')}"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        estimate = _prompt_tokens(messages) + self.completion_tokens
+        self.limiter.acquire(estimate)
+        message = None
+        try:
+            message = self.llm.invoke(messages, stop=stop, **kwargs)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        finally:
+            self.limiter.release(estimate, _usage_tokens(message) if message is not None else None)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        estimate = _prompt_tokens(messages) + self.completion_tokens
+        await self.limiter.aacquire(estimate)
+        message = None
+        try:
+            message = await self.llm.ainvoke(messages, stop=stop, **kwargs)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        finally:
+            self.limiter.release(estimate, _usage_tokens(message) if message is not None else None)
+
+
+class RateLimitedEmbeddings(Embeddings):
+    "same limiter for embedding calls; one request per embed call, tokens by text length"
+
+    def __init__(self, embeddings: Embeddings, limiter: ProviderLimiter):
+        self.embeddings = embeddings
+        self.limiter = limiter
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        tokens = sum(estimate_tokens(t) for t in texts)
+        self.limiter.acquire(tokens)
+        try:
+            return self.embeddings.embed_documents(texts)
+        finally:
+            self.limiter.release(tokens)
+
+    def embed_query(self, text: str) -> List[float]:
+        tokens = estimate_tokens(text)
+        self.limiter.acquire(tokens)
+        try:
+            return self.embeddings.embed_query(text)
+        finally:
+            self.limiter.release(tokens)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        tokens = sum(estimate_tokens(t) for t in texts)
+        await self.limiter.aacquire(tokens)
+        try:
+            return await self.embeddings.aembed_documents(texts)
+        finally:
+            self.limiter.release(tokens)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        tokens = estimate_tokens(text)
+        await self.limiter.aacquire(tokens)
+        try:
+            return await self.embeddings.aembed_query(text)
+        finally:
+            self.limiter.release(tokens)
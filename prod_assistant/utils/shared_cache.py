@@ -0,0 +1,366 @@
+import asyncio
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at);
+CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at);
+"""
+
+
+def make_key(namespace: str, *parts: Any) -> str:
+    "stable cache key shared by every worker: namespace plus a hash of the JSON-encoded parts"
+    digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+class SharedStore(ABC):
+    "byte store visible to every worker process on the host (or cluster, for Redis)"
+
+    name = "base"
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float):
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class SQLiteStore(SharedStore):
+    """Shared tier in a local SQLite file in WAL mode.
+
+    Readers don't block each other or the writer across processes. Expired
+    rows are swept and the table is trimmed to `max_entries` (least recently
+    read first) every `sweep_every` writes.
+
+    A read doesn't write: read times are collected in memory and stored in
+    one transaction every `touch_batch` reads or `touch_interval` seconds, or
+    with the next write, so reads don't queue on the database's write lock.
+    Recency for trimming is therefore approximate by up to one batch.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = "data/shared_cache.sqlite", max_entries: int = 100_000, sweep_every: int = 200,
+                 touch_batch: int = 256, touch_interval: float = 5.0):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.sweep_every = sweep_every
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self.lock = threading.Lock()
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self._touched: Dict[str, float] = {}  # key -> last read time not yet stored
+        self._last_touch_flush = time.time()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] < now:
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_batch or now - self._last_touch_flush >= self.touch_interval:
+                self._write(lambda: None)
+            return row[0]
+
+    def set(self, key: str, value: bytes, ttl: float):
+        now = time.time()
+
+        def upsert():
+            self.conn.execute(
+                "INSERT INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, "
+                "accessed_at = excluded.accessed_at",
+                (key, sqlite3.Binary(value), now + ttl, now),
+            )
+            self._writes += 1
+            if self._writes % self.sweep_every == 0:
+                self._sweep(now)
+
+        with self.lock:
+            self._touched.pop(key, None)
+            self._write(upsert)
+
+    def _write(self, fn):
+        "called under the lock; runs `fn` and stores pending read times in a single write transaction"
+        touched, self._touched = self._touched, {}
+        self._last_touch_flush = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if touched:
+                self.conn.executemany("UPDATE cache SET accessed_at = ? WHERE key = ? AND accessed_at < ?",
+                                      [(at, key, at) for key, at in touched.items()])
+            fn()
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def _sweep(self, now: float):
+        "called under the lock"
+        self.conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+        self.conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        return {"entries": entries, "db_bytes": page_count * page_size}
+
+
+class RedisStore(SharedStore):
+    """Shared tier on any Redis-protocol server (Redis, Valkey, KeyDB or a local stand-in).
+
+    Size limits are left to the server's maxmemory policy. Needs the optional
+    `redis` package, which isn't in requirements.txt.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "prod_assistant:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("shared_cache.backend 'redis' needs the redis package: pip install redis") from e
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float):
+        self.client.set(self.prefix + key, value, ex=max(int(ttl), 1))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": self.client.dbsize()}
+
+
+class TieredCache:
+    """Per-process LRU in front of a SharedStore, for one namespace.
+
+    Values are pickled into the shared store, which must only be writable by
+    this deployment. A shared hit is promoted into the local tier. Hit
+    counters are kept per tier. Coroutines use `aget`/`aset`, which run the
+    shared store's blocking I/O on a worker thread.
+    """
+
+    def __init__(self, namespace: str, store: Optional[SharedStore], ttl: float = 3600, memory_entries: int = 256):
+        self.namespace = namespace
+        self.store = store
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"memory_hits": 0, "shared_hits": 0, "misses": 0, "sets": 0, "errors": 0}
+
+    def key(self, *parts: Any) -> str:
+        return make_key(self.namespace, *parts)
+
+    def _remember(self, key: str, value: Any, expires_at: float):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _memory_get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] >= time.time():
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return entry[1]
+        return None
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._memory_get(key)
+        return value if value is not None else self._shared_get(key)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        value = self._memory_get(key)
+        if value is not None:
+            return value
+        if self.store is None:
+            return self._shared_get(key)  # only counts the miss
+        return await asyncio.to_thread(self._shared_get, key)
+
+    def _shared_get(self, key: str) -> Optional[Any]:
+        if self.store is not None:
+            try:
+                raw = self.store.get(key)
+            except Exception as e:
+                self._counters["errors"] += 1
+                log.warning("Shared cache read failed", namespace=self.namespace, error=str(e))
+                raw = None
+            if raw is not None:
+                value = pickle.loads(raw)
+                # the shared entry's real expiry isn't known here; keep it locally for at most one ttl
+                self._remember(key, value, time.time() + self.ttl)
+                self._counters["shared_hits"] += 1
+                return value
+        self._counters["misses"] += 1
+        return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._remember(key, value, time.time() + ttl)
+        self._counters["sets"] += 1
+        if self.store is not None:
+            self._shared_set(key, value, ttl)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._remember(key, value, time.time() + ttl)
+        self._counters["sets"] += 1
+        if self.store is not None:
+            await asyncio.to_thread(self._shared_set, key, value, ttl)
+
+    def _shared_set(self, key: str, value: Any, ttl: float):
+        try:
+            self.store.set(key, pickle.dumps(value), ttl)
+        except Exception as e:
+            self._counters["errors"] += 1
+            log.warning("Shared cache write failed", namespace=self.namespace, error=str(e))
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._counters["memory_hits"] + self._counters["shared_hits"] + self._counters["misses"]
+        hits = lookups - self._counters["misses"]
+        return {
+            **self._counters,
+            "memory_entries": len(self._memory),
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "backend": self.store.name if self.store else "memory",
+        }
+
+
+class CachingEmbeddings(Embeddings):
+    "serves repeated texts' vectors from a TieredCache, keyed by model and text"
+
+    def __init__(self, embeddings: Embeddings, cache: TieredCache, model_name: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    def _key(self, text: str) -> str:
+        return self.cache.key(self.model_name, text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = [self.cache.get(self._key(t)) for t in texts]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            fresh = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                self.cache.set(self._key(texts[i]), vector)
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(self._key(text))
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.set(self._key(text), vector)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # one worker thread for the whole batch rather than one per text
+        vectors = await asyncio.to_thread(lambda: [self.cache.get(self._key(t)) for t in texts])
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            fresh = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, fresh):
+                vectors[i] = vector
+            await asyncio.to_thread(lambda: [self.cache.set(self._key(texts[i]), vectors[i]) for i in missing])
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        vector = await self.cache.aget(self._key(text))
+        if vector is None:
+            vector = await self.embeddings.aembed_query(text)
+            await self.cache.aset(self._key(text), vector)
+        return vector
+
+
+_store: Optional[SharedStore] = None
+_store_config: Optional[tuple] = None
+_caches: Dict[str, TieredCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _load_store(cfg: dict) -> Optional[SharedStore]:
+    backend = cfg.get("backend", "sqlite")
+    if backend == "sqlite":
+        return SQLiteStore(cfg.get("path", "data/shared_cache.sqlite"), max_entries=cfg.get("max_entries", 100_000))
+    if backend == "redis":
+        return RedisStore(cfg.get("redis_url", "redis://localhost:6379/0"))
+    if backend == "none":
+        return None
+    raise ValueError(f"Unsupported shared_cache backend {backend}")
+
+
+def get_shared_cache(namespace: str, config: dict) -> Optional[TieredCache]:
+    """Process-wide TieredCache for `namespace` ("answer", "retrieval", "embedding").
+
+    Returns None when the namespace is disabled via `shared_cache.ttl.<namespace>: 0`
+    or the whole block via `enabled: false`.
+    """
+    global _store, _store_config
+    cfg = config.get("shared_cache", {})
+    ttl = cfg.get("ttl", {}).get(namespace, 3600)
+    if not cfg.get("enabled", True) or not ttl:
+        return None
+    with _caches_lock:
+        store_config = (cfg.get("backend", "sqlite"), cfg.get("path"), cfg.get("redis_url"), cfg.get("max_entries"))
+        if store_config != _store_config:
+            _store, _store_config = _load_store(cfg), store_config
+            _caches.clear()
+            log.info("Shared cache tier ready", backend=_store.name if _store else "none")
+        cache = _caches.get(namespace)
+        if cache is None or cache.ttl != ttl:
+            cache = _caches[namespace] = TieredCache(namespace, _store, ttl=ttl,
+                                                     memory_entries=cfg.get("memory_entries", 256))
+        return cache
+
+
+def shared_cache_stats() -> Dict[str, Any]:
+    with _caches_lock:
+        stats = {name: cache.stats() for name, cache in _caches.items()}
+        store = _store
+    if store is not None:
+        try:
+            stats["store"] = {"backend": store.name, **store.stats()}
+        except Exception as e:
+            stats["store"] = {"backend": store.name, "error": str(e)}
+    return stats
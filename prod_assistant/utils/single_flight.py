@@ -0,0 +1,176 @@
+import asyncio
+import copy
+import hashlib
+import json
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import ConfigDict
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the work; callers arriving while it is
+    in flight wait for it and receive the same result (or exception).
+    Nothing is cached once the call completes. `do` is for threads, `ado`
+    for coroutines; async flights are kept per event loop, since a future
+    can only be awaited on the loop that created it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Future]]" = \
+            weakref.WeakKeyDictionary()
+        self._counters = {"calls": 0, "executions": 0, "collapsed": 0}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._counters["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counters["executions"] += 1
+            else:
+                call.waiters += 1
+                self._counters["collapsed"] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+            if call.waiters:
+                log.info("Collapsed concurrent calls", flight=self.name, waiters=call.waiters)
+
+    async def ado(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._counters["calls"] += 1
+            tasks = self._tasks.setdefault(loop, {})
+            task = tasks.get(key)
+            if task is None:
+                self._counters["executions"] += 1
+                task = tasks[key] = asyncio.ensure_future(factory())
+                task.add_done_callback(lambda done: self._finish_task(tasks, key, done))
+            else:
+                self._counters["collapsed"] += 1
+        # shielded so one waiter giving up doesn't cancel the others' result
+        return await asyncio.shield(task)
+
+    def _finish_task(self, tasks: Dict[str, asyncio.Future], key: str, task: asyncio.Future):
+        with self._lock:
+            if tasks.get(key) is task:
+                del tasks[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            in_flight = len(self._calls) + sum(len(tasks) for tasks in self._tasks.values())
+            return {**self._counters, "in_flight": in_flight}
+
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    "one process-wide group per call site (requests, retriever, embeddings, llm) and model"
+    with _flights_lock:
+        if name not in _flights:
+            _flights[name] = SingleFlight(name)
+        return _flights[name]
+
+
+def single_flight_stats() -> Dict[str, Dict[str, int]]:
+    with _flights_lock:
+        return {name: flight.stats() for name, flight in _flights.items()}
+
+
+def coalescing_enabled(config: dict, site: str) -> bool:
+    cfg = config.get("single_flight", {})
+    return bool(cfg.get("enabled", True) and cfg.get(site, True))
+
+
+def _messages_key(messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> str:
+    payload = json.dumps(
+        [[m.type, m.content] for m in messages] + [stop, sorted((k, str(v)) for k, v in kwargs.items())],
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CoalescingChatModel(BaseChatModel):
+    "identical concurrent prompts to the wrapped model share one call; each caller gets its own copy"
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    llm: Any
+    flight: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return f"coalescing-{getattr(self.llm, '_llm_type', 'chat')}"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        key = _messages_key(messages, stop, kwargs)
+        message = self.flight.do(key, lambda: self.llm.invoke(messages, stop=stop, **kwargs))
+        return ChatResult(generations=[_generation(message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        key = _messages_key(messages, stop, kwargs)
+        message = await self.flight.ado(key, lambda: self.llm.ainvoke(messages, stop=stop, **kwargs))
+        return ChatResult(generations=[_generation(message)])
+
+
+def _generation(message: BaseMessage) -> ChatGeneration:
+    # callers' run managers stamp ids onto the message, so don't share the object
+    return ChatGeneration(message=copy.deepcopy(message))
+
+
+class CoalescingEmbeddings(Embeddings):
+    "identical concurrent query embeddings share one request"
+
+    def __init__(self, embeddings: Embeddings, flight: SingleFlight):
+        self.embeddings = embeddings
+        self.flight = flight
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return list(self.flight.do(text, lambda: self.embeddings.embed_query(text)))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return list(await self.flight.ado(text, lambda: self.embeddings.aembed_query(text)))
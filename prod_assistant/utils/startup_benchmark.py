@@ -0,0 +1,104 @@
+"""Measure cold-start cost of each entry point in a fresh interpreter.
+
+    python -m prod_assistant.utils.startup_benchmark            # report
+    python -m prod_assistant.utils.startup_benchmark --enforce  # exit 1 if over budget
+    python -m prod_assistant.utils.startup_benchmark --with-init
+
+`import_s` is the time to import the entry point module; `ready_s` adds the
+work needed before it can serve. By default that stops short of anything that
+needs credentials or network; `--with-init` also builds the clients
+(AgenticRAG, retriever, ingestion pipeline), which requires a configured env.
+Budgets live under `startup_budget` in config.yaml and apply to `ready_s`.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+from prod_assistant.utils.config_loader import load_config
+
+# entry point -> (module to import, readiness step, readiness step with --with-init)
+ENTRY_POINTS = {
+    "router": (
+        "prod_assistant.router.main",
+        "module.app",
+        "import asyncio; asyncio.run(module.startup_event())",
+    ),
+    "mcp_server": (
+        "prod_assistant.mcp_servers.server",
+        "module.mcp",
+        "module.get_retriever()",
+    ),
+    "scraper_ui": (
+        # the Streamlit script itself; run from the repo root
+        "scrapper_ui",
+        "module.flipkart_scraper",
+        "module.flipkart_scraper",
+    ),
+    "ingestion_cli": (
+        "prod_assistant.etl.data_injection",
+        "module.DataIngestion",
+        "module.DataIngestion()",
+    ),
+}
+
+_PROBE = """
+import importlib, json, time
+t0 = time.perf_counter()
+module = importlib.import_module({module!r})
+t1 = time.perf_counter()
+exec({ready!r})
+t2 = time.perf_counter()
+print(json.dumps({{"import_s": t1 - t0, "ready_s": t2 - t0}}))
+"""
+
+
+def measure(name: str, with_init: bool = False, repeat: int = 3) -> dict:
+    "best-of-`repeat` timings for one entry point, each in a new interpreter"
+    module, ready, ready_with_init = ENTRY_POINTS[name]
+    code = _PROBE.format(module=module, ready=ready_with_init if with_init else ready)
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {
+        "import_s": min(r["import_s"] for r in runs),
+        "ready_s": min(r["ready_s"] for r in runs),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for prod_assistant entry points")
+    parser.add_argument("entry_points", nargs="*", default=list(ENTRY_POINTS))
+    parser.add_argument("--with-init", action="store_true", help="also construct clients (needs credentials)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--enforce", action="store_true", help="exit non-zero when a budget is exceeded")
+    args = parser.parse_args(argv)
+
+    budgets = load_config().get("startup_budget", {})
+    over_budget = []
+    print(f"{'entry point':<16}{'import_s':>10}{'ready_s':>10}{'budget_s':>10}")
+    for name in args.entry_points:
+        result = measure(name, args.with_init, args.repeat)
+        budget = budgets.get(name)
+        if "error" in result:
+            print(f"{name:<16} error: {result['error']}")
+            over_budget.append(name)
+            continue
+        flag = ""
+        if budget is not None and result["ready_s"] > budget:
+            over_budget.append(name)
+            flag = "  OVER BUDGET"
+        budget_str = f"{budget:.2f}" if budget is not None else "-"
+        print(f"{name:<16}{result['import_s']:>10.3f}{result['ready_s']:>10.3f}{budget_str:>10}{flag}")
+
+    if args.enforce and over_budget:
+        print(f"Startup budget exceeded or failed: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,114 +1,199 @@
 from typing import Annotated,Sequence,TypedDict,Literal
 from langchain_core.messages import BaseMessage,HumanMessage
-from langchain_core.prompts import ChatPromptTemplate,PromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langgraph.graph import StateGraph,START,END
 from langgraph.graph.message import add_messages
 
 from prod_assistant.prompt_library.prompts import PromptType,PROMPT_REGISTRY
 from prod_assistant.retriever.retrieval import Retriever
+from prod_assistant.retriever.context_packer import load_context_packer
+from prod_assistant.retriever.catalog_index import CatalogIndex,load_catalog_index
 from prod_assistant.utils.model_loader import ModelLoader
-from langgraph.checkpoint.memory import MemorySaver
+from prod_assistant.utils.llm_cache import CALL_SITES
+from prod_assistant.utils.config_loader import get_config_service
+from prod_assistant.workflow.document_grader import load_grader
+from prod_assistant.workflow.intent_router import Intent,RETRIEVER_MARKER,load_intent_router
+from prod_assistant.workflow.checkpointer import load_checkpointer
+from prod_assistant.workflow.deadline import load_deadline_policy,record_run
+from prod_assistant.retriever.result_cache import collection_version_path,normalize_query,read_collection_version
+from prod_assistant.utils.shared_cache import get_shared_cache
+from prod_assistant.evaluation.online_eval import load_online_evaluator,variant_of
+from prod_assistant.logger import GLOBAL_LOGGER as log
 import asyncio
+import os
+import time
+import uuid
 
 class AgenticRAG:
     "Agentic RAG Workflow"
     class AgenticState(TypedDict):
         messages: Annotated[Sequence[BaseMessage],add_messages] # type: ignore
+        question: str # this turn's question; `messages` is trimmed by the checkpointer and spans earlier turns
+        catalog: str # "answer" / "context" when the catalog lookup handled the query
+        deadline: float # time.time() by which run() must return
+        rewrites: int
+        context: str # latest retrieved context for the generator
+        relevant: bool # grader verdict on `context`
+        degraded: bool # the answer rests on skipped, failed or rejected retrieval; not cached
+        answer: str # final answer, also the fallback when the deadline hits
         
     def __init__(self):
         self.retriever = Retriever()
         self.model_loader = ModelLoader()
         self.llm = self.model_loader.load_llm()
-        self.checkpointer = MemorySaver()
+        self.llms = self._load_llms()
+        self.intent_router = load_intent_router(self.model_loader.config)
+        self.grader = load_grader(self.model_loader.config,self.llms['grader'],self.model_loader)
+        self.context_packer = load_context_packer(self.model_loader.config)
+        self.catalog_index = load_catalog_index(self.model_loader.config)
+        self.checkpointer = load_checkpointer(self.model_loader.config)
+        self.deadline_policy = load_deadline_policy(self.model_loader.config)
+        self.answer_cache = get_shared_cache("answer",self.model_loader.config)
+        self.online_eval = load_online_evaluator(self.model_loader.config)
         self.graph_builder = self._build_graph()
         self.app = self.graph_builder.compile(checkpointer=self.checkpointer)
+        get_config_service().subscribe(self._on_config_change)
         
-    def _format_docs(self,docs):
+    def _on_config_change(self,old: dict,new: dict):
+        "swap in reloaded LLM/grader/router/packing settings"
+        if any(old.get(k) != new.get(k) for k in ('llm','grader','llm_cache','shared_cache')):
+            self.llm = self.model_loader.load_llm()
+            self.llms = self._load_llms()
+            self.grader = load_grader(new,self.llms['grader'],self.model_loader)
+        if old.get('intent_router') != new.get('intent_router'):
+            self.intent_router = load_intent_router(new)
+        if old.get('catalog_index') != new.get('catalog_index'):
+            self.catalog_index = load_catalog_index(new)
+        self.context_packer = load_context_packer(new)
+        self.deadline_policy = load_deadline_policy(new)
+        self.answer_cache = get_shared_cache("answer",new)
+        self.online_eval = load_online_evaluator(new)
+        
+    def _load_llms(self) -> dict:
+        "one model per node; nodes enabled under llm_cache.call_sites get the response cache"
+        return {site: self.model_loader.load_llm(call_site=site) for site in CALL_SITES}
+        
+    def _format_docs(self,docs,question: str = ""):
         if not docs:
             return "No relevant information found."
-        formatted_chunks = []
-        for d in docs:
-            meta = d.metadata or {}
-            formatted = (
-                f"Title: {meta.get('product_title','N/A')}\n"
-                f"Price: {meta.get('price','N/A')}\n"
-                f"Rating: {meta.get('rating', 'N/A')}\n"
-                f"Reviews: \n{d.page_content.strip()}"
-            )
-            formatted_chunks.append(formatted)
-        return "\n\n".join(formatted_chunks)
+        context, _ = self.context_packer.pack(docs,question)
+        return context
+    
+    def _catalog_lookup(self,state:AgenticState):
+        "answer product fact questions from the catalog index, or hand just the matched products to the generator"
+        print("calling catalog_lookup...")
+        question = state["messages"][-1].content
+        match = self.catalog_index.match(question) if self.catalog_index else None
+        if match is None:
+            return {"catalog": ""}
+        if match.answerable:
+            answer = CatalogIndex.answer(match)
+            return {"messages": [HumanMessage(content = answer)],"catalog": "answer","answer": answer}
+        context = self._format_docs(CatalogIndex.to_documents(match),question)
+        return {"messages": [HumanMessage(content = context)],"catalog": "context","context": context}
     
     def _ai_assistant(self,state:AgenticState):
         print("calling ai_assistant... ")
         last_message = state["messages"][-1].content
         
-        if any(word in last_message.lower() for word in ['price','Reviews','product','rating']):
-            return {"messages": [HumanMessage(content = "TOOL: retriever")]}
-        else:
+        prediction = self.intent_router.classify(last_message)
+        if prediction is None:
+            # classifier unsure: one LLM call that either picks retrieval or answers
             prompt = ChatPromptTemplate.from_template(
-                "you are a helpful assistant. Answer the user directly./n/n Question: {question}\nAnswer:"
+                "you are a helpful e-commerce assistant.\n"
+                f"If the question needs product prices, ratings or reviews, reply exactly '{RETRIEVER_MARKER}'.\n"
+                "Otherwise answer the user directly.\n\n Question: {question}\nAnswer:"
             )
-            chain = prompt | self.llm | StrOutputParser()
-            response = chain.invoke({"question": last_message})
-            return {"messages": [HumanMessage(content = response)]}
+            chain = prompt | self.llms['assistant'] | StrOutputParser()
+            response = chain.invoke({"question": last_message}).strip()
+            intent = self.intent_router.intent_from_llm(response)
+            self.intent_router.record(last_message, intent)
+            return {"messages": [HumanMessage(content = response)],"answer": response if intent == Intent.DIRECT else ""}
+        
+        # no web tool in this workflow, so web intents fall back to the catalog
+        if prediction.intent in (Intent.RETRIEVE, Intent.WEB):
+            return {"messages": [HumanMessage(content = RETRIEVER_MARKER)]}
+        
+        prompt = ChatPromptTemplate.from_template(
+            "you are a helpful assistant. Answer the user directly.\n\n Question: {question}\nAnswer:"
+        )
+        chain = prompt | self.llms['assistant'] | StrOutputParser()
+        response = chain.invoke({"question": last_message})
+        return {"messages": [HumanMessage(content = response)],"answer": response}
     
     def _vector_retriever(self,state: AgenticState):
         print("calling vector_retriever... ")
         query = state["messages"][-1].content
-        retriever = self.retriever.load_retriever()
-        docs = retriever.invoke(query)
-        context  = self._format_docs(docs)
-        return {"messages": [HumanMessage(content = context)]}
+        if query.startswith(RETRIEVER_MARKER):
+            query = state["messages"][-2].content
+        # skip the LLM relevance filter when the request is short on time
+        deadline = state.get("deadline")
+        compress = self.deadline_policy.allows("compression",deadline)
+        docs = self.retriever.call_retriever(query,compress=compress)
+        context  = self._format_docs(docs,query)
+        # graded here rather than in the router so the verdict can be kept in state
+        graded = self.deadline_policy.allows("grading",deadline)
+        relevant = self.grader.grade(state['question'],context).relevant if graded else True
+        return {"messages": [HumanMessage(content = context)],"context": context,"relevant": relevant,
+                "degraded": not (compress and graded and relevant)}
     
     def _grade_documents(self,state:AgenticState):
         print("calling grade_documents...")
-        question = state['messages'][0].content
-        docs = state['messages'][-1].content
-        
-        prompt = PromptTemplate(
-            template = """you are a grader.question: {question}\ndocs: {docs}\n
-            Are docs are relevant to the question? answer yes or no""",
-            input_variables = ['question','docs']
-        )
-        
-        chain = prompt | self.llm | StrOutputParser()
-        score = chain.invoke({"question": question, "docs": docs})
-        
-        return "generator" if "yes" in score.lower() else "rewriter"
+        if state.get("relevant",True):
+            return "generator"
+        # rewrites are capped so rewriter -> ai_assistant -> retriever can't loop forever
+        return "rewriter" if self.deadline_policy.allows("rewrite",state.get("deadline"),state.get("rewrites",0)) else "generator"
     
     def _generate(self,state: AgenticState):
         print("calling generate..")
-        question = state['messages'][0].content
-        docs = state['messages'][-1].content
+        question = state['question']
+        docs = state.get('context') or state['messages'][-1].content
         prompt = ChatPromptTemplate.from_template(
             PROMPT_REGISTRY[PromptType.PRODUCT_BOT].template
         )
-        chain  = prompt | self.llm | StrOutputParser()
+        chain  = prompt | self.llms['generator'] | StrOutputParser()
         response = chain.invoke({"context": docs, "question": question})
-        return {"messages": [HumanMessage(content = response)]}
+        return {"messages": [HumanMessage(content = response)],"answer": response}
     
     def _rewriter(self,state: AgenticState):
         print("calling rewriter...")
-        question = state['messages'][0].content
-        new_question  = self.llm.invoke(
+        question = state['question']
+        new_question  = self.llms['rewriter'].invoke(
             [HumanMessage(content = f"Rewrite the question: {question}")]
         )
-        return [HumanMessage(content = new_question.content)]
+        return {"messages": [HumanMessage(content = new_question.content)],"rewrites": state.get("rewrites",0) + 1}
     
     
+    def _until_deadline(self,node):
+        """skip `node` once the request deadline has passed.
+        the graph runs on the caller's thread, so an overrun run drains through no-op nodes
+        (grading refuses past the deadline, the assistant routes to END) instead of holding a worker"""
+        def guarded(state):
+            if self.deadline_policy.expired(state.get("deadline")):
+                log.info("Deadline passed, skipping node",node=node.__name__)
+                return {}
+            return node(state)
+        return guarded
+    
     def _build_graph(self):
         builder  = StateGraph(self.AgenticState)
         
-        builder.add_node("ai_assistant", self._ai_assistant)
-        builder.add_node('retriever',self._vector_retriever)
-        builder.add_node('generator',self._generate)
-        builder.add_node('rewriter',self._rewriter)
+        builder.add_node("catalog_lookup", self._until_deadline(self._catalog_lookup))
+        builder.add_node("ai_assistant", self._until_deadline(self._ai_assistant))
+        builder.add_node('retriever',self._until_deadline(self._vector_retriever))
+        builder.add_node('generator',self._until_deadline(self._generate))
+        builder.add_node('rewriter',self._until_deadline(self._rewriter))
         
         #add edges
-        builder.add_edge(START,'ai_assistant')
+        builder.add_edge(START,'catalog_lookup')
+        builder.add_conditional_edges('catalog_lookup',
+                                    lambda state: {'answer': END,'context': 'generator'}.get(state.get('catalog'),'ai_assistant'),
+                                    {'ai_assistant': 'ai_assistant','generator': 'generator', END: END}
+                                    )
         builder.add_conditional_edges('ai_assistant',
-                                    lambda state: 'retriever' if 'TOOL' in state['messages'][-1].content else 'END'
+                                    lambda state: 'retriever' if state['messages'][-1].content.startswith(RETRIEVER_MARKER) else END,
+                                    {'retriever': 'retriever', END: END}
                                     )
         builder.add_conditional_edges(
             'retriever',
@@ -122,10 +207,54 @@ class AgenticRAG:
         builder.add_edge("rewriter", 'ai_assistant')
         return builder
     
-    def run(self,query:str,thread_id: str = 'default_thread') -> str:
-        "run workflow for a given query"
-        result = self.app.invoke({"messages": [HumanMessage(content = query)]}, config = {"configurable": {"thread_id": thread_id}})
-        return result['messages'][-1].content
+    def run(self,query:str,thread_id: str | None = None,deadline: float | None = None) -> str:
+        """run workflow for a given query; a fresh thread is used unless thread_id is given.
+        `deadline` is a time.time() timestamp (default: now + configured budget); past it the best answer so far is returned.
+        stand-alone questions (no thread_id) are served from the shared answer cache when already answered;
+        only full-quality runs are written to it, never ones that skipped or lost a step to the deadline.
+        a sample of turns is scored in the background by the online evaluator"""
+        started = time.perf_counter()
+        answer_cache = self.answer_cache if thread_id is None else None
+        if answer_cache:
+            answer_key = answer_cache.key(normalize_query(query),
+                                          read_collection_version(collection_version_path(self.model_loader.config)),
+                                          os.getenv("LLM_PROVIDER","openai"))
+            cached = answer_cache.get(answer_key)
+            if cached is not None:
+                self._observe(query,cached,"",started,"cache")
+                return cached
+        thread_id = thread_id or str(uuid.uuid4())
+        deadline = self.deadline_policy.new_deadline(deadline)
+        config = {"configurable": {"thread_id": thread_id}}
+        inputs = {"messages": [HumanMessage(content = query)],"question": query,"deadline": deadline,"rewrites": 0,
+                  "context": "","relevant": True,"degraded": False,"answer": "","catalog": ""}
+        # nodes check the deadline themselves, so the run returns shortly after it passes
+        result = self.app.invoke(inputs,config = config)
+        if self.deadline_policy.expired(deadline) and not result.get("answer"):
+            record_run(deadline_exceeded = True)
+            log.warning("Request deadline exceeded, returning best available answer",thread_id = thread_id)
+            answer = self._best_available(result)
+            self._observe(query,answer,"",started,"deadline")
+            return answer
+        record_run()
+        answer = result.get('answer') or result['messages'][-1].content
+        if answer_cache and not result.get("degraded") and not self.deadline_policy.expired(deadline):
+            answer_cache.set(answer_key,answer)
+        self._observe(query,answer,result.get("context",""),started,"graph")
+        return answer
+    
+    def _observe(self,query: str,answer: str,context: str,started: float,source: str):
+        if self.online_eval:
+            self.online_eval.submit(query,answer,context,time.perf_counter() - started,
+                                    variant = variant_of(self.model_loader.config),source = source)
+    
+    @staticmethod
+    def _best_available(values: dict) -> str:
+        if values.get("answer"):
+            return values["answer"]
+        if values.get("context"):
+            return "I ran out of time to write a full answer; here is what I found:\n\n" + values["context"]
+        return "Sorry, I couldn't answer that in time. Please try again."
 if __name__=='__main__':
     agentic_rag = AgenticRAG()
     result = agentic_rag.run("What is the price of the product?")
@@ -1,16 +1,30 @@
 
 from typing import Annotated, Sequence, TypedDict, Literal
 from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
+from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 
 from prod_assistant.prompt_library.prompts import PromptType, PROMPT_REGISTRY
 from prod_assistant.utils.model_loader import ModelLoader
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from prod_assistant.utils.llm_cache import CALL_SITES
+from prod_assistant.utils.config_loader import get_config_service
+from prod_assistant.workflow.document_grader import load_grader
+from prod_assistant.workflow.intent_router import Intent, RETRIEVER_MARKER, WEB_MARKER, load_intent_router
+from prod_assistant.logger import GLOBAL_LOGGER as log
+from prod_assistant.workflow.checkpointer import load_checkpointer
+from prod_assistant.mcp_servers.session_pool import load_session_pool
+from prod_assistant.retriever.catalog_index import CatalogIndex, load_catalog_index
+from prod_assistant.retriever.context_packer import load_context_packer
+from prod_assistant.workflow.deadline import load_deadline_policy, record_run, remaining
+from prod_assistant.retriever.result_cache import collection_version_path, normalize_query, read_collection_version
+from prod_assistant.utils.shared_cache import get_shared_cache
+from prod_assistant.evaluation.online_eval import load_online_evaluator, variant_of
 import asyncio
+import os
+import time
+import uuid
 
 
 class AgenticRAG:
@@ -18,136 +32,373 @@ class AgenticRAG:
 
     class AgentState(TypedDict):
         messages: Annotated[Sequence[BaseMessage], add_messages]
+        question: str  # this turn's question; `messages` is trimmed by the checkpointer and spans earlier turns
+        catalog: str  # "answer" / "context" when the catalog lookup handled the query
+        deadline: float  # time.time() by which run() must return
+        rewrites: int
+        context: str  # latest retrieved/searched context for the generator
+        relevant: bool  # grader verdict on `context`
+        degraded: bool  # the answer rests on skipped, failed or rejected retrieval, or the web fallback; not cached
+        answer: str  # final answer, also the fallback when the deadline hits
 
-    def __init__(self):
+    def __init__(self, speculative: bool | None = None):
         self.model_loader = ModelLoader()
         self.llm = self.model_loader.load_llm()
-        self.checkpointer = MemorySaver()
-
-        self.mcp_client = MultiServerMCPClient(
-            {
-                "hybrid_search": {
-                    "transport": "streamable_http",
-                    "url": "http://localhost:8000/mcp"
-                }
-            }
-        )
+        self.llms = self._load_llms()
+        self.checkpointer = load_checkpointer(self.model_loader.config)
+
+        workflow_cfg = self.model_loader.config.get("workflow", {})
+        self.speculative = workflow_cfg.get("speculative_search", False) if speculative is None else speculative
+        self.retriever_timeout = workflow_cfg.get("retriever_timeout", 15)
+        self.web_search_timeout = workflow_cfg.get("web_search_timeout", 10)
+        self.intent_router = load_intent_router(self.model_loader.config)
+        self.grader = load_grader(self.model_loader.config, self.llms["grader"], self.model_loader)
+        self.catalog_index = load_catalog_index(self.model_loader.config)
+        self.context_packer = load_context_packer(self.model_loader.config)
+        self.deadline_policy = load_deadline_policy(self.model_loader.config)
+        self.answer_cache = get_shared_cache("answer", self.model_loader.config)
+        self.online_eval = load_online_evaluator(self.model_loader.config)
 
-        self.mcp_tools = None
+        # persistent sessions with tool handles cached by name, opened in async_init
+        self.mcp_pool = load_session_pool(self.model_loader.config)
         self.workflow = self._build_workflow()
         self.app = self.workflow.compile(checkpointer=self.checkpointer)
+        get_config_service().subscribe(self._on_config_change)
+
+    def _load_llms(self) -> dict:
+        """One model per node; nodes enabled under llm_cache.call_sites get the response cache."""
+        return {site: self.model_loader.load_llm(call_site=site) for site in CALL_SITES}
+
+    def _on_config_change(self, old: dict, new: dict):
+        """Swap in reloaded LLM/grader/router settings; graph shape is fixed at init."""
+        if any(old.get(k) != new.get(k) for k in ("llm", "grader", "llm_cache", "shared_cache")):
+            self.llm = self.model_loader.load_llm()
+            self.llms = self._load_llms()
+            self.grader = load_grader(new, self.llms["grader"], self.model_loader)
+        if old.get("intent_router") != new.get("intent_router"):
+            self.intent_router = load_intent_router(new)
+        if old.get("catalog_index") != new.get("catalog_index"):
+            self.catalog_index = load_catalog_index(new)
+        self.context_packer = load_context_packer(new)
+        self.deadline_policy = load_deadline_policy(new)
+        self.answer_cache = get_shared_cache("answer", new)
+        self.online_eval = load_online_evaluator(new)
+        workflow_cfg = new.get("workflow", {})
+        self.retriever_timeout = workflow_cfg.get("retriever_timeout", 15)
+        self.web_search_timeout = workflow_cfg.get("web_search_timeout", 10)
 
     async def async_init(self):
         """Initialize async dependencies (must be awaited before use)"""
-        self.mcp_tools = await self.mcp_client.get_tools()
+        await self.mcp_pool.connect()
+
+    async def close(self):
+        await self.mcp_pool.close()
+
+    def _catalog_lookup(self, state: AgentState):
+        """Answer queries naming a specific product without retrieval or grading.
+
+        A confident single-product fact question (price/rating/review count)
+        is answered from a template; otherwise the matched products alone
+        are handed to the generator.
+        """
+        print("calling catalog_lookup...")
+        question = state["messages"][-1].content
+        match = self.catalog_index.match(question) if self.catalog_index else None
+        if match is None:
+            return {"catalog": ""}
+        titles = [p.get("product_title") for p in match.products]
+        if match.answerable:
+            log.info("Answered from catalog", products=titles, facts=match.facts)
+            answer = CatalogIndex.answer(match)
+            return {"messages": [HumanMessage(content=answer)], "catalog": "answer", "answer": answer}
+        log.info("Catalog match sent to generator", products=titles)
+        context, _ = self.context_packer.pack(CatalogIndex.to_documents(match), question)
+        return {"messages": [HumanMessage(content=context)], "catalog": "context", "context": context}
+
+    def _route_catalog(self, state: AgentState):
+        return {"answer": END, "context": "Generator"}.get(state.get("catalog"), "Assistant")
 
     def _ai_assistant(self, state: AgentState):
         print("calling ai_assistant... ")
         last_message = state["messages"][-1].content
 
-        if any(word in last_message.lower() for word in ['price', 'review', 'product']):
-            return {"messages": [HumanMessage(content="TOOL: retriever")]}
-        else:
+        prediction = self.intent_router.classify(last_message)
+        if prediction is None:
+            # classifier unsure: let the LLM either pick a tool or answer in one call
             prompt = ChatPromptTemplate.from_template(
-                "You are a helpful assistant. Answer the user directly.\n\nQuestion: {question}\nAnswer:"
+                "You are a helpful e-commerce assistant.\n"
+                f"If the question needs product prices, ratings or reviews from our catalog, reply exactly '{RETRIEVER_MARKER}'.\n"
+                f"If it needs recent news or other information from the web, reply exactly '{WEB_MARKER}'.\n"
+                "Otherwise answer the user directly.\n\nQuestion: {question}\nAnswer:"
             )
-            chain = prompt | self.llm | StrOutputParser()
-            response = chain.invoke({"question": last_message})
-            return {"messages": [HumanMessage(content=response)]}
+            chain = prompt | self.llms["assistant"] | StrOutputParser()
+            response = chain.invoke({"question": last_message}).strip()
+            intent = self.intent_router.intent_from_llm(response)
+            self.intent_router.record(last_message, intent)
+            return {"messages": [HumanMessage(content=response)], "answer": response if intent == Intent.DIRECT else ""}
+
+        if prediction.intent == Intent.RETRIEVE:
+            return {"messages": [HumanMessage(content=RETRIEVER_MARKER)]}
+        if prediction.intent == Intent.WEB:
+            return {"messages": [HumanMessage(content=WEB_MARKER)]}
+
+        prompt = ChatPromptTemplate.from_template(
+            "You are a helpful assistant. Answer the user directly.\n\nQuestion: {question}\nAnswer:"
+        )
+        chain = prompt | self.llms["assistant"] | StrOutputParser()
+        response = chain.invoke({"question": last_message})
+        return {"messages": [HumanMessage(content=response)], "answer": response}
+
+    def _route_assistant(self, state: AgentState):
+        content = state["messages"][-1].content.strip()
+        if content.startswith(RETRIEVER_MARKER):
+            return "SpeculativeSearch" if self.speculative else "Retriever"
+        if content.startswith(WEB_MARKER):
+            return "WebSearch"
+        return END
 
     async def _vector_retriever(self, state: AgentState):
         print("calling vector_retriever... ")
         query = state["messages"][-1].content
-        tool = next(t for t in self.mcp_tools if t.name == "get_product_info")
-
-        result = await tool.ainvoke({"query": query})
+        if query.startswith(RETRIEVER_MARKER):
+            query = state["messages"][-2].content
+        # the LLM relevance filter is the slow part of retrieval; drop it when short on time
+        deadline = state.get("deadline")
+        compress = self.deadline_policy.allows("compression", deadline)
+        try:
+            result = await asyncio.wait_for(
+                self.mcp_pool.call("get_product_info", {"query": query, "compress": compress}),
+                self.deadline_policy.step_timeout(deadline, self.retriever_timeout),
+            )
+        except asyncio.TimeoutError:
+            log.warning("Retriever cut off by request deadline")
+            result = None
+        except Exception as e:
+            # the pool ran out of reconnect attempts (server down or restarting)
+            log.warning("Retriever call failed", error=str(e))
+            result = None
         context = result if result else "No context found"
-        return {"messages": [HumanMessage(content=context)]}
+        # graded here rather than in the router so the verdict can be kept in state
+        graded = bool(result) and self.deadline_policy.allows("grading", deadline)
+        relevant = await self._agrade(state["question"], context) if graded else bool(result)
+        return {"messages": [HumanMessage(content=context)], "context": context, "relevant": relevant,
+                "degraded": not (compress and graded and relevant)}
 
-    def _web_search(self, state: AgentState):
+    async def _web_search(self, state: AgentState):
         print("calling web_search...")
         query = state["messages"][-1].content
-        tool = next(t for t in self.mcp_tools if t.name == "search_web")
-
-        result =  asyncio.run(tool.ainvoke({"query": query}))
-        context = result if result else "No data from web"
-        return {"messages": [HumanMessage(content=context)]}
+        # routed here straight from the assistant for a web question, rather than as a retrieval fallback
+        direct = query.startswith(WEB_MARKER)
+        if direct:
+            query = state["messages"][-2].content
+        deadline = state.get("deadline")
+        if not self.deadline_policy.allows("web_search", deadline):
+            # the generator answers from whatever context is already in state
+            return {"degraded": True}
+        try:
+            result = await asyncio.wait_for(
+                self.mcp_pool.call("search_web", {"query": query}),
+                self.deadline_policy.step_timeout(deadline, self.web_search_timeout),
+            )
+        except asyncio.TimeoutError:
+            log.warning("Web search cut off by request deadline")
+            return {"degraded": True}
+        except Exception as e:
+            log.warning("Web search call failed", error=str(e))
+            return {"degraded": True}
+        if not result:
+            # the search failed or found nothing; answer from the context already in state, and don't cache it
+            return {"degraded": True}
+        return {"messages": [HumanMessage(content=result)], "context": result, "degraded": not direct}
     
-    def _grade_documents(self, state: AgentState) -> Literal["Generator", "Rewriter"]:
-        print("calling grade_documents...")
-        question = state['messages'][0].content
-        docs = state['messages'][-1].content
-
-        prompt = PromptTemplate(
-            template="""You are a grader.
-            Question: {question}
-            Docs: {docs}
-            Are docs relevant to the question? Answer yes or no""",
-            input_variables=['question', 'docs']
-        )
+    async def _speculative_search(self, state: AgentState):
+        """Run retrieval and web search concurrently and keep whichever is usable.
+
+        The retriever result is graded as soon as it arrives; if relevant, the
+        in-flight web search is cancelled, otherwise its result is awaited. The
+        search is also cancelled when the node itself is.
+        """
+        print("calling speculative_search...")
+        question = state['question']
+        deadline = state.get("deadline")
+        web_task = asyncio.create_task(asyncio.wait_for(
+            self.mcp_pool.call("search_web", {"query": question}),
+            self.deadline_policy.step_timeout(deadline, self.web_search_timeout),
+        ))
+
+        try:
+            docs = None
+            compress = self.deadline_policy.allows("compression", deadline)
+            try:
+                docs = await asyncio.wait_for(
+                    self.mcp_pool.call("get_product_info", {"query": question, "compress": compress}),
+                    self.deadline_policy.step_timeout(deadline, self.retriever_timeout),
+                )
+            except asyncio.TimeoutError:
+                log.warning("Retriever branch timed out", timeout=self.retriever_timeout)
+            except Exception as e:
+                log.warning("Retriever branch failed", error=str(e))
+
+            if docs:
+                graded = self.deadline_policy.allows("grading", deadline)
+                if not graded or await self._agrade(question, docs):
+                    return {"messages": [HumanMessage(content=docs)], "context": docs,
+                            "degraded": not (compress and graded)}
 
-        chain = prompt | self.llm | StrOutputParser()
-        score = chain.invoke({"question": question, "docs": docs})
+            web_result = None
+            try:
+                web_result = await web_task
+            except asyncio.TimeoutError:
+                log.warning("Web search branch timed out", timeout=self.web_search_timeout)
+            except Exception as e:
+                log.warning("Web search branch failed", error=str(e))
 
-        return "Generator" if "yes" in score.lower() else "Rewriter"
+            context = web_result or docs or "No data from web"
+            return {"messages": [HumanMessage(content=context)], "context": context, "degraded": True}
+        finally:
+            # also covers the node being cancelled by the request deadline, so the search doesn't hold a session
+            if not web_task.done():
+                web_task.cancel()
+
+    async def _agrade(self, question: str, docs: str) -> bool:
+        return (await self.grader.agrade(question, docs)).relevant
+
+    def _grade_documents(self, state: AgentState) -> Literal["Generator", "Rewriter", "WebSearch"]:
+        print("calling grade_documents...")
+        deadline = state.get("deadline")
+        if state.get("relevant", True):
+            return "Generator"
+        if self.deadline_policy.allows("rewrite", deadline, state.get("rewrites", 0)):
+            return "Rewriter"
+        # no time to rewrite: search the original question, or answer from weak docs
+        return "WebSearch" if self.deadline_policy.allows("web_search", deadline) else "Generator"
 
     def _generate(self, state: AgentState):
         print("calling generate..")
-        question = state['messages'][0].content
-        docs = state['messages'][-1].content
+        question = state['question']
+        docs = state.get('context') or "No context found"
         prompt = ChatPromptTemplate.from_template(
             PROMPT_REGISTRY[PromptType.PRODUCT_BOT].template
         )
-        chain = prompt | self.llm | StrOutputParser()
+        chain = prompt | self.llms["generator"] | StrOutputParser()
         response = chain.invoke({"context": docs, "question": question})
-        return {"messages": [HumanMessage(content=response)]}
+        return {"messages": [HumanMessage(content=response)], "answer": response}
 
     def _rewriter(self, state: AgentState):
         print("calling rewriter...")
-        question = state['messages'][0].content
+        question = state['question']
         prompt = ChatPromptTemplate.from_template(
             "Rewrite this user query to make it more clear and specific for a search engine. "
             "Do NOT answer the query. Only rewrite it.\n\nQuery: {question}\nRewritten Query:"
         )
-        chain = prompt | self.llm | StrOutputParser()
+        chain = prompt | self.llms["rewriter"] | StrOutputParser()
         new_question = chain.invoke({"question": question})
-        return {"messages": [HumanMessage(content=new_question.strip())]}
+        return {"messages": [HumanMessage(content=new_question.strip())], "rewrites": state.get("rewrites", 0) + 1}
 
     def _build_workflow(self):
         workflow = StateGraph(self.AgentState)
 
+        workflow.add_node("CatalogLookup", self._catalog_lookup)
         workflow.add_node("Assistant", self._ai_assistant)
-        workflow.add_node("Retriever", self._vector_retriever)
         workflow.add_node("Generator", self._generate)
-        workflow.add_node("Rewriter", self._rewriter)
         workflow.add_node("WebSearch", self._web_search)
 
-        workflow.add_edge(START, "Assistant")
+        workflow.add_edge(START, "CatalogLookup")
+        workflow.add_conditional_edges(
+            "CatalogLookup", self._route_catalog,
+            {"Assistant": "Assistant", "Generator": "Generator", END: END}
+        )
+        workflow.add_edge("WebSearch", "Generator")
+        workflow.add_edge("Generator", END)
+
+        if self.speculative:
+            # retrieval and web search race each other; no grade/rewrite hops
+            workflow.add_node("SpeculativeSearch", self._speculative_search)
+            workflow.add_conditional_edges(
+                "Assistant", self._route_assistant,
+                {"SpeculativeSearch": "SpeculativeSearch", "WebSearch": "WebSearch", END: END}
+            )
+            workflow.add_edge("SpeculativeSearch", "Generator")
+            return workflow
+
+        workflow.add_node("Retriever", self._vector_retriever)
+        workflow.add_node("Rewriter", self._rewriter)
 
         workflow.add_conditional_edges(
-            "Assistant",
-            lambda state: "Retriever" if "TOOL" in state["messages"][-1].content else END,
-            {"Retriever": "Retriever", END: END}
+            "Assistant", self._route_assistant,
+            {"Retriever": "Retriever", "WebSearch": "WebSearch", END: END}
         )
 
         workflow.add_conditional_edges(
             "Retriever", self._grade_documents,
-            {"Generator": "Generator", "Rewriter": "Rewriter"}
+            {"Generator": "Generator", "Rewriter": "Rewriter", "WebSearch": "WebSearch"}
         )
 
-        workflow.add_edge("Generator", END)
         workflow.add_edge("Rewriter", 'WebSearch')
-        workflow.add_edge("WebSearch", "Generator")
 
         return workflow
 
-    async def run(self, query: str, thread_id: str = 'default_thread') -> str:
-        """Run workflow for a given query (async)"""
-        result = await self.app.ainvoke(
-            {"messages": [HumanMessage(content=query)]},
-            config={"configurable": {"thread_id": thread_id}}
-        )
-        return result['messages'][-1].content
+    async def run(self, query: str, thread_id: str | None = None, deadline: float | None = None) -> str:
+        """Run workflow for a given query (async).
+
+        Pass a stable `thread_id` to continue a conversation; without one each
+        call gets its own thread instead of sharing a global history.
+        `deadline` is a time.time() timestamp (default: now + the configured
+        budget); nodes skip optional steps as it nears, and once it passes the
+        best answer reached so far is returned.
+
+        Stand-alone questions (no `thread_id`) are answered from the shared
+        answer cache when any worker has answered them since the last ingestion.
+        Only full-quality runs are cached: not ones where retrieval failed,
+        a step was skipped for the deadline or the web fallback answered.
+        A sample of turns is handed to the online evaluator, which scores them
+        in the background.
+        """
+        started = time.perf_counter()
+        answer_cache = self.answer_cache if thread_id is None else None
+        if answer_cache:
+            answer_key = self._answer_key(query)
+            cached = await answer_cache.aget(answer_key)
+            if cached is not None:
+                self._observe(query, cached, "", started, "cache")
+                return cached
+        thread_id = thread_id or str(uuid.uuid4())
+        deadline = self.deadline_policy.new_deadline(deadline)
+        config = {"configurable": {"thread_id": thread_id}}
+        inputs = {"messages": [HumanMessage(content=query)], "question": query, "deadline": deadline, "rewrites": 0,
+                  "context": "", "relevant": True, "degraded": False, "answer": "", "catalog": ""}
+        try:
+            result = await asyncio.wait_for(self.app.ainvoke(inputs, config=config), max(remaining(deadline), 0))
+        except asyncio.TimeoutError:
+            record_run(deadline_exceeded=True)
+            log.warning("Request deadline exceeded, returning best available answer", thread_id=thread_id)
+            answer = self._best_available((await self.app.aget_state(config)).values)
+            self._observe(query, answer, "", started, "deadline")
+            return answer
+        record_run()
+        answer = result.get('answer') or result['messages'][-1].content
+        if answer_cache and not result.get("degraded"):
+            await answer_cache.aset(answer_key, answer)
+        self._observe(query, answer, result.get("context", ""), started, "graph")
+        return answer
+
+    def _observe(self, query: str, answer: str, context: str, started: float, source: str):
+        if self.online_eval:
+            self.online_eval.submit(query, answer, context, time.perf_counter() - started,
+                                    variant=variant_of(self.model_loader.config), source=source)
+
+    def _answer_key(self, query: str) -> str:
+        config = self.model_loader.config
+        return self.answer_cache.key(normalize_query(query), read_collection_version(collection_version_path(config)),
+                                     os.getenv("LLM_PROVIDER", "openai"))
+
+    @staticmethod
+    def _best_available(values: dict) -> str:
+        if values.get("answer"):
+            return values["answer"]
+        if values.get("context"):
+            return "I ran out of time to write a full answer; here is what I found:\n\n" + values["context"]
+        return "Sorry, I couldn't answer that in time. Please try again."
 
 if __name__ == "__main__":
     async def main():
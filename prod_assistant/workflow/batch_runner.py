@@ -0,0 +1,149 @@
+import asyncio
+import contextlib
+import inspect
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+from prod_assistant.retriever.result_cache import normalize_query
+from prod_assistant.utils.rate_limiter import Priority, priority_scope
+
+
+def parse_jsonl(lines: Iterable[str]) -> List[Dict[str, Any]]:
+    """One query per line: {"id": ..., "query": ...} or a bare JSON string.
+
+    Lines that can't be parsed become items carrying an `error` so they are
+    reported in the output instead of aborting the batch.
+    """
+    items = []
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"query": record}
+            if not isinstance(record, dict) or not str(record.get("query", "")).strip():
+                raise ValueError("missing 'query'")
+            items.append({"id": record.get("id", line_no), "query": str(record["query"])})
+        except ValueError as e:
+            items.append({"id": line_no, "query": None, "error": f"invalid line: {e}"})
+    return items
+
+
+class BatchRunner:
+    """Throughput-oriented bulk Q&A on top of an AgenticRAG instance.
+
+    Identical queries (after normalization) run once and their answer is
+    fanned out to every item that asked it. At most `concurrency` workflow
+    runs are in flight, all at background rate-limit priority so
+    interactive chat keeps precedence on the shared API keys; with an
+    `admission` controller each run also takes a background admission slot.
+    Each run gets its own `deadline_s` budget rather than the interactive
+    default, so optional steps aren't skipped to save latency.
+    Results are yielded as they complete, not in input order.
+    """
+
+    def __init__(self, agent, concurrency: int = 8, item_timeout: float = 120.0, deadline_s: float = 100.0,
+                 admission=None):
+        self.agent = agent
+        self.concurrency = concurrency
+        self.item_timeout = item_timeout
+        self.deadline_s = deadline_s
+        self.admission = admission
+
+    async def _answer(self, key: str, query: str, semaphore: asyncio.Semaphore) -> Tuple[str, Dict[str, Any]]:
+        slot = self.admission.admit_background() if self.admission else contextlib.nullcontext()
+        async with semaphore, slot:
+            start = time.perf_counter()
+            deadline = time.time() + self.deadline_s
+            try:
+                if inspect.iscoroutinefunction(self.agent.run):
+                    run = self.agent.run(query, deadline=deadline)
+                else:
+                    run = asyncio.to_thread(self.agent.run, query, deadline=deadline)
+                answer = await asyncio.wait_for(run, self.item_timeout)
+                return key, {"answer": answer, "error": None, "elapsed_s": time.perf_counter() - start}
+            except Exception as e:
+                log.warning("Batch item failed", query=query, error=str(e) or type(e).__name__)
+                return key, {"answer": None, "error": str(e) or type(e).__name__,
+                             "elapsed_s": time.perf_counter() - start}
+
+    async def run_stream(self, items: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for item in items:
+            if item.get("error"):
+                yield {**item, "answer": None, "elapsed_s": 0.0, "deduplicated": False}
+                continue
+            groups.setdefault(normalize_query(item["query"]), []).append(item)
+
+        batch_start = time.perf_counter()
+        # tasks copy the current context, so the priority applies to every run
+        with priority_scope(Priority.BACKGROUND):
+            tasks = [asyncio.create_task(self._answer(key, group[0]["query"], semaphore))
+                     for key, group in groups.items()]
+
+        done_count = 0
+        try:
+            for finished in asyncio.as_completed(tasks):
+                key, result = await finished
+                for index, item in enumerate(groups[key]):
+                    done_count += 1
+                    yield {**item, **result, "deduplicated": index > 0}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        elapsed = time.perf_counter() - batch_start
+        log.info("Batch finished", items=done_count, unique_queries=len(groups),
+                 elapsed_s=round(elapsed, 2), items_per_s=round(done_count / elapsed, 2) if elapsed else None)
+
+    async def run_jsonl(self, lines: Iterable[str]) -> AsyncIterator[str]:
+        "parse JSONL queries and stream JSONL results"
+        async for record in self.run_stream(parse_jsonl(lines)):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def load_batch_runner(agent, config: dict, admission=None) -> BatchRunner:
+    "build the runner from the `batch` config block"
+    cfg = config.get("batch", {})
+    return BatchRunner(agent, concurrency=cfg.get("concurrency", 8), item_timeout=cfg.get("item_timeout", 120),
+                       deadline_s=cfg.get("deadline_s", 100), admission=admission)
+
+
+if __name__ == "__main__":
+    # e.g. python -m prod_assistant.workflow.batch_runner faq_queries.jsonl -o faq_answers.jsonl
+    import argparse
+    import sys
+    from prod_assistant.utils.config_loader import load_config
+    from prod_assistant.workflow.agentic_workflow_with_mcp import AgenticRAG
+
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of product questions")
+    parser.add_argument("input", help="JSONL file, one {'id', 'query'} object per line")
+    parser.add_argument("-o", "--output", help="JSONL output file (default: stdout)")
+    parser.add_argument("--concurrency", type=int)
+    args = parser.parse_args()
+
+    async def main():
+        config = load_config()
+        agent = AgenticRAG()
+        await agent.async_init()
+        runner = load_batch_runner(agent, config)
+        if args.concurrency:
+            runner.concurrency = args.concurrency
+        with open(args.input, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            async for line in runner.run_jsonl(lines):
+                out.write(line)
+                out.flush()
+        finally:
+            if out is not sys.stdout:
+                out.close()
+            await agent.close()
+
+    asyncio.run(main())
@@ -0,0 +1,397 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_last_access ON threads (last_access);
+"""
+
+
+class BoundedSqliteSaver(BaseCheckpointSaver):
+    """LangGraph checkpointer persisted to local SQLite with bounded memory.
+
+    - the latest checkpoint of the `max_threads_in_memory` most recently used
+      threads is kept in an LRU tier; everything else is read from disk
+    - threads idle for longer than `ttl_seconds` are deleted
+    - each thread keeps at most `max_checkpoints_per_thread` checkpoints and
+      `max_messages` entries in its `messages` channel
+    """
+
+    def __init__(
+        self,
+        db_path: str = "data/checkpoints.sqlite",
+        max_threads_in_memory: int = 256,
+        ttl_seconds: float = 24 * 3600,
+        max_checkpoints_per_thread: int = 5,
+        max_messages: int = 40,
+        sweep_interval: float = 60,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self.max_threads_in_memory = max_threads_in_memory
+        self.ttl_seconds = ttl_seconds
+        self.max_checkpoints_per_thread = max_checkpoints_per_thread
+        self.max_messages = max_messages
+        self.sweep_interval = sweep_interval
+
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self.lock = threading.RLock()
+
+        # (thread_id, checkpoint_ns) -> (CheckpointTuple, approx bytes)
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[CheckpointTuple, int]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._last_sweep = 0.0
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expired_threads": 0}
+
+    # ---- memory tier ----
+
+    def _remember(self, key: Tuple[str, str], tup: CheckpointTuple, size: int):
+        self._forget(key)
+        self._memory[key] = (tup, size)
+        self._memory_bytes += size
+        while len(self._memory) > self.max_threads_in_memory:
+            _, (_, evicted_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted_size
+            self._counters["evictions"] += 1
+
+    def _forget(self, key: Tuple[str, str]):
+        entry = self._memory.pop(key, None)
+        if entry:
+            self._memory_bytes -= entry[1]
+
+    # ---- housekeeping ----
+
+    def _touch(self, thread_id: str):
+        self.conn.execute(
+            "INSERT INTO threads (thread_id, last_access) VALUES (?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET last_access = excluded.last_access",
+            (thread_id, time.time()),
+        )
+
+    def _trim_messages(self, checkpoint: Checkpoint) -> Checkpoint:
+        messages = checkpoint.get("channel_values", {}).get("messages")
+        if not self.max_messages or not messages or len(messages) <= self.max_messages:
+            return checkpoint
+        channel_values = {**checkpoint["channel_values"], "messages": list(messages)[-self.max_messages:]}
+        return {**checkpoint, "channel_values": channel_values}
+
+    def _prune_history(self, thread_id: str, checkpoint_ns: str):
+        stale = self.conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT -1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.max_checkpoints_per_thread),
+        ).fetchall()
+        for (checkpoint_id,) in stale:
+            for table in ("checkpoints", "writes"):
+                self.conn.execute(
+                    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                )
+
+    def _delete_thread(self, thread_id: str):
+        for table in ("checkpoints", "writes", "threads"):
+            self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+        for key in [k for k in self._memory if k[0] == thread_id]:
+            self._forget(key)
+
+    def sweep_expired(self) -> int:
+        "delete threads idle for longer than the TTL; returns how many were removed"
+        with self.lock:
+            cutoff = time.time() - self.ttl_seconds
+            expired = [
+                row[0] for row in self.conn.execute("SELECT thread_id FROM threads WHERE last_access < ?", (cutoff,))
+            ]
+            for thread_id in expired:
+                self._delete_thread(thread_id)
+            self._last_sweep = time.time()
+            self._counters["expired_threads"] += len(expired)
+            if expired:
+                log.info("Expired idle conversation threads", count=len(expired))
+            return len(expired)
+
+    def _maybe_sweep(self):
+        if time.time() - self._last_sweep >= self.sweep_interval:
+            self.sweep_expired()
+
+    def stats(self) -> Dict[str, Any]:
+        """memory-tier and on-disk usage against their limits, LRU evictions and threads purged by the TTL,
+        for dashboards and leak hunting; served on the router's /metrics"""
+        with self.lock:
+            db_threads = self.conn.execute("SELECT COUNT(*) FROM threads").fetchone()[0]
+            db_checkpoints = self.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+            page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+            return {
+                "memory_threads": len(self._memory),
+                "max_threads_in_memory": self.max_threads_in_memory,
+                "ttl_seconds": self.ttl_seconds,
+                "memory_bytes": self._memory_bytes,
+                "db_threads": db_threads,
+                "db_checkpoints": db_checkpoints,
+                "db_bytes": page_count * page_size,
+                **self._counters,
+            }
+
+    # ---- BaseCheckpointSaver API ----
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str):
+        rows = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self.serde.loads_typed((type_, value))) for task_id, channel, type_, value in rows]
+
+    def _row_to_tuple(self, thread_id: str, checkpoint_ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_id, type_, blob, metadata_type, metadata_blob = row
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed((type_, blob)),
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        key = (thread_id, checkpoint_ns)
+
+        with self.lock:
+            cached = self._memory.get(key)
+            if cached and (checkpoint_id is None or cached[0].config["configurable"]["checkpoint_id"] == checkpoint_id):
+                self._memory.move_to_end(key)
+                self._counters["hits"] += 1
+                self._touch(thread_id)
+                return cached[0]
+            self._counters["misses"] += 1
+
+            query = (
+                "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+            )
+            if checkpoint_id:
+                row = self.conn.execute(query + " AND checkpoint_id = ?", (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:
+                row = self.conn.execute(query + " ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)).fetchone()
+            if row is None:
+                return None
+
+            tup = self._row_to_tuple(thread_id, checkpoint_ns, row)
+            self._touch(thread_id)
+            if checkpoint_id is None:
+                self._remember(key, tup, len(row[3] or b"") + len(row[5] or b""))
+            return tup
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints"
+        )
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if "checkpoint_ns" in config["configurable"]:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+            results = []
+            for thread_id, checkpoint_ns, *row in rows:
+                tup = self._row_to_tuple(thread_id, checkpoint_ns, row)
+                if filter and not all(tup.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(tup)
+                if limit is not None and len(results) >= limit:
+                    break
+        yield from results
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        parent_id = config["configurable"].get("checkpoint_id")
+
+        checkpoint = self._trim_messages(checkpoint)
+        type_, blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(metadata)
+        new_config = {
+            "configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}
+        }
+
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], parent_id, type_, blob, metadata_type, metadata_blob),
+            )
+            self._touch(thread_id)
+            self._prune_history(thread_id, checkpoint_ns)
+            self._remember(
+                (thread_id, checkpoint_ns),
+                CheckpointTuple(
+                    config=new_config,
+                    checkpoint=checkpoint,
+                    metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+                    parent_config=(
+                        {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                        if parent_id else None
+                    ),
+                    pending_writes=[],
+                ),
+                len(blob) + len(metadata_blob),
+            )
+            self._maybe_sweep()
+        return new_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        with self.lock:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                type_, blob = self.serde.dumps_typed(value)
+                # regular writes are idempotent per (task, idx); special channels overwrite
+                verb = "INSERT OR REPLACE" if write_idx < 0 else "INSERT OR IGNORE"
+                self.conn.execute(
+                    f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, type_, blob, task_path),
+                )
+            # the cached tuple no longer reflects pending writes
+            self._forget((thread_id, checkpoint_ns))
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            self._delete_thread(thread_id)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+def load_checkpointer(config: dict) -> BoundedSqliteSaver:
+    "build the conversation checkpointer from the `checkpointer` config block"
+    cfg = config.get("checkpointer", {})
+    saver = BoundedSqliteSaver(
+        db_path=cfg.get("db_path", "data/checkpoints.sqlite"),
+        max_threads_in_memory=cfg.get("max_threads_in_memory", 256),
+        ttl_seconds=cfg.get("ttl_seconds", 24 * 3600),
+        max_checkpoints_per_thread=cfg.get("max_checkpoints_per_thread", 5),
+        max_messages=cfg.get("max_messages", 40),
+    )
+    log.info("Checkpointer ready", db_path=saver.db_path)
+    return saver
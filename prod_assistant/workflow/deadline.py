@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Dict, Optional
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+# seconds of budget an optional step needs before it is worth starting
+DEFAULT_MIN_REMAINING = {"compression": 10.0, "grading": 6.0, "rewrite": 12.0, "web_search": 8.0}
+
+_skips: Dict[str, int] = {}
+_runs = {"total": 0, "deadline_exceeded": 0}
+_metrics_lock = threading.Lock()
+
+
+def remaining(deadline: Optional[float]) -> float:
+    "seconds left before `deadline` (a time.time() timestamp); infinite when there is none"
+    return float("inf") if deadline is None else deadline - time.time()
+
+
+def record_run(deadline_exceeded: bool = False):
+    with _metrics_lock:
+        _runs["total"] += 1
+        if deadline_exceeded:
+            _runs["deadline_exceeded"] += 1
+
+
+def skip_stats() -> Dict[str, Dict[str, int]]:
+    with _metrics_lock:
+        return {"runs": dict(_runs), "skipped": dict(_skips)}
+
+
+class DeadlinePolicy:
+    """Decides which optional graph steps fit in a request's remaining budget.
+
+    Nodes call `allows(step, deadline)` before compression, grading, rewrite
+    or web search; a refusal is counted per step so skip rates show up in
+    `skip_stats()`. `answer_reserve` seconds are always kept for the
+    generator, and a query is rewritten at most `max_rewrites` times.
+    """
+
+    def __init__(self, default_budget: float = 30.0, max_rewrites: int = 1, answer_reserve: float = 4.0,
+                 min_remaining: Optional[Dict[str, float]] = None):
+        self.default_budget = default_budget
+        self.max_rewrites = max_rewrites
+        self.answer_reserve = answer_reserve
+        self.min_remaining = {**DEFAULT_MIN_REMAINING, **(min_remaining or {})}
+
+    def new_deadline(self, deadline: Optional[float] = None) -> float:
+        return deadline if deadline is not None else time.time() + self.default_budget
+
+    def expired(self, deadline: Optional[float]) -> bool:
+        return remaining(deadline) <= 0
+
+    def step_timeout(self, deadline: Optional[float], cap: float) -> float:
+        "timeout for a step that must leave the generator its reserve"
+        return max(min(cap, remaining(deadline) - self.answer_reserve), 0.0)
+
+    def allows(self, step: str, deadline: Optional[float], rewrites: int = 0) -> bool:
+        left = remaining(deadline)
+        if step == "rewrite" and rewrites >= self.max_rewrites:
+            reason = "max_rewrites"
+        elif left < self.min_remaining.get(step, 0.0):
+            reason = "deadline"
+        else:
+            return True
+        with _metrics_lock:
+            _skips[step] = _skips.get(step, 0) + 1
+        log.info("Skipping step", step=step, reason=reason, remaining_s=round(left, 2))
+        return False
+
+
+def load_deadline_policy(config: dict) -> DeadlinePolicy:
+    "build the policy from the `deadline` config block"
+    cfg = config.get("deadline", {})
+    return DeadlinePolicy(
+        default_budget=cfg.get("default_budget_s", 30.0),
+        max_rewrites=cfg.get("max_rewrites", 1),
+        answer_reserve=cfg.get("answer_reserve_s", 4.0),
+        min_remaining=cfg.get("min_remaining_s"),
+    )
@@ -0,0 +1,265 @@
+import json
+import math
+import re
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import PromptTemplate
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+EMPTY_CONTEXTS = {"", "no context found", "no relevant information found.", "no data from web"}
+
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "of", "for", "to", "in", "on", "and", "or", "what", "which",
+    "how", "much", "does", "do", "can", "you", "me", "tell", "about", "show", "price", "rating",
+    "review", "reviews", "good", "best", "it", "this", "that", "with", "under", "i", "my",
+}
+
+
+class GradeResult(NamedTuple):
+    relevant: bool
+    score: float
+    escalated: bool = False
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _mean(vectors: List[Sequence[float]]) -> List[float]:
+    return [sum(column) / len(vectors) for column in zip(*vectors)]
+
+
+def split_products(docs: str) -> List[Tuple[str, str]]:
+    "split formatted context into (title, chunk) pairs"
+    chunks = []
+    for chunk in re.split(r"\n\n(?=Title:)", docs.strip()):
+        match = re.match(r"Title:\s*(.*)", chunk)
+        chunks.append((match.group(1).strip() if match else "", chunk))
+    return chunks
+
+
+class DocumentGrader:
+    "base class: decide whether retrieved context answers the question"
+
+    def grade(self, question: str, docs: str) -> GradeResult:
+        raise NotImplementedError
+
+    async def agrade(self, question: str, docs: str) -> GradeResult:
+        return self.grade(question, docs)
+
+
+class LLMGrader(DocumentGrader):
+    "yes/no relevance judgement from the chat model (the original grader)"
+
+    def __init__(self, llm):
+        prompt = PromptTemplate(
+            template="""You are a grader.
+            Question: {question}
+            Docs: {docs}
+            Are docs relevant to the question? Answer yes or no""",
+            input_variables=['question', 'docs']
+        )
+        self.chain = prompt | llm | StrOutputParser()
+
+    def grade(self, question: str, docs: str) -> GradeResult:
+        relevant = "yes" in self.chain.invoke({"question": question, "docs": docs}).lower()
+        return GradeResult(relevant, 1.0 if relevant else 0.0)
+
+    async def agrade(self, question: str, docs: str) -> GradeResult:
+        relevant = "yes" in (await self.chain.ainvoke({"question": question, "docs": docs})).lower()
+        return GradeResult(relevant, 1.0 if relevant else 0.0)
+
+
+class EmbeddingGrader(DocumentGrader):
+    """Scores relevance locally from query/product embedding similarity.
+
+    Each product chunk is scored as a blend of cosine similarity and the
+    share of the question's content words found in the product title. The
+    best product decides the grade.
+
+    The packer picks different reviews for every question, so a whole chunk
+    is rarely embedded twice. Instead the product header and each review are
+    embedded on their own, and the product vector is their mean. These texts
+    come straight from the catalog, so with the shared `embedding` cache
+    (see CachingEmbeddings) each is embedded once per model across all
+    workers. What remains per turn is the question, which is already cached
+    when the retriever embedded the same text, plus reviews and headers no
+    earlier turn has seen. Without the shared cache every call embeds both.
+    """
+
+    def __init__(self, embeddings, threshold: float = 0.45, title_weight: float = 0.3):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.title_weight = title_weight
+
+    def _title_match(self, question: str, title: str) -> float:
+        wanted = [t for t in _tokens(question) if t not in _STOPWORDS]
+        if not wanted or not title:
+            return 0.0
+        title_tokens = set(_tokens(title))
+        return sum(t in title_tokens for t in wanted) / len(wanted)
+
+    @staticmethod
+    def _units(chunk: str) -> List[str]:
+        "the product header and each review snippet of a packed chunk; other context is one unit"
+        header, marker, reviews = chunk.partition("Reviews:")
+        if not marker:
+            return [chunk]
+        snippets = [s.strip() for s in reviews.split("||")]
+        units = [header.strip()] + [s for s in snippets if s and s.lower() != "no reviews found"]
+        return [u for u in units if u] or [chunk]
+
+    def _blend(self, question: str, chunks, q_vec, unit_vecs: dict) -> float:
+        best = 0.0
+        for title, chunk in chunks:
+            d_vec = _mean([unit_vecs[u] for u in self._units(chunk)])
+            score = (1 - self.title_weight) * _cosine(q_vec, d_vec) + self.title_weight * self._title_match(question, title)
+            best = max(best, score)
+        return best
+
+    def _unique_units(self, chunks) -> List[str]:
+        return list(dict.fromkeys(u for _, chunk in chunks for u in self._units(chunk)))
+
+    def score(self, question: str, docs: str) -> float:
+        if docs.strip().lower() in EMPTY_CONTEXTS:
+            return 0.0
+        chunks = split_products(docs)
+        units = self._unique_units(chunks)
+        q_vec = self.embeddings.embed_query(question)
+        unit_vecs = dict(zip(units, self.embeddings.embed_documents(units)))
+        return self._blend(question, chunks, q_vec, unit_vecs)
+
+    async def ascore(self, question: str, docs: str) -> float:
+        if docs.strip().lower() in EMPTY_CONTEXTS:
+            return 0.0
+        chunks = split_products(docs)
+        units = self._unique_units(chunks)
+        q_vec = await self.embeddings.aembed_query(question)
+        unit_vecs = dict(zip(units, await self.embeddings.aembed_documents(units)))
+        return self._blend(question, chunks, q_vec, unit_vecs)
+
+    def grade(self, question: str, docs: str) -> GradeResult:
+        score = self.score(question, docs)
+        return GradeResult(score >= self.threshold, score)
+
+    async def agrade(self, question: str, docs: str) -> GradeResult:
+        score = await self.ascore(question, docs)
+        return GradeResult(score >= self.threshold, score)
+
+
+class HybridGrader(DocumentGrader):
+    "embedding score decides outside [low, high]; the LLM grader breaks ties inside it"
+
+    def __init__(self, local: EmbeddingGrader, llm_grader: LLMGrader, low: float, high: float):
+        self.local = local
+        self.llm_grader = llm_grader
+        self.low = low
+        self.high = high
+
+    def _decide(self, score: float) -> Optional[GradeResult]:
+        if score >= self.high:
+            return GradeResult(True, score)
+        if score <= self.low:
+            return GradeResult(False, score)
+        return None
+
+    def grade(self, question: str, docs: str) -> GradeResult:
+        score = self.local.score(question, docs)
+        result = self._decide(score)
+        if result is None:
+            log.info("Grader escalating to LLM", score=round(score, 3))
+            result = GradeResult(self.llm_grader.grade(question, docs).relevant, score, escalated=True)
+        return result
+
+    async def agrade(self, question: str, docs: str) -> GradeResult:
+        score = await self.local.ascore(question, docs)
+        result = self._decide(score)
+        if result is None:
+            log.info("Grader escalating to LLM", score=round(score, 3))
+            result = GradeResult((await self.llm_grader.agrade(question, docs)).relevant, score, escalated=True)
+        return result
+
+
+def load_grader(config: dict, llm, model_loader) -> DocumentGrader:
+    "build the grader selected by the `grader` config block"
+    cfg = config.get("grader", {})
+    strategy = cfg.get("strategy", "llm")
+    log.info("Loading document grader", strategy=strategy)
+
+    if strategy == "llm":
+        return LLMGrader(llm)
+
+    local = EmbeddingGrader(
+        model_loader.load_embedding_model(),
+        threshold=cfg.get("high_threshold", 0.55),
+        title_weight=cfg.get("title_weight", 0.3),
+    )
+    if strategy == "embedding":
+        return local
+    if strategy == "hybrid":
+        return HybridGrader(local, LLMGrader(llm), cfg.get("low_threshold", 0.35), cfg.get("high_threshold", 0.55))
+    raise ValueError(f"Unsupported grader strategy {strategy}")
+
+
+def calibrate_thresholds(scored: Iterable[Tuple[float, bool]], target_precision: float = 0.95) -> Tuple[float, float]:
+    """Pick (low, high) so local decisions on either side meet `target_precision`.
+
+    `high` is the lowest score above which at least `target_precision` of
+    examples are relevant; `low` is the highest score below which at least
+    `target_precision` are irrelevant. Everything between escalates.
+    """
+    scored = sorted(scored)
+    if not scored:
+        raise ValueError("No scored examples to calibrate from")
+    candidates = sorted({s for s, _ in scored})
+
+    high = candidates[-1]
+    for t in candidates:
+        above = [label for s, label in scored if s >= t]
+        if above and sum(above) / len(above) >= target_precision:
+            high = t
+            break
+
+    low = candidates[0]
+    for t in reversed(candidates):
+        below = [label for s, label in scored if s <= t]
+        if below and (len(below) - sum(below)) / len(below) >= target_precision:
+            low = t
+            break
+
+    return min(low, high), high
+
+
+if __name__ == "__main__":
+    # Calibrate from evaluation data: JSONL rows of {"question", "context", "relevant"}
+    import argparse
+    from prod_assistant.utils.model_loader import ModelLoader
+
+    parser = argparse.ArgumentParser(description="Calibrate embedding grader thresholds")
+    parser.add_argument("eval_file")
+    parser.add_argument("--target-precision", type=float, default=0.95)
+    args = parser.parse_args()
+
+    loader = ModelLoader()
+    cfg = loader.config.get("grader", {})
+    grader = EmbeddingGrader(loader.load_embedding_model(), title_weight=cfg.get("title_weight", 0.3))
+
+    scored = []
+    with open(args.eval_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                scored.append((grader.score(row["question"], row["context"]), bool(row["relevant"])))
+
+    low, high = calibrate_thresholds(scored, args.target_precision)
+    in_band = sum(low < s < high for s, _ in scored)
+    print(f"low_threshold: {low:.3f}\nhigh_threshold: {high:.3f}")
+    print(f"{in_band}/{len(scored)} examples would escalate to the LLM grader")
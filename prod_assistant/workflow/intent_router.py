@@ -0,0 +1,258 @@
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from enum import Enum
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from prod_assistant.logger import GLOBAL_LOGGER as log
+
+
+class Intent(str, Enum):
+    RETRIEVE = "retrieve"
+    DIRECT = "direct"
+    WEB = "web"
+
+
+# routing markers the assistant node emits for the graph's conditional edges
+RETRIEVER_MARKER = "TOOL: retriever"
+WEB_MARKER = "TOOL: web"
+
+
+class IntentPrediction(NamedTuple):
+    intent: Intent
+    confidence: float
+
+
+# Seed examples used when no logged queries are available yet
+SEED_EXAMPLES: List[Tuple[str, Intent]] = [
+    ("what is the price of iphone 16", Intent.RETRIEVE),
+    ("how much does the oneplus nord cost", Intent.RETRIEVE),
+    ("show me reviews of samsung galaxy s24", Intent.RETRIEVE),
+    ("customer reviews for noise earbuds", Intent.RETRIEVE),
+    ("what is the rating of boat headphones", Intent.RETRIEVE),
+    ("best budget phone under 20000", Intent.RETRIEVE),
+    ("suggest a good smartwatch", Intent.RETRIEVE),
+    ("compare iphone 15 and iphone 16", Intent.RETRIEVE),
+    ("which laptop has good battery life", Intent.RETRIEVE),
+    ("is this product worth buying", Intent.RETRIEVE),
+    ("cheapest phone with a good camera", Intent.RETRIEVE),
+    ("can you recommend wireless earphones", Intent.RETRIEVE),
+    ("hi", Intent.DIRECT),
+    ("hello there", Intent.DIRECT),
+    ("good morning", Intent.DIRECT),
+    ("thanks", Intent.DIRECT),
+    ("thank you so much", Intent.DIRECT),
+    ("who are you", Intent.DIRECT),
+    ("what is your name", Intent.DIRECT),
+    ("what can you do", Intent.DIRECT),
+    ("how are you", Intent.DIRECT),
+    ("bye", Intent.DIRECT),
+    ("latest news about the apple launch event", Intent.WEB),
+    ("when will iphone 17 be released", Intent.WEB),
+    ("upcoming phone launches this month", Intent.WEB),
+    ("what happened at the samsung event yesterday", Intent.WEB),
+    ("current stock price of apple", Intent.WEB),
+    ("latest android version released today", Intent.WEB),
+    ("is there any news on the pixel 10", Intent.WEB),
+    ("today's deals announced on flipkart big billion days", Intent.WEB),
+]
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+class IntentClassifier:
+    "base class for pluggable intent classifiers"
+
+    def predict(self, text: str) -> IntentPrediction:
+        raise NotImplementedError
+
+    def fit(self, examples: Iterable[Tuple[str, Intent]]) -> "IntentClassifier":
+        raise NotImplementedError
+
+
+class CharNgramIntentClassifier(IntentClassifier):
+    """TF-IDF weighted character n-gram nearest-centroid classifier.
+
+    Pure python and sparse, so a prediction is a handful of dict lookups
+    (well under a millisecond for chat-sized queries).
+    """
+
+    def __init__(self, ngram_range: Tuple[int, int] = (2, 4), temperature: float = 0.05):
+        self.ngram_range = ngram_range
+        self.temperature = temperature
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[Intent, Dict[str, float]] = {}
+
+    def _features(self, text: str) -> Counter:
+        text = _normalize(text)
+        padded = f" {text} "
+        low, high = self.ngram_range
+        feats = Counter(text.split())
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                feats[padded[i:i + n]] += 1
+        return feats
+
+    def _vectorize(self, text: str) -> Dict[str, float]:
+        feats = self._features(text)
+        vec = {f: (1 + math.log(tf)) * self.idf[f] for f, tf in feats.items() if f in self.idf}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {f: v / norm for f, v in vec.items()}
+
+    def fit(self, examples: Iterable[Tuple[str, Intent]]) -> "CharNgramIntentClassifier":
+        examples = [(text, Intent(intent)) for text, intent in examples]
+        if not examples:
+            raise ValueError("Cannot fit intent classifier without examples")
+
+        doc_freq: Counter = Counter()
+        for text, _ in examples:
+            doc_freq.update(set(self._features(text)))
+        n_docs = len(examples)
+        self.idf = {f: math.log((1 + n_docs) / (1 + df)) + 1 for f, df in doc_freq.items()}
+
+        sums: Dict[Intent, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for text, intent in examples:
+            for f, v in self._vectorize(text).items():
+                sums[intent][f] += v
+
+        self.centroids = {}
+        for intent, vec in sums.items():
+            norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+            self.centroids[intent] = {f: v / norm for f, v in vec.items()}
+        return self
+
+    def predict(self, text: str) -> IntentPrediction:
+        if not self.centroids:
+            raise ValueError("Intent classifier has not been fitted")
+        vec = self._vectorize(text)
+        sims = {
+            intent: sum(v * centroid.get(f, 0.0) for f, v in vec.items())
+            for intent, centroid in self.centroids.items()
+        }
+        # softmax over cosine similarities turns the margin into a confidence
+        top = max(sims.values())
+        weights = {i: math.exp((s - top) / self.temperature) for i, s in sims.items()}
+        total = sum(weights.values())
+        best = max(weights, key=weights.get)
+        return IntentPrediction(best, weights[best] / total)
+
+    def save(self, path: str):
+        payload = {
+            "ngram_range": list(self.ngram_range),
+            "temperature": self.temperature,
+            "idf": self.idf,
+            "centroids": {i.value: c for i, c in self.centroids.items()},
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+
+    @classmethod
+    def load(cls, path: str) -> "CharNgramIntentClassifier":
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        clf = cls(tuple(payload["ngram_range"]), payload["temperature"])
+        clf.idf = payload["idf"]
+        clf.centroids = {Intent(i): c for i, c in payload["centroids"].items()}
+        return clf
+
+
+def load_logged_queries(path: str) -> List[Tuple[str, Intent]]:
+    "read JSONL lines of {'query': ..., 'intent': ...} written by IntentRouter.record"
+    examples = []
+    if not os.path.exists(path):
+        return examples
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+                examples.append((row["query"], Intent(row["intent"])))
+            except (ValueError, KeyError) as e:
+                log.warning("Skipping malformed intent example", error=str(e))
+    return examples
+
+
+class IntentRouter:
+    """Routes a query with a local classifier, deferring to the caller when unsure.
+
+    `classify` returns None when confidence is below the threshold so the
+    workflow can fall back to an LLM decision, which is then fed back via
+    `record` as training data.
+    """
+
+    def __init__(self, classifier: IntentClassifier, threshold: float = 0.6, log_path: Optional[str] = None):
+        self.classifier = classifier
+        self.threshold = threshold
+        self.log_path = log_path
+
+    def classify(self, text: str) -> Optional[IntentPrediction]:
+        prediction = self.classifier.predict(text)
+        log.info("Intent predicted", intent=prediction.intent.value, confidence=round(prediction.confidence, 3))
+        if prediction.confidence < self.threshold:
+            return None
+        return prediction
+
+    @staticmethod
+    def intent_from_llm(response: str) -> Intent:
+        "map an LLM fallback response (marker or direct answer) back to an intent"
+        response = response.strip()
+        if response.startswith(RETRIEVER_MARKER):
+            return Intent.RETRIEVE
+        if response.startswith(WEB_MARKER):
+            return Intent.WEB
+        return Intent.DIRECT
+
+    def record(self, text: str, intent: Intent):
+        if not self.log_path:
+            return
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"query": text, "intent": Intent(intent).value}) + "\n")
+
+
+def load_intent_router(config: dict) -> IntentRouter:
+    "build the router from the `intent_router` config block"
+    cfg = config.get("intent_router", {})
+    model_path = cfg.get("model_path")
+    log_path = cfg.get("training_data")
+
+    if model_path and os.path.exists(model_path):
+        classifier = CharNgramIntentClassifier.load(model_path)
+        log.info("Intent classifier loaded", model_path=model_path)
+    else:
+        examples = SEED_EXAMPLES + (load_logged_queries(log_path) if log_path else [])
+        classifier = CharNgramIntentClassifier().fit(examples)
+        log.info("Intent classifier trained", examples=len(examples))
+
+    return IntentRouter(classifier, threshold=cfg.get("confidence_threshold", 0.6), log_path=log_path)
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+    from prod_assistant.utils.config_loader import load_config
+
+    config = load_config()
+    args = sys.argv[1:]
+
+    if args and args[0] == "--retrain":
+        # e.g. from a nightly job: fold logged queries into a persisted model
+        cfg = config.get("intent_router", {})
+        examples = SEED_EXAMPLES + load_logged_queries(cfg.get("training_data", ""))
+        CharNgramIntentClassifier().fit(examples).save(cfg["model_path"])
+        print(f"Saved classifier trained on {len(examples)} examples to {cfg['model_path']}")
+        sys.exit(0)
+
+    router = load_intent_router(config)
+    queries = args or ["What is the price of iPhone 16?", "hello", "latest pixel launch news"]
+    for q in queries:
+        start = time.perf_counter()
+        pred = router.classifier.predict(q)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{q!r}: {pred.intent.value} ({pred.confidence:.2f}) in {elapsed_ms:.3f} ms")
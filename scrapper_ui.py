@@ -1,14 +1,20 @@
 import streamlit as st
-from prod_assistant.etl.data_scrapper import FlipkartScraper   # Import scraper class
-from prod_assistant.etl.data_injection import DataIngestion #impoRT INGESTION class
+from prod_assistant.etl.jobs import FINISHED, RUNNING, ensure_workers, load_job_queue   # background job queue
+from prod_assistant.utils.config_loader import load_config
 import os
 
-# Initialize the Flipkart scraper
-flipkart_scraper = FlipkartScraper()
-
 # Define path to save scraped data CSV
 output_path = "data/product_reviews.csv"
 
+# Scraping and ingestion run in worker processes, so a refresh or a second user doesn't block or kill them
+@st.cache_resource
+def get_job_queue():
+    config = load_config()
+    ensure_workers(config)
+    return load_job_queue(config)
+
+job_queue = get_job_queue()
+
 # Set the title of the Streamlit app
 st.title("📦 Product Review Scraper")
 
@@ -40,7 +46,10 @@ st.button("➕ Add Another Product", on_click=add_product_input)
 max_products = st.number_input("How many products per search?", min_value=1, max_value=10, value=1)
 review_count = st.number_input("How many reviews per product?", min_value=1, max_value=10, value=2)
 
-# Button to start scraping
+# Run the scraped products through the ingestion pipeline as part of the same job
+ingest_after = st.checkbox("🧠 Store in Vector DB after scraping", value=True)
+
+# Button to queue a scraping job
 if st.button("🚀 Start Scraping"):
     # Clean and combine product inputs and optional description
     product_inputs = [p.strip() for p in st.session_state.product_inputs if p.strip()]
@@ -51,42 +60,49 @@ if st.button("🚀 Start Scraping"):
     if not product_inputs:
         st.warning("⚠️ Please enter at least one product name or a product description.")
     else:
-        final_data = []
-        # Loop through each search query and scrape products
-        for query in product_inputs:
-            st.write(f"🔍 Searching for: {query}")   # Show which query is being processed
-            results = flipkart_scraper.scrape_flipkart_products(
-                query, max_products=max_products, review_count=review_count
-            )
-            final_data.extend(results)   # Add scraped results to final list
-
-        # Remove duplicate products based on product title
-        unique_products = {}
-        for row in final_data:
-            if row[1] not in unique_products:
-                unique_products[row[1]] = row
-        final_data = list(unique_products.values())
-
-        # Save scraped data in session state for later use
-        st.session_state["scraped_data"] = final_data
-        # Save the scraped data to CSV
-        flipkart_scraper.save_to_csv(final_data, output_path)
-        st.success("✅ Data saved to `data/product_reviews.csv`")
-        # Provide download button for the CSV file
-        st.download_button(
-            "📥 Download CSV",
-            data=open(output_path, "rb"),
-            file_name="product_reviews.csv"
-        )
-
-# Button to store data in AstraDB vector database (only available after scraping)
-if "scraped_data" in st.session_state and st.button("🧠 Store in Vector DB (AstraDB)"):
-    with st.spinner("📡 Initializing ingestion pipeline..."):  # Show spinner while processing
-        try:
-            ingestion = DataIngestion()         # Initialize data ingestion pipeline
-            st.info("🚀 Running ingestion pipeline...")
-            ingestion.run_pipeline()            # Transform CSV to documents and store in vector DB
-            st.success("✅ Data successfully ingested to AstraDB!")
-        except Exception as e:
-            st.error("❌ Ingestion failed!")   # Show error if ingestion fails
-            st.exception(e)                     # Display full exception traceback
+        job_id = job_queue.submit("scrape", {
+            "queries": product_inputs,
+            "max_products": int(max_products),
+            "review_count": int(review_count),
+            "output_path": output_path,
+            "ingest": ingest_after,
+        })
+        st.success(f"✅ Scraping job #{job_id} queued")
+
+# Button to (re)ingest the current CSV into the vector database
+if os.path.exists(output_path) and st.button("🧠 Store current CSV in Vector DB"):
+    job_id = job_queue.submit("ingest", {})
+    st.success(f"✅ Ingestion job #{job_id} queued")
+
+# Job list, refreshed every 2 seconds without rerunning the rest of the page
+@st.fragment(run_every=2)
+def show_jobs():
+    st.subheader("📋 Jobs")
+    jobs = job_queue.list(limit=10)
+    if not jobs:
+        st.caption("No jobs yet.")
+    # the CSV only holds the latest scrape, so only that job offers it for download
+    latest_scrape = next((job["id"] for job in jobs if job["kind"] == "scrape" and job["status"] == "done"), None)
+    for job in jobs:
+        with st.container(border=True):
+            title = ", ".join(job["params"].get("queries", [])) or "current CSV"
+            st.markdown(f"**#{job['id']} {job['kind']}** · {title} · `{job['status']}`")
+            if job["items_total"]:
+                st.progress(min(job["items_done"] / job["items_total"], 1.0),
+                            text=f"{job['items_done']}/{job['items_total']} · {job['message']}")
+            else:
+                st.caption(job["message"])
+            if job["status"] == RUNNING:
+                st.caption(f"⏱️ {job['elapsed_s']:.0f}s · {job['items_per_min']:.1f} items/min")
+            if job["error"]:
+                st.error(job["error"])
+            if job["status"] not in FINISHED and not job["cancel_requested"] and job["cancellable"]:
+                if st.button("✖️ Cancel", key=f"cancel_{job['id']}"):
+                    if not job_queue.cancel(job["id"]):
+                        st.warning("This job is storing documents and can no longer be cancelled.")
+            if job["id"] == latest_scrape and os.path.exists(job["params"]["output_path"]):
+                # Provide download button for the CSV file
+                st.download_button("📥 Download CSV", data=open(job["params"]["output_path"], "rb"),
+                                   file_name="product_reviews.csv", key=f"download_{job['id']}")
+
+show_jobs()
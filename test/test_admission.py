@@ -0,0 +1,185 @@
+import asyncio
+
+import pytest
+
+from prod_assistant.router.admission import AdmissionController, Rejected
+
+
+async def hold(controller: AdmissionController, client: str, release: asyncio.Event, order: list):
+    async with controller.admit(client):
+        order.append(client)
+        await release.wait()
+
+
+async def hold_background(controller: AdmissionController, name: str, release: asyncio.Event, order: list):
+    async with controller.admit_background():
+        order.append(name)
+        await release.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_admits_up_to_max_in_flight_then_queues():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=2, max_queue=4, per_client_limit=4)
+        release, order = asyncio.Event(), []
+        tasks = [asyncio.create_task(hold(controller, f"c{i}", release, order)) for i in range(3)]
+        await settle()
+        assert order == ["c0", "c1"]
+        assert controller.stats()["queue_depth"] == 1
+        release.set()
+        await asyncio.gather(*tasks)
+        assert order == ["c0", "c1", "c2"]
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_per_client_limit_is_429():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=8, per_client_limit=2)
+        release, order = asyncio.Event(), []
+        tasks = [asyncio.create_task(hold(controller, "greedy", release, order)) for _ in range(2)]
+        await settle()
+        with pytest.raises(Rejected) as rejected:
+            async with controller.admit("greedy"):
+                pass
+        assert rejected.value.status_code == 429
+        assert rejected.value.retry_after >= 1
+        # other clients are unaffected
+        async with controller.admit("polite"):
+            pass
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_is_503():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, per_client_limit=4)
+        release, order = asyncio.Event(), []
+        tasks = [asyncio.create_task(hold(controller, f"c{i}", release, order)) for i in range(2)]
+        await settle()
+        with pytest.raises(Rejected) as rejected:
+            async with controller.admit("late"):
+                pass
+        assert rejected.value.status_code == 503
+        release.set()
+        await asyncio.gather(*tasks)
+        assert controller.stats()["rejected_503"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_is_503_and_frees_the_queue_slot():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.05)
+        release, order = asyncio.Event(), []
+        running = asyncio.create_task(hold(controller, "c0", release, order))
+        await settle()
+        with pytest.raises(Rejected) as rejected:
+            async with controller.admit("c1"):
+                pass
+        assert rejected.value.status_code == 503
+        assert controller.stats()["queue_depth"] == 0
+        assert controller.stats()["queue_timeouts"] == 1
+        release.set()
+        await running
+
+    asyncio.run(scenario())
+
+
+def test_freed_slots_rotate_across_clients():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=8, per_client_limit=4)
+        gate, order = asyncio.Event(), []
+        first = asyncio.create_task(hold(controller, "busy", gate, order))
+        await settle()
+        # each waiter finishes as soon as it is admitted, handing the slot on
+        done = asyncio.Event()
+        done.set()
+        waiters = []
+        for client in ["a", "a", "a", "b"]:
+            waiters.append(asyncio.create_task(hold(controller, client, done, order)))
+            await settle()
+        gate.set()
+        await asyncio.gather(first, *waiters)
+        assert order == ["busy", "a", "b", "a", "a"]
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_leak_its_slot():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=4)
+        release, order = asyncio.Event(), []
+        running = asyncio.create_task(hold(controller, "c0", release, order))
+        await settle()
+        waiting = asyncio.create_task(hold(controller, "c1", release, order))
+        await settle()
+        waiting.cancel()
+        await settle()
+        assert controller.stats()["queue_depth"] == 0
+        release.set()
+        await running
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_background_work_is_capped_and_yields_to_interactive_requests():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=3, max_queue=8, max_background=2)
+        releases, order = [asyncio.Event() for _ in range(3)], []
+        batch = [asyncio.create_task(hold_background(controller, f"bg{i}", release, order))
+                 for i, release in enumerate(releases)]
+        await settle()
+        assert order == ["bg0", "bg1"]  # capped below max_in_flight
+        assert controller.stats()["background_queue_depth"] == 1
+
+        interactive_release = asyncio.Event()
+        interactive = [asyncio.create_task(hold(controller, f"c{i}", interactive_release, order))
+                       for i in range(2)]
+        await settle()
+        assert order == ["bg0", "bg1", "c0"]  # c1 waits for a slot
+
+        releases[0].set()
+        await settle()
+        # the freed background slot goes to the waiting interactive request
+        assert order[3:] == ["c1"]
+        assert controller.stats()["background_queue_depth"] == 1
+
+        interactive_release.set()
+        await settle()
+        assert order[4:] == ["bg2"]
+        for release in releases:
+            release.set()
+        await asyncio.gather(*batch, *interactive)
+        assert controller.in_flight == 0 and controller.background_in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_background_work_waits_instead_of_being_rejected():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=0, queue_timeout=0.01, max_background=1)
+        release, order = asyncio.Event(), []
+        running = asyncio.create_task(hold(controller, "c0", release, order))
+        await settle()
+        background = asyncio.create_task(hold_background(controller, "bg", asyncio.Event(), order))
+        await asyncio.sleep(0.05)
+        assert not background.done()
+        release.set()
+        await running
+        await settle()
+        assert order == ["c0", "bg"]
+        background.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await background
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+import pytest
+
+from prod_assistant.retriever.catalog_index import CatalogIndex
+
+PRODUCTS = [
+    {"product_id": "MOBH4DQFG8NKFRDY", "product_title": "Apple iPhone 16 (Black, 128 GB)",
+     "rating": "4.6", "total_reviews": "1,203", "price": "₹79,900"},
+    {"product_id": "MOBH4DQFZCCDHMRW", "product_title": "Apple iPhone 16 Pro (Desert Titanium, 256 GB)",
+     "rating": "4.7", "total_reviews": "842", "price": "₹1,29,900"},
+    {"product_id": "MOBGTAGPNMZAHJ6A", "product_title": "Apple iPhone 15 (Blue, 128 GB)",
+     "rating": "4.6", "total_reviews": "9,511", "price": "₹64,900"},
+    {"product_id": "MOBGX2F3HVGQTHQP", "product_title": "SAMSUNG Galaxy S24 (Onyx Black, 128 GB)",
+     "rating": "4.4", "total_reviews": "2,210", "price": "₹59,999"},
+    {"product_id": "MOBGX2F3YQZGZVXB", "product_title": "SAMSUNG Galaxy S24 Ultra 5G (Titanium Gray, 256 GB)",
+     "rating": "4.5", "total_reviews": "1,675", "price": "₹1,21,999"},
+]
+
+
+def index(**kwargs) -> CatalogIndex:
+    return CatalogIndex([dict(p) for p in PRODUCTS], **kwargs)
+
+
+def titles(match):
+    return [p["product_title"] for p in match.products]
+
+
+def test_fact_query_is_answered_from_the_catalog():
+    match = index().match("price of iPhone 16")
+    assert titles(match) == ["Apple iPhone 16 (Black, 128 GB)"]
+    assert match.answerable
+    assert "₹79,900" in CatalogIndex.answer(match)
+
+
+def test_product_id_matches_exactly():
+    match = index().match("rating of mobgx2f3yqzgzvxb")
+    assert titles(match) == ["SAMSUNG Galaxy S24 Ultra 5G (Titanium Gray, 256 GB)"]
+    assert match.facts == ["rating"]
+
+
+def test_misspelling_is_corrected():
+    match = index().match("iphne 15 price")
+    assert titles(match) == ["Apple iPhone 15 (Blue, 128 GB)"]
+
+
+@pytest.mark.parametrize("query", ["phone price", "black phone", "best phone under 60000"])
+def test_generic_word_is_not_corrected_to_a_product_name(query):
+    assert index().match(query) is None
+
+
+def test_brand_only_query_falls_through_to_retrieval():
+    assert index().match("samsung rating") is None
+    assert index().match("apple price") is None
+
+
+def test_unmatched_word_drops_coverage_below_threshold():
+    # no title contains "max", so the 16 Pro must not be taken for a 16 Pro Max
+    assert index().match("iphone 16 pro max price") is None
+    assert index().match("galaxy s24 charger") is None
+
+
+def test_title_penalty_prefers_the_base_model():
+    match = index().match("galaxy s24 price")
+    assert titles(match) == ["SAMSUNG Galaxy S24 (Onyx Black, 128 GB)"]
+
+
+def test_candidates_within_margin_go_to_the_generator():
+    match = index(title_penalty=0.0).match("galaxy s24 price")
+    assert sorted(titles(match)) == sorted(p["product_title"] for p in PRODUCTS if "S24" in p["product_title"])
+    assert not match.answerable
+
+
+def test_too_many_tied_candidates_is_no_match():
+    assert index(title_penalty=0.0, max_candidates=2).match("iphone rating") is None
+
@@ -0,0 +1,71 @@
+from langchain_core.documents import Document
+
+from prod_assistant.retriever.context_packer import ContextPacker, load_context_packer
+
+
+def words(text: str) -> int:
+    return len(text.split())
+
+
+def doc(reviews, title="Apple iPhone 16 (Black, 128 GB)"):
+    return Document(page_content=" || ".join(reviews),
+                    metadata={"product_title": title, "price": "₹79,900", "rating": "4.6"})
+
+
+BATTERY = "Battery easily lasts a full day of heavy use"
+BATTERY_AGAIN = "Battery easily lasts a full day of heavy use!"
+CAMERA = "Camera is sharp in daylight but noisy at night"
+DELIVERY = "Delivery was quick and the box was sealed"
+
+
+def test_near_duplicate_reviews_are_dropped():
+    packed, stats = ContextPacker(max_tokens=1000, count_tokens=words).pack(
+        [doc([BATTERY, BATTERY_AGAIN, CAMERA])], "battery life")
+    assert packed.count("Battery easily lasts") == 1
+    assert CAMERA in packed
+    assert stats["duplicates_dropped"] == 1
+
+
+def test_dedup_threshold_controls_what_counts_as_duplicate():
+    packer = ContextPacker(max_tokens=1000, dedup_threshold=1.01, count_tokens=words)
+    packed, stats = packer.pack([doc([BATTERY, BATTERY_AGAIN])], "battery life")
+    assert packed.count("Battery easily lasts") == 2
+    assert stats["duplicates_dropped"] == 0
+
+
+def test_budget_keeps_the_most_relevant_reviews():
+    docs = [doc([DELIVERY, CAMERA, BATTERY])]
+    header_words = words("Title: Apple iPhone 16 (Black, 128 GB) Price: ₹79,900 Rating: 4.6 Reviews:")
+    # room for the header plus one review and its separator
+    packer = ContextPacker(max_tokens=header_words + words(BATTERY) + 2, count_tokens=words)
+    packed, stats = packer.pack(docs, "how is the battery")
+    assert BATTERY in packed
+    assert CAMERA not in packed and DELIVERY not in packed
+    assert stats["snippets_dropped_for_budget"] == 2
+    assert stats["packed_tokens"] <= packer.max_tokens
+
+
+def test_headers_are_kept_when_no_review_fits():
+    packed, _ = ContextPacker(max_tokens=1, count_tokens=words).pack(
+        [doc([BATTERY]), doc([CAMERA], title="SAMSUNG Galaxy S24 (Onyx Black, 128 GB)")], "battery")
+    assert "Title: Apple iPhone 16 (Black, 128 GB)" in packed
+    assert "Title: SAMSUNG Galaxy S24 (Onyx Black, 128 GB)" in packed
+    assert packed.count("No reviews found") == 2
+
+
+def test_kept_reviews_stay_in_their_original_order():
+    packed, _ = ContextPacker(max_tokens=1000, count_tokens=words).pack(
+        [doc([DELIVERY, CAMERA, BATTERY])], "battery camera")
+    assert packed.index(DELIVERY) < packed.index(CAMERA) < packed.index(BATTERY)
+
+
+def test_missing_review_markers_are_skipped():
+    packed, _ = ContextPacker(max_tokens=1000, count_tokens=words).pack([doc(["No reviews found"])], "battery")
+    assert packed.endswith("Reviews: \nNo reviews found")
+
+
+def test_budget_and_threshold_come_from_config():
+    config = {"llm": {"openai": {"max_context_tokens": 1234}}, "context_packing": {"dedup_threshold": 0.6}}
+    packer = load_context_packer(config, provider="openai")
+    assert packer.max_tokens == 1234
+    assert packer.dedup_threshold == 0.6
@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from prod_assistant.utils.single_flight import SingleFlight
+
+
+def test_concurrent_threads_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+    started = threading.Event()
+
+    def work():
+        calls.append(1)
+        started.set()
+        time.sleep(0.1)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", work)))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=lambda: results.append(flight.do("key", work))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader, *followers]:
+        thread.join()
+
+    assert results == ["result"] * 4
+    assert len(calls) == 1
+    assert flight.stats() == {"calls": 4, "executions": 1, "collapsed": 3, "in_flight": 0}
+
+
+def test_nothing_is_cached_after_completion():
+    flight = SingleFlight("test")
+    calls = []
+    flight.do("key", lambda: calls.append(1))
+    flight.do("key", lambda: calls.append(1))
+    assert len(calls) == 2
+
+
+def test_error_reaches_every_waiter():
+    flight = SingleFlight("test")
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("upstream down")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", fail)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    for thread in (leader, follower):
+        thread.join()
+    assert errors == ["upstream down"] * 2
+
+
+def test_coroutines_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.ado("key", work) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["result"] * 5
+    assert len(calls) == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_async_error_reaches_every_waiter():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.ado("key", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert [str(r) for r in results] == ["upstream down"] * 3
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    flight = SingleFlight("test")
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def scenario():
+        impatient = asyncio.create_task(flight.ado("key", work))
+        patient = asyncio.create_task(flight.ado("key", work))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await impatient
+        return await patient
+
+    assert asyncio.run(scenario()) == "result"
+
+
+def test_flights_on_different_event_loops_are_separate():
+    flight = SingleFlight("test")
+    loops = set()
+
+    async def work():
+        loops.add(id(asyncio.get_running_loop()))
+        await asyncio.sleep(0.1)
+        return "result"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.ado("key", work) for _ in range(3)))
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(asyncio.run(scenario()))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [["result"] * 3] * 2
+    # one execution per loop, each awaited only on the loop that created it
+    assert len(loops) == 2
+    assert flight.stats()["executions"] == 2
@@ -0,0 +1,19 @@
+from pathlib import Path
+
+import pytest
+
+from prod_assistant.utils.config_loader import load_config
+from prod_assistant.utils.startup_benchmark import ENTRY_POINTS, main
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_every_entry_point_has_a_budget():
+    assert set(ENTRY_POINTS) <= set(load_config().get("startup_budget", {}))
+
+
+@pytest.mark.parametrize("entry_point", list(ENTRY_POINTS))
+def test_import_only_startup_is_within_budget(entry_point, monkeypatch):
+    # the router mounts ./static and the scraper UI is imported from the repo root
+    monkeypatch.chdir(REPO_ROOT)
+    assert main([entry_point, "--enforce"]) == 0